@@ -1,3 +1,4 @@
+import time
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
@@ -10,9 +11,12 @@ migrate = Migrate()
 mail = Mail()
 
 def create_app():
+    boot_start = time.perf_counter()
     app = Flask(__name__)
     app.config.from_object(Config)
     
+    from app import metrics
+
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
@@ -32,5 +36,19 @@ def create_app():
     # Create database tables
     with app.app_context():
         db.create_all()
-    
+        metrics.instrument_engine(db.engine)
+    metrics.instrument_app(app)
+
+    # torch, sklearn and ART load on first use; WARM_UP_IMPORTS=1 pays for them at boot instead
+    from app.lazy import warm_up, pending_modules
+    imports = {}
+    if app.config['WARM_UP_IMPORTS']:
+        from app.loader_pool import get_loader_pool
+        imports = warm_up()
+        get_loader_pool()
+    app.extensions['boot'] = {'seconds': time.perf_counter() - boot_start, 'imports': imports}
+    app.logger.info('App ready in %.2fs%s; deferred: %s', app.extensions['boot']['seconds'],
+                    ''.join(f"; {name} {seconds:.2f}s" for name, seconds in imports.items()),
+                    ', '.join(pending_modules()) or 'none')
+
     return app
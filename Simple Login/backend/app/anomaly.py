@@ -0,0 +1,201 @@
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from config import Config
+from .lazy import lazy_import
+
+joblib = lazy_import('joblib')
+ensemble = lazy_import('sklearn.ensemble')
+
+# Bump when extract_model_features changes shape or meaning; older models are ignored
+FEATURE_VERSION = 2
+N_FEATURES = 10
+# Minimum corpus size for a fit to say anything about "normal" uploads
+MIN_TRAINING_SAMPLES = 20
+
+_EULER_GAMMA = np.euler_gamma
+
+
+def _average_path_length(n):
+    """Expected path length of an unsuccessful BST search over ``n`` samples."""
+    n = np.asarray(n, dtype=np.float64)
+    result = np.zeros_like(n)
+    result[n == 2] = 1.0
+    big = n > 2
+    result[big] = 2.0 * (np.log(n[big] - 1.0) + _EULER_GAMMA) - 2.0 * (n[big] - 1.0) / n[big]
+    return result
+
+
+class AnomalyDetector:
+    """IsolationForest over upload features, persisted with joblib and scored without sklearn.
+
+    After every fit or load the forest is flattened into node arrays shared
+    by all trees, so a batch of samples walks every tree in lockstep with a
+    handful of numpy operations per tree level.
+    """
+
+    def __init__(self, model_path=None, contamination=0.1, n_estimators=100):
+        self.model_path = model_path or Config.ANOMALY_MODEL_PATH
+        self.contamination = contamination
+        self.n_estimators = n_estimators
+        self.forest = None
+        self.trained_on = 0
+        self.trained_at = None
+        self.mtime = None
+
+    @property
+    def is_trained(self):
+        return self.forest is not None
+
+    def fit(self, features):
+        """Fit a fresh forest on the feature rows of the whole corpus."""
+        X = self._check(features)
+        self.forest = ensemble.IsolationForest(
+            n_estimators=self.n_estimators, contamination=self.contamination,
+            warm_start=True, random_state=42
+        ).fit(X)
+        self.trained_on = len(X)
+        self.trained_at = datetime.utcnow()
+        self._compile()
+        return self
+
+    @property
+    def min_update_samples(self):
+        """Rows a warm start needs: new trees draw as many samples as the existing ones did."""
+        return int(self.forest.max_samples_) if self.is_trained else MIN_TRAINING_SAMPLES
+
+    def update(self, features, extra_estimators=25):
+        """Grow the forest with trees fitted on newly scanned uploads (warm start).
+
+        Existing trees are kept, and so are the subsample size and decision
+        threshold calibrated on the corpus: scores stay comparable only if
+        every tree saw as many samples, so a batch smaller than
+        ``min_update_samples`` is rejected. Falls back to a full fit when
+        nothing is trained yet.
+        """
+        if not self.is_trained:
+            return self.fit(features)
+        X = self._check(features)
+        max_samples, offset = self.forest.max_samples_, self.forest.offset_
+        if len(X) < max_samples:
+            raise ValueError(f'a warm start needs at least {max_samples} new samples, got {len(X)}')
+        self.forest.set_params(n_estimators=self.forest.n_estimators + extra_estimators, max_samples=max_samples)
+        self.forest.fit(X)
+        # fit() re-derives the threshold from the new rows alone
+        self.forest.max_samples_, self.forest.offset_ = max_samples, offset
+        self.trained_on += len(X)
+        self.trained_at = datetime.utcnow()
+        self._compile()
+        return self
+
+    def save(self, path=None):
+        path = path or self.model_path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        joblib.dump({
+            'forest': self.forest,
+            'feature_version': FEATURE_VERSION,
+            'trained_on': self.trained_on,
+            'trained_at': self.trained_at
+        }, tmp_path)
+        os.replace(tmp_path, path)
+        self.mtime = os.path.getmtime(path)
+
+    def load(self, path=None):
+        """Load a saved model; leaves the detector untrained if it is missing or outdated."""
+        path = path or self.model_path
+        if not os.path.exists(path):
+            return self
+        bundle = joblib.load(path)
+        self.mtime = os.path.getmtime(path)
+        if bundle.get('feature_version') != FEATURE_VERSION:
+            self.forest = None
+            return self
+        self.forest = bundle['forest']
+        self.trained_on = bundle.get('trained_on', 0)
+        self.trained_at = bundle.get('trained_at')
+        self._compile()
+        return self
+
+    def score_samples(self, features):
+        """IsolationForest ``score_samples`` for a batch of feature rows (lower is more abnormal)."""
+        X = self._check(features).astype(np.float32)
+        nodes = np.broadcast_to(self._roots, (len(X), len(self._roots))).copy()
+        rows = np.arange(len(X))[:, None]
+        for _ in range(self._max_depth):
+            internal = self._left[nodes] >= 0
+            if not internal.any():
+                break
+            go_left = X[rows, self._feature[nodes]] <= self._threshold[nodes]
+            nodes = np.where(internal, np.where(go_left, self._left[nodes], self._right[nodes]), nodes)
+        depths = self._leaf_depth[nodes].sum(axis=1)
+        return -2.0 ** (-depths / self._denominator)
+
+    def score(self, features):
+        """Score a batch of feature rows: ``[{'anomaly_score', 'is_anomalous', 'analysis_complete'}]``."""
+        if not self.is_trained or len(features) == 0:
+            return [{"anomaly_score": 0.0, "is_anomalous": False, "analysis_complete": False}
+                    for _ in features]
+        scores = self.score_samples(features)
+        return [{
+            "anomaly_score": float(abs(s)),
+            "is_anomalous": bool(s < self.forest.offset_),
+            "analysis_complete": True
+        } for s in scores]
+
+    def _check(self, features):
+        X = np.asarray(features, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != N_FEATURES:
+            raise ValueError(f'expected rows of {N_FEATURES} features, got shape {X.shape}')
+        return X
+
+    def _compile(self):
+        """Concatenate every tree's nodes, with global feature indices and leaf path lengths."""
+        lefts, rights, features, thresholds, leaf_depths, roots = [], [], [], [], [], []
+        offset = 0
+        for tree, tree_features in zip(self.forest.estimators_, self.forest.estimators_features_):
+            t = tree.tree_
+            depth = np.zeros(t.node_count)
+            for node in range(t.node_count):  # children always follow their parent
+                if t.children_left[node] >= 0:
+                    depth[t.children_left[node]] = depth[t.children_right[node]] = depth[node] + 1
+            leaf = t.children_left < 0
+            lefts.append(np.where(leaf, -1, t.children_left + offset))
+            rights.append(np.where(leaf, -1, t.children_right + offset))
+            features.append(np.where(leaf, 0, np.asarray(tree_features)[np.maximum(t.feature, 0)]))
+            thresholds.append(t.threshold)
+            leaf_depths.append(depth + _average_path_length(t.n_node_samples))
+            roots.append(offset)
+            offset += t.node_count
+        self._left = np.concatenate(lefts)
+        self._right = np.concatenate(rights)
+        self._feature = np.concatenate(features)
+        self._threshold = np.concatenate(thresholds)
+        self._leaf_depth = np.concatenate(leaf_depths)
+        self._roots = np.array(roots)
+        self._max_depth = max(e.tree_.max_depth for e in self.forest.estimators_)
+        self._denominator = len(self.forest.estimators_) * _average_path_length([self.forest.max_samples_])[0]
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_detector():
+    """The process-wide detector, loaded once and reloaded only when the model file changes."""
+    global _detector
+    path = Config.ANOMALY_MODEL_PATH
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    if _detector is None or _detector.mtime != mtime:
+        with _detector_lock:
+            if _detector is None or _detector.mtime != mtime:
+                _detector = AnomalyDetector(path).load()
+    return _detector
+
+
+def score_batch(features):
+    """Score feature rows with the shared detector."""
+    return get_detector().score(features)
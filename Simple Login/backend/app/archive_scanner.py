@@ -0,0 +1,459 @@
+import bz2
+import codecs
+import gzip
+import hashlib
+import io
+import lzma
+import os
+import tarfile
+import tempfile
+import time
+import zipfile
+import zlib
+from concurrent.futures.process import BrokenProcessPool
+
+from config import Config
+from .checks import as_finding
+from .pickle_scanner import PickleStreamScanner, pickle_vulnerabilities
+from .rules import RuleEngine
+from .scan_pool import discard_scan_pool, get_scan_pool
+from .signature_scanner import SignatureMatcher, signature_vulnerabilities
+
+# Zip-bomb limits: uncompressed bytes actually read (a small multiple of the upload limit), bytes read per
+# compressed byte of the archive, files scanned, archives/compression layers nested
+MAX_TOTAL_BYTES = Config.ARCHIVE_MAX_TOTAL_BYTES
+MAX_RATIO = Config.ARCHIVE_MAX_RATIO
+# The ratio is only enforced past this many bytes; small files of zeros legitimately compress far better
+RATIO_MIN_BYTES = 64 * 1024 * 1024
+MAX_MEMBERS = 10000
+MAX_DEPTH = 5
+# Zips need random access, so a zip inside an archive is buffered in memory up to this size
+MAX_NESTED_ZIP_BYTES = 64 * 1024 * 1024
+# Top-level zips at least this large are split across a process pool
+PARALLEL_MIN_BYTES = 256 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+# A member being checked against the previous version is kept in memory up to this size, then on disk
+MAX_SPOOLED_BYTES = 64 * 1024 * 1024
+
+RULE_ENGINE = RuleEngine()
+# What a corrupt member (bad header, CRC or compressed data) raises while it is read
+_READ_ERRORS = (OSError, EOFError, zipfile.BadZipFile, zlib.error, tarfile.TarError, lzma.LZMAError)
+_DECOMPRESSORS = {'gzip': gzip.GzipFile, 'bz2': bz2.BZ2File, 'xz': lzma.LZMAFile}
+_SUFFIXES = ('.gz', '.tgz', '.bz2', '.xz')
+
+
+class ArchiveLimitExceeded(Exception):
+    pass
+
+
+def detect_kind(head):
+    """Classify a stream by its first bytes (at least 262 for tar detection)."""
+    if head[:4] == b'PK\x03\x04':
+        return 'zip'
+    if head[:2] == b'\x1f\x8b':
+        return 'gzip'
+    if head[:3] == b'BZh':
+        return 'bz2'
+    if head[:6] == b'\xfd7zXZ\x00':
+        return 'xz'
+    if head[257:262] == b'ustar':
+        return 'tar'
+    if head[:1] == b'\x80' and head[1:2] and 2 <= head[1] <= 5:
+        return 'pickle'
+    if b'\x00' not in head:
+        return 'text'
+    return 'binary'
+
+
+class _CountingReader(io.RawIOBase):
+    """Raw reader charging every byte to the scan's uncompressed-bytes budget (and to ``digest``, if given)."""
+
+    def __init__(self, f, scanner, digest=None):
+        self._f = f
+        self._scanner = scanner
+        self._position = 0
+        self.digest = digest
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self._position  # pickletools.genops reports opcode offsets from it
+
+    def readinto(self, b):
+        data = self._f.read(len(b))
+        self._scanner.consume(len(data))
+        self._position += len(data)
+        if self.digest is not None:
+            self.digest.update(data)
+        b[:len(data)] = data
+        return len(data)
+
+    def drain(self):
+        while self.read(CHUNK_SIZE):
+            pass
+
+
+class ArchiveScanner:
+    """Stream the members of zip/tar/gzip/bz2/xz archives and scan each one without extracting it.
+
+    Members are classified by magic bytes: archives and compressed streams
+    are recursed into (up to ``max_depth``), pickles go through the opcode
+    scanner, and everything else is matched against the byte signatures
+    (plus the metadata rules when it is text), one chunk at a time. Each
+    member gets a line in ``listing``; its findings point at that line and
+    carry the member path.
+
+    Top-level members of a zip or uncompressed tar are also recorded in
+    ``parts`` (sha256, size, their listing lines and findings). A member
+    whose entry in ``previous`` (the ``parts`` of an earlier version)
+    still matches is not scanned again: its findings are carried forward.
+    """
+
+    def __init__(self, max_total_bytes=MAX_TOTAL_BYTES, max_members=MAX_MEMBERS, max_depth=MAX_DEPTH, deadline=None,
+                 previous=None, max_ratio=MAX_RATIO, compressed_bytes=None):
+        self.max_total_bytes = max_total_bytes
+        self.max_ratio = max_ratio
+        self.compressed_bytes = compressed_bytes  # size on disk the ratio is measured against (default: the file)
+        self.max_members = max_members
+        self.max_depth = max_depth
+        self.deadline = deadline
+        self.previous = previous or {}
+        self.total_bytes = 0
+        self.listing = []
+        self.findings = []
+        self.parts = {}   # top-level member -> {'sha256', 'size', 'crc', 'listing', 'findings'}
+        self.reused = 0
+        self.stopped = None  # why scanning stopped before the end, if it did
+
+    def consume(self, n):
+        self.total_bytes += n
+        if self.total_bytes > self.max_total_bytes:
+            raise ArchiveLimitExceeded(f'more than {self.max_total_bytes} uncompressed bytes')
+        self._check_ratio(self.total_bytes)
+
+    def _check_ratio(self, total):
+        if self.compressed_bytes and total > RATIO_MIN_BYTES and total > self.max_ratio * self.compressed_bytes:
+            raise ArchiveLimitExceeded(f'{total} uncompressed bytes from {self.compressed_bytes} compressed bytes '
+                                       f'(more than {self.max_ratio:g}x)')
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def result(self):
+        return {'listing': self.listing, 'findings': self.findings, 'total_bytes': self.total_bytes, 'stopped': self.stopped,
+                'parts': self.parts, 'reused': self.reused}
+
+    def scan_file(self, file_path):
+        """Scan an archive on disk; limit and deadline stops are recorded, not raised."""
+        if self.compressed_bytes is None:
+            self.compressed_bytes = os.path.getsize(file_path)
+        try:
+            if zipfile.is_zipfile(file_path):
+                with zipfile.ZipFile(file_path) as zf:
+                    self.scan_zip(zf, '', 0)
+            elif _is_plain_tar(file_path):
+                self.scan_tar(file_path)
+            else:
+                with open(file_path, 'rb') as f:
+                    name = _strip_suffix(os.path.basename(file_path))
+                    self.scan_stream(io.BufferedReader(f, CHUNK_SIZE), name, 0, top=True)
+        except ArchiveLimitExceeded as e:
+            self._limit_exceeded(str(e))
+        except _READ_ERRORS as e:
+            self._malformed(e)
+        if self.expired() and self.stopped is None:
+            self.stopped = 'time budget ran out'
+        return self.result()
+
+    def scan_zip(self, zf, prefix, depth):
+        infos = [info for info in zf.infolist() if not info.is_dir()]
+        self._check_declared(infos)
+        for info in infos:
+            if self.expired():
+                return
+            try:
+                if not prefix:
+                    self.scan_part(info.filename, info.file_size, lambda info=info: zf.open(info), depth, info.CRC)
+                    continue
+                with zf.open(info) as member:
+                    reader = io.BufferedReader(_CountingReader(member, self), CHUNK_SIZE)
+                    self.scan_stream(reader, prefix + info.filename, depth)
+            except _READ_ERRORS as e:
+                self._malformed_member(prefix + info.filename, e)
+
+    def scan_tar(self, file_path):
+        """Scan a top-level uncompressed tar with random access, so unchanged members can be skipped."""
+        with tarfile.open(file_path, 'r:') as tar:
+            for info in tar:
+                if self.expired():
+                    return
+                if info.isfile():
+                    self.scan_part(info.name, info.size, lambda info=info: tar.extractfile(info), 1)
+
+    def scan_part(self, name, size, open_member, depth, crc=None):
+        """Scan one top-level member, or carry its findings forward if it is unchanged since ``previous``.
+
+        The member is read once. A likely-unchanged one (same size and CRC)
+        is hashed first while its bytes are spooled, and only the spool is
+        scanned if the hash turns out to differ; any other member is hashed
+        while it is scanned.
+        """
+        previous = self.previous.get(name)
+        with open_member() as member:
+            reader = _CountingReader(member, self, hashlib.sha256())
+            if previous and previous['size'] == size and previous.get('crc') == crc:
+                with tempfile.SpooledTemporaryFile(MAX_SPOOLED_BYTES) as spool:
+                    for chunk in iter(lambda: reader.read(CHUNK_SIZE), b''):
+                        spool.write(chunk)
+                    if reader.digest.hexdigest() == previous['sha256']:
+                        self._reuse(name, previous)
+                        return
+                    spool.seek(0)
+                    self._scan_part(name, size, crc, io.BufferedReader(spool, CHUNK_SIZE), depth, reader.digest)
+            else:
+                self._scan_part(name, size, crc, io.BufferedReader(reader, CHUNK_SIZE), depth, reader.digest,
+                                drain=reader.drain)
+
+    def _scan_part(self, name, size, crc, f, depth, digest, drain=None):
+        listing_start, findings_start = len(self.listing), len(self.findings)
+        self.scan_stream(f, name, depth)
+        if self.expired():
+            return  # Partly scanned: not recorded, so the next version scans it again
+        if drain is not None:
+            drain()  # Whatever the scan did not need still counts towards the hash
+        self.parts[name] = {
+            'sha256': digest.hexdigest(), 'size': size, 'crc': crc,
+            'listing': self.listing[listing_start:],
+            # Lines relative to the member's first listing line
+            'findings': [dict(finding, line=finding['line'] - listing_start) for finding in self.findings[findings_start:]]
+        }
+
+    def _reuse(self, name, part):
+        if len(self.listing) + len(part['listing']) > self.max_members:
+            raise ArchiveLimitExceeded(f'more than {self.max_members} members')
+        offset = len(self.listing)
+        self.listing.extend(part['listing'])
+        self.findings.extend(dict(finding, line=finding['line'] + offset) for finding in part['findings'])
+        self.parts[name] = part
+        self.reused += 1
+
+    def scan_stream(self, f, path, depth, top=False):
+        """Dispatch one member (or the top-level file) by its magic bytes."""
+        kind = detect_kind(f.peek(512)[:512])
+        if kind in _DECOMPRESSORS:
+            self._enter(path, depth, kind, listed=not top)
+            inner = io.BufferedReader(_CountingReader(_DECOMPRESSORS[kind](fileobj=f), self), CHUNK_SIZE)
+            self.scan_stream(inner, path if top else _strip_suffix(path), depth + 1, top=top)
+        elif kind == 'tar':
+            self._enter(path, depth, kind, listed=not top)
+            prefix = '' if top else path + '/'
+            with tarfile.open(fileobj=f, mode='r|') as tar:
+                for info in tar:
+                    if self.expired():
+                        return
+                    if info.isfile():
+                        member = io.BufferedReader(tar.extractfile(info), CHUNK_SIZE)
+                        self.scan_stream(member, prefix + info.name, depth + 1)
+        elif kind == 'zip':
+            self._enter(path, depth, kind)
+            data = f.read(MAX_NESTED_ZIP_BYTES + 1)
+            if len(data) > MAX_NESTED_ZIP_BYTES:
+                self._add(path, {
+                    'code': f"Nested zip larger than {MAX_NESTED_ZIP_BYTES} bytes was not scanned",
+                    'severity': 'LOW',
+                    'attack': 'Nested Archive Not Scanned'
+                })
+                return
+            with zipfile.ZipFile(io.BytesIO(data)) as zf:
+                self.scan_zip(zf, path + '/', depth + 1)
+        else:
+            self._list(path, kind)
+            self.scan_member(f, path, kind)
+
+    def scan_member(self, f, path, kind):
+        if kind == 'pickle':
+            result = PickleStreamScanner(deadline=self.deadline).scan(f, source=path)
+            for vuln in pickle_vulnerabilities(result):
+                self._add(path, vuln)
+            return
+        matcher = SignatureMatcher()
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore') if kind == 'text' else None
+        partial, line_no = '', 1
+        while not self.expired():
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            matcher.feed(chunk)
+            if decoder is not None:
+                *lines, partial = (partial + decoder.decode(chunk)).split('\n')
+                if len(partial) > CHUNK_SIZE:  # One huge line: scan what we have so far
+                    lines.append(partial)
+                    partial = ''
+                line_no = self._scan_lines(lines, path, line_no)
+        if partial:
+            self._scan_lines([partial], path, line_no)
+        for vuln in signature_vulnerabilities(matcher.hits()):
+            self._add(path, vuln)
+
+    def _scan_lines(self, lines, path, start):
+        for finding in RULE_ENGINE.findings_for_lines(lines, start):
+            self._add(path, {
+                'code': f"line {finding['line']}: {finding['code']}",
+                'severity': finding['severity'],
+                'attack': finding['attack']
+            })
+        return start + len(lines)
+
+    def _enter(self, path, depth, kind, listed=True):
+        if listed:
+            self._list(path, kind)
+        if depth + 1 > self.max_depth:
+            raise ArchiveLimitExceeded(f'archives nested more than {self.max_depth} levels deep at {path}')
+
+    def _list(self, path, kind):
+        if len(self.listing) >= self.max_members:
+            raise ArchiveLimitExceeded(f'more than {self.max_members} members')
+        self.listing.append(f"{path} [{kind}]")
+
+    def _check_declared(self, infos):
+        """Reject zips whose central directory already exceeds the limits (zip never inflates past it)."""
+        if len(self.listing) + len(infos) > self.max_members:
+            raise ArchiveLimitExceeded(f'more than {self.max_members} members')
+        declared = sum(info.file_size for info in infos)
+        if self.total_bytes + declared > self.max_total_bytes:
+            raise ArchiveLimitExceeded(f'{declared} declared uncompressed bytes exceed the limit of {self.max_total_bytes}')
+        self._check_ratio(self.total_bytes + declared)
+
+    def _add(self, path, vuln):
+        finding = as_finding(vuln, line=len(self.listing))
+        finding['code'] = f"{path}: {finding['code']}"
+        finding['member'] = path
+        self.findings.append(finding)
+
+    def _malformed(self, error):
+        self.findings.append({
+            'line': len(self.listing) or 1,
+            'code': f"Archive could not be read: {error}",
+            'severity': 'Medium',
+            'attack': 'Malformed Archive',
+            'cwe_id': 'CWE-20'
+        })
+
+    def _malformed_member(self, path, error):
+        """Record a member that could not be read and carry on with the next one."""
+        self._add(path, {
+            'line': len(self.listing) or 1,
+            'code': f"Member could not be read: {error}",
+            'severity': 'MEDIUM',
+            'attack': 'Malformed Archive Member',
+            'cwe_id': 'CWE-20'
+        })
+
+    def _limit_exceeded(self, reason):
+        self.stopped = reason
+        self.findings.append({
+            'line': len(self.listing) or 1,
+            'code': f"Archive scan stopped: {reason}",
+            'severity': 'High',
+            'attack': 'Archive Limits Exceeded (Possible Zip Bomb)',
+            'cwe_id': 'CWE-409'
+        })
+
+
+def _strip_suffix(name):
+    for suffix in _SUFFIXES:
+        if name.lower().endswith(suffix):
+            name = name[:-len(suffix)]
+            return name + '.tar' if suffix == '.tgz' else name
+    return name
+
+
+def _is_plain_tar(file_path):
+    with open(file_path, 'rb') as f:
+        return detect_kind(f.read(512)) == 'tar'
+
+
+def _scan_zip_members(file_path, names, max_total_bytes, max_members, max_depth, deadline, previous, max_ratio,
+                      compressed_bytes):
+    """Process-pool task: scan some members of a top-level zip (``compressed_bytes``: their size in the zip)."""
+    scanner = ArchiveScanner(max_total_bytes, max_members, max_depth, deadline, previous, max_ratio, compressed_bytes)
+    try:
+        with zipfile.ZipFile(file_path) as zf:
+            for name in names:
+                if scanner.expired():
+                    break
+                info = zf.getinfo(name)
+                try:
+                    scanner.scan_part(name, info.file_size, lambda: zf.open(info), 0, info.CRC)
+                except _READ_ERRORS as e:
+                    scanner._malformed_member(name, e)
+    except ArchiveLimitExceeded as e:
+        scanner._limit_exceeded(str(e))
+    except _READ_ERRORS as e:
+        scanner._malformed(e)
+    return scanner.result()
+
+
+def scan_archive(file_path, workers=None, deadline=None, max_total_bytes=MAX_TOTAL_BYTES,
+                 max_members=MAX_MEMBERS, max_depth=MAX_DEPTH, previous=None, max_ratio=MAX_RATIO):
+    """Scan every member of an archive.
+
+    Returns ``{'listing', 'findings', 'total_bytes', 'stopped', 'parts',
+    'reused'}``. Large top-level zips are split by uncompressed size across
+    the shared scan pool (zip members can be opened independently); tar and
+    compressed streams are inherently sequential and are scanned in one
+    pass. ``previous`` is the ``parts`` manifest of an earlier version of
+    the file: members that still match it are not rescanned. Reading more
+    than ``max_total_bytes``, or more than ``max_ratio`` times the size of
+    the archive itself, stops the scan.
+    """
+    previous = previous or {}
+    workers = workers or Config.SCAN_WORKERS or os.cpu_count() or 1
+    if workers > 1 and zipfile.is_zipfile(file_path):
+        with zipfile.ZipFile(file_path) as zf:
+            infos = [info for info in zf.infolist() if not info.is_dir()]
+        declared = sum(info.file_size for info in infos)
+        if declared >= PARALLEL_MIN_BYTES and len(infos) > 1:
+            scanner = ArchiveScanner(max_total_bytes, max_members, max_depth, deadline, previous, max_ratio,
+                                     os.path.getsize(file_path))
+            try:
+                scanner._check_declared(infos)
+            except ArchiveLimitExceeded as e:
+                scanner._limit_exceeded(str(e))
+                return scanner.result()
+            # Largest members first onto the least loaded worker
+            groups = [[] for _ in range(min(workers, len(infos)))]
+            loads = [0] * len(groups)
+            compressed = [0] * len(groups)
+            for info in sorted(infos, key=lambda i: i.file_size, reverse=True):
+                g = loads.index(min(loads))
+                groups[g].append(info.filename)
+                loads[g] += info.file_size
+                compressed[g] += info.compress_size
+            # Bytes beyond the declared sizes can only come from nested compression; share that headroom
+            headroom = (max_total_bytes - declared) // len(groups)
+            pool = get_scan_pool()
+            try:
+                parts = list(pool.map(_scan_zip_members, [file_path] * len(groups), groups,
+                                      [load + headroom for load in loads], [max_members] * len(groups),
+                                      [max_depth] * len(groups), [deadline] * len(groups),
+                                      [{name: previous[name] for name in group if name in previous} for group in groups],
+                                      [max_ratio] * len(groups), compressed))
+            except BrokenProcessPool:
+                discard_scan_pool(pool)
+                raise
+            for part in parts:
+                offset = len(scanner.listing)
+                scanner.listing.extend(part['listing'])
+                for finding in part['findings']:
+                    finding['line'] += offset
+                    scanner.findings.append(finding)
+                scanner.total_bytes += part['total_bytes']
+                scanner.parts.update(part['parts'])
+                scanner.reused += part['reused']
+                scanner.stopped = scanner.stopped or part['stopped']
+            if len(scanner.listing) > max_members and scanner.stopped is None:
+                scanner._limit_exceeded(f'more than {max_members} members')
+            return scanner.result()
+    return ArchiveScanner(max_total_bytes, max_members, max_depth, deadline, previous, max_ratio).scan_file(file_path)
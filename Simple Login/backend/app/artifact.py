@@ -0,0 +1,135 @@
+import os
+import threading
+
+import numpy as np
+
+from .checks import TORCH_EXTENSIONS
+from .loader_pool import get_loader_pool, LoaderError
+
+
+class ModelArtifact:
+    """One uploaded model file, shared by every stage of its scan and parsed at most once.
+
+    Views are built on first use and cached; stages run on different
+    threads, so each view is built under its own lock and different views
+    build concurrently. ``close()`` (or leaving a ``with`` block) ends the
+    scan without waiting: no new view can be taken from then on, and the
+    cached ones are dropped at once, or when the last function wrapped with
+    ``holding`` returns if one is still running (e.g. a stage abandoned by
+    its timeout). Such a stage should check ``closed`` and stop.
+
+    Untrusted pickles and TorchScript are only ever loaded in the sandboxed
+    loader pool (``introspection``), which hands back plain data such as the
+    tensor names, shapes and dtypes; no model is deserialized in this process.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.ext = os.path.splitext(file_path)[1].lower()
+        self.size = os.path.getsize(file_path)
+        self._views = {}
+        self._locks = {}  # view name -> lock held while that view is built
+        self._lock = threading.Lock()  # guards _views, _locks and _holders, never held during a build
+        self._holders = 0  # calls wrapped by holding() still running
+        self.closed = False
+
+    @classmethod
+    def of(cls, target):
+        """``target`` itself when it is already an artifact, else a new one for that path."""
+        return target if isinstance(target, cls) else cls(target)
+
+    def _view(self, name, build):
+        view = self._views.get(name, self._views)
+        if view is not self._views:
+            return view
+        with self._lock:
+            if self.closed:
+                raise ValueError(f'model artifact {self.file_path!r} is closed')
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            view = self._views.get(name, self._views)
+            if view is not self._views:
+                return view
+            view = build()
+            with self._lock:
+                if not self.closed:
+                    self._views[name] = view
+            return view
+
+    @property
+    def data(self):
+        """The raw bytes as a read-only uint8 memory map."""
+        return self._view('data', lambda: np.memmap(self.file_path, dtype=np.uint8, mode='r') if self.size
+                          else np.empty(0, dtype=np.uint8))
+
+    @property
+    def sha256(self):
+        from .scanner import calculate_file_hash
+        return self._view('sha256', lambda: calculate_file_hash(self.file_path))
+
+    @property
+    def code_lines(self):
+        """Readable lines recovered from the model (see ``scanner.extract_code_lines``)."""
+        from .scanner import extract_code_lines
+        return self._view('code_lines', lambda: extract_code_lines(self.file_path, self.ext, self))
+
+    @property
+    def introspection(self):
+        """The loader pool's one load of a torch file (code lines, type, tensor layout, input spec), or None.
+
+        A failed load is cached too, as ``{'error': message}``.
+        """
+        def load():
+            if self.ext not in TORCH_EXTENSIONS:
+                return None
+            try:
+                return get_loader_pool().load(self.file_path)
+            except LoaderError as e:
+                return {'error': str(e)}
+        return self._view('introspection', load)
+
+    @property
+    def input_spec(self):
+        """Best guess at the model's input (from the TorchScript schema or the first weight matrix), or None."""
+        return (self.introspection or {}).get('input_spec')
+
+    @property
+    def entropy(self):
+        from .entropy import entropy_profile
+        return self._view('entropy', lambda: entropy_profile(self.file_path, data=self.data))
+
+    def release(self, *names):
+        """Drop some views early (e.g. the memory map once every byte-level stage is done)."""
+        with self._lock:
+            for name in names:
+                self._views.pop(name, None)
+
+    def holding(self, func):
+        """``func`` wrapped so the cached views outlive ``close()`` until it returns."""
+        def call(*args, **kwargs):
+            with self._lock:
+                self._holders += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._holders -= 1
+                    if self.closed and not self._holders:
+                        self._drop()
+        return call
+
+    def _drop(self):
+        self._views.clear()
+        self._locks.clear()
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            if not self._holders:
+                self._drop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
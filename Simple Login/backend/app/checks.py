@@ -0,0 +1,171 @@
+import os
+import time
+
+from .findings import FindingSet
+
+# Metadata strings above this size are flagged by the format parsers (payloads, embedded files)
+LARGE_METADATA = 64 * 1024
+# Kept in the structural listings, per string
+LISTED_CHARS = 200
+
+# Cost classes; once the scan budget is spent only cheap checks still run
+CHEAP, MODERATE, EXPENSIVE = 'cheap', 'moderate', 'expensive'
+
+PICKLE_EXTENSIONS = ('.pkl', '.pickle', '.joblib')
+TORCH_EXTENSIONS = ('.pt', '.pth', '.pytorch')
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.gz', '.tgz', '.bz2', '.xz')
+ONNX_EXTENSIONS = ('.onnx',)
+TFLITE_EXTENSIONS = ('.tflite',)
+SAFETENSORS_EXTENSIONS = ('.safetensors',)
+GGUF_EXTENSIONS = ('.gguf',)
+TENSOR_FILE_EXTENSIONS = SAFETENSORS_EXTENSIONS + GGUF_EXTENSIONS
+KERAS_EXTENSIONS = ('.keras', '.h5', '.hdf5')
+# Formats with a dedicated parser; everything else is streamed as text
+STRUCTURED_EXTENSIONS = (PICKLE_EXTENSIONS + TORCH_EXTENSIONS + ARCHIVE_EXTENSIONS + ONNX_EXTENSIONS
+                         + TFLITE_EXTENSIONS + TENSOR_FILE_EXTENSIONS + KERAS_EXTENSIONS)
+
+
+class Check:
+    def __init__(self, name, func, extensions=None, cost=CHEAP, budget=None, exclude=()):
+        self.name = name
+        self.func = func
+        self.extensions = extensions
+        self.exclude = exclude
+        self.cost = cost
+        self.budget = budget
+
+    def applies_to(self, ext):
+        return (self.extensions is None or ext in self.extensions) and ext not in self.exclude
+
+
+# Checks in registration order, which is the order they run in
+CHECKS = []
+
+
+def register_check(name, extensions=None, cost=CHEAP, budget=None, exclude=()):
+    """Register a check: a generator ``func(ctx)`` yielding findings for one file.
+
+    ``extensions`` limits the check to those file types (default: all) and
+    ``exclude`` leaves some out, ``budget`` caps its wall time in seconds.
+    Registering a name again replaces the earlier check.
+    """
+    def decorator(func):
+        CHECKS[:] = [c for c in CHECKS if c.name != name]
+        CHECKS.append(Check(name, func, extensions, cost, budget, exclude))
+        return func
+    return decorator
+
+
+class ScanContext:
+    """State shared by the checks of one scan: file info, extracted code, findings and timings."""
+
+    def __init__(self, file_path, budget=None, previous_parts=None, artifact=None):
+        from .artifact import ModelArtifact
+        self.file_path = file_path
+        # Parsed views of the file shared with the other stages of the scan
+        self.artifact = artifact or ModelArtifact(file_path)
+        self.ext = os.path.splitext(file_path)[1].lower()
+        self.size = os.path.getsize(file_path)
+        self.started = time.monotonic()
+        self.deadline = None if budget is None else self.started + budget
+        self.check_deadline = self.deadline
+        self.code_lines = []
+        # Set when code_lines is an excerpt: the file line number of each entry
+        self.line_numbers = None
+        self.total_lines = None
+        self.documented = None
+        # Per-member manifest of the previous version of this file, and the one built by this scan
+        self.previous_parts = previous_parts
+        self.parts = None
+        self.reused_parts = 0
+        self.findings = FindingSet()
+        self.timings = {}  # check name -> seconds
+        self.status = {}   # check name -> complete | partial | skipped | failed
+        self.errors = {}
+
+    def remaining(self):
+        """Seconds left for the running check, or None when it is unbounded."""
+        if self.check_deadline is None:
+            return None
+        return max(0.0, self.check_deadline - time.monotonic())
+
+    def expired(self):
+        # A closed artifact means the scan was abandoned (its stage timed out): stop as if out of time
+        return (self.check_deadline is not None and time.monotonic() >= self.check_deadline) or self.artifact.closed
+
+    @property
+    def complete(self):
+        """True when no check was cut short or skipped by a time budget."""
+        return not any(status in ('partial', 'skipped') for status in self.status.values())
+
+
+def as_finding(vuln, line=1):
+    """Normalize a ``{'title', 'description', 'severity': 'HIGH', ...}`` result to the static finding shape."""
+    finding = {
+        'line': vuln.get('line', line),
+        'code': vuln.get('code', vuln.get('description', '')),
+        'severity': vuln.get('severity', 'LOW').title(),
+        'attack': vuln.get('attack', vuln.get('title'))
+    }
+    if vuln.get('cwe_id'):
+        finding['cwe_id'] = vuln['cwe_id']
+    if vuln.get('callable'):
+        finding['callable'] = vuln['callable']
+    return finding
+
+
+def run_checks(file_path, budget=None, skip=(), checks=None, previous_parts=None, artifact=None):
+    """Run every registered check that applies to the file, within the time budgets.
+
+    A check that outlives its own budget or the scan budget keeps the findings
+    it yielded so far and is marked partial; once the scan budget is spent,
+    remaining non-cheap checks are skipped. Returns the ScanContext with
+    ``findings`` (a FindingSet), ``code_lines`` and per-check ``timings`` and ``status``.
+    ``previous_parts`` lets checks that keep a per-member manifest skip unchanged members.
+    A shared ``artifact`` is left open for the caller; one made here is closed at the end.
+    """
+    ctx = ScanContext(file_path, budget, previous_parts, artifact)
+    for check in CHECKS if checks is None else checks:
+        if ctx.artifact.closed:
+            break
+        if check.name in skip or not check.applies_to(ctx.ext):
+            continue
+        start = time.monotonic()
+        over_budget = ctx.deadline is not None and start >= ctx.deadline
+        if over_budget and check.cost != CHEAP:
+            ctx.status[check.name] = 'skipped'
+            continue
+        limits = [] if over_budget else [ctx.deadline] if ctx.deadline is not None else []
+        if check.budget is not None:
+            limits.append(start + check.budget)
+        ctx.check_deadline = min(limits) if limits else None
+
+        status = 'complete'
+        results = check.func(ctx)
+        try:
+            for finding in results:
+                ctx.findings.add(finding)
+                if ctx.expired():
+                    break
+        except Exception as e:
+            status = 'failed'
+            ctx.errors[check.name] = str(e)
+        finally:
+            results.close()
+        if status == 'complete' and ctx.expired():
+            status = 'partial'
+        ctx.timings[check.name] = time.monotonic() - start
+        ctx.status[check.name] = status
+
+    incomplete = sorted(name for name, status in ctx.status.items() if status in ('partial', 'skipped'))
+    if incomplete:
+        ctx.findings.add({
+            'line': 1,
+            'code': f"Checks cut short by the time budget: {', '.join(incomplete)}",
+            'severity': 'Low',
+            'attack': 'Scan Time Budget Exhausted'
+        })
+    ctx.check_deadline = ctx.deadline
+    if artifact is None:
+        ctx.artifact.close()
+    return ctx
@@ -1,34 +1,144 @@
-import os
-import torch
+import threading
+import time
 import numpy as np
-from art.attacks.evasion import FastGradientMethod
-from art.estimators.classification import PyTorchClassifier
-from art.attacks.inference.membership_inference import MembershipInferenceBlackBoxRuleBased
-from art.utils import load_dataset
 import warnings
+from config import Config
+from .lazy import lazy_import
+
+# Imported on first use so the app can boot and serve requests without PyTorch/ART
+torch = lazy_import('torch')
+evasion = lazy_import('art.attacks.evasion')
+classification = lazy_import('art.estimators.classification')
+membership_inference = lazy_import('art.attacks.inference.membership_inference')
 
 # Suppress warnings for cleaner output
 warnings.filterwarnings('ignore')
 
-def check_adversarial_robustness(model, x_test, y_test):
-    """
-    Test model's susceptibility to adversarial examples using FGSM attack.
-    Returns: dict with results and recommendations.
-    """
-    results = {}
-    # Wrap the model with ART's PyTorchClassifier
-    classifier = PyTorchClassifier(
+# Perturbation sizes (L-inf, in input units) swept by the robustness curve
+DEFAULT_EPSILONS = (0.01, 0.05, 0.1, 0.2, 0.3)
+DEFAULT_ATTACKS = ('fgsm', 'pgd')
+# The flag and adversarial_accuracy are read at this epsilon
+FLAG_EPSILON = 0.2
+PGD_STEPS = 10
+
+# torch's intra-op thread count is process-wide: sweeps that change it run one at a time
+_threads_lock = threading.Lock()
+
+
+def _nb_classes(y):
+    return y.shape[1] if y.ndim == 2 else len(np.unique(y))
+
+
+def _classifier(model, input_shape, nb_classes, clip_values=None):
+    """ART wrapper for inference and gradients only: no optimizer, since nothing is trained."""
+    return classification.PyTorchClassifier(
         model=model,
         loss=torch.nn.CrossEntropyLoss(),
-        optimizer=torch.optim.Adam(model.parameters()),
-        input_shape=x_test.shape[1:],
-        nb_classes=len(np.unique(y_test))
+        input_shape=input_shape,
+        nb_classes=nb_classes,
+        clip_values=clip_values
     )
-    # Generate adversarial examples
-    attack = FastGradientMethod(estimator=classifier, eps=0.2)
-    x_test_adv = attack.generate(x=x_test)
-    # Evaluate accuracy on adversarial examples
-    acc = np.sum(np.argmax(classifier.predict(x_test_adv), axis=1) == np.argmax(y_test, axis=1)) / y_test.shape[0]
+
+
+class RobustnessEngine:
+    """Wrap a model once, then sweep attacks and epsilons over mini-batches of a test set.
+
+    FGSM at every epsilon reuses one loss gradient per batch (the step is
+    ``eps * sign(grad)``); iterative attacks (PGD, BIM) run per epsilon.
+    Predictions run under ``torch.inference_mode``. With ``threads`` (or
+    ROBUSTNESS_THREADS) set, the sweep holds a module lock and torch's
+    process-wide intra-op thread count is changed for its duration and then
+    restored, which also affects other stages running meanwhile; by default
+    the count is left alone.
+    """
+
+    ITERATIVE = {'pgd': 'ProjectedGradientDescent', 'bim': 'BasicIterativeMethod'}
+
+    def __init__(self, model, input_shape, nb_classes, batch_size=None, threads=None, clip_values=None):
+        model.eval()
+        self.model = model
+        self.clip_values = clip_values
+        self.classifier = _classifier(model, input_shape, nb_classes, clip_values)
+        self.batch_size = batch_size or Config.ROBUSTNESS_BATCH_SIZE
+        self.threads = threads or Config.ROBUSTNESS_THREADS or None
+
+    def predict(self, x):
+        with torch.inference_mode():
+            return self.model(torch.from_numpy(np.ascontiguousarray(x, dtype=np.float32))).argmax(1).numpy()
+
+    def _fgsm(self, x, grad_sign, eps):
+        x_adv = x + eps * grad_sign
+        if self.clip_values is not None:
+            x_adv = np.clip(x_adv, *self.clip_values)
+        return x_adv
+
+    def _iterative(self, name, eps):
+        return getattr(evasion, self.ITERATIVE[name])(
+            estimator=self.classifier, eps=eps, eps_step=eps / 4, max_iter=PGD_STEPS,
+            batch_size=self.batch_size, verbose=False
+        )
+
+    def sweep(self, x, y, epsilons=DEFAULT_EPSILONS, attacks=DEFAULT_ATTACKS):
+        """Accuracy on clean inputs and under each attack at each epsilon.
+
+        Returns ``{'clean_accuracy', 'curve': {attack: [{'eps', 'accuracy'}]},
+        'samples', 'seconds'}``.
+        """
+        unknown = set(attacks) - {'fgsm', *self.ITERATIVE}
+        if unknown:
+            raise ValueError(f"unknown attacks: {', '.join(sorted(unknown))}")
+        start = time.perf_counter()
+        labels = np.argmax(y, axis=1) if y.ndim == 2 else np.asarray(y)
+        correct = {(attack, eps): 0 for attack in attacks for eps in epsilons}
+        iterative = {(attack, eps): self._iterative(attack, eps)
+                     for attack in attacks if attack != 'fgsm' for eps in epsilons}
+        if self.threads is None:
+            clean = self._run(x, labels, attacks, epsilons, iterative, correct)
+        else:
+            with _threads_lock:
+                threads = torch.get_num_threads()
+                torch.set_num_threads(self.threads)
+                try:
+                    clean = self._run(x, labels, attacks, epsilons, iterative, correct)
+                finally:
+                    torch.set_num_threads(threads)
+        total = max(1, len(x))
+        return {
+            'clean_accuracy': clean / total,
+            'curve': {attack: [{'eps': eps, 'accuracy': correct[attack, eps] / total} for eps in epsilons]
+                      for attack in attacks},
+            'samples': len(x),
+            'seconds': time.perf_counter() - start
+        }
+
+
+    def _run(self, x, labels, attacks, epsilons, iterative, correct):
+        """Count correct predictions per batch into ``correct``; returns the clean count."""
+        clean = 0
+        for i in range(0, len(x), self.batch_size):
+            batch = np.ascontiguousarray(x[i:i + self.batch_size], dtype=np.float32)
+            truth = labels[i:i + self.batch_size]
+            clean += int(np.sum(self.predict(batch) == truth))
+            if 'fgsm' in attacks:
+                grad_sign = np.sign(self.classifier.loss_gradient(batch, truth))
+                for eps in epsilons:
+                    correct['fgsm', eps] += int(np.sum(self.predict(self._fgsm(batch, grad_sign, eps)) == truth))
+            for (attack, eps), method in iterative.items():
+                correct[attack, eps] += int(np.sum(self.predict(method.generate(x=batch, y=truth)) == truth))
+        return clean
+
+
+def check_adversarial_robustness(model, x_test, y_test, epsilons=DEFAULT_EPSILONS, attacks=DEFAULT_ATTACKS,
+                                 batch_size=None):
+    """
+    Test model's susceptibility to adversarial examples over a sweep of attacks and epsilons.
+    Returns: dict with the robustness curve, results and recommendations.
+    """
+    engine = RobustnessEngine(model, x_test.shape[1:], _nb_classes(y_test), batch_size=batch_size)
+    results = engine.sweep(x_test, y_test, tuple(sorted(set(epsilons) | {FLAG_EPSILON})), attacks)
+    # Flag on the worst accuracy at the flag epsilon across the attacks swept
+    acc = min(point['accuracy'] for curve in results['curve'].values() for point in curve
+              if point['eps'] == FLAG_EPSILON)
     results['adversarial_accuracy'] = acc
     if acc < 0.5:
         results['flag'] = True
@@ -47,14 +157,8 @@ def check_membership_inference(model, x_train, y_train, x_test, y_test):
     Returns: dict with results and recommendations.
     """
     results = {}
-    classifier = PyTorchClassifier(
-        model=model,
-        loss=torch.nn.CrossEntropyLoss(),
-        optimizer=torch.optim.Adam(model.parameters()),
-        input_shape=x_train.shape[1:],
-        nb_classes=len(np.unique(y_train))
-    )
-    attack = MembershipInferenceBlackBoxRuleBased(classifier)
+    classifier = _classifier(model, x_train.shape[1:], _nb_classes(y_train))
+    attack = membership_inference.MembershipInferenceBlackBoxRuleBased(classifier)
     attack.fit(x_train, y_train, x_test, y_test)
     inferred_train = attack.infer(x_train, y_train)
     inferred_test = attack.infer(x_test, y_test)
@@ -135,9 +239,11 @@ def check_api_authentication(api_url):
     except Exception as e:
         return {'flag': True, 'message': f'API call failed: {e}'}
 
-def run_dynamic_scanner(file_path):
+def run_dynamic_scanner(artifact):
     # Dummy implementation: replace with actual logic to load model and data
     # and call your dynamic checks (e.g., input validation, API checks, etc.)
+    # ``artifact`` is the scan's ModelArtifact: take tensor shapes from artifact.introspection['tensors'] and
+    # artifact.input_spec rather than loading the file again; models only ever load in the loader pool
     # Return a list of dicts, each with 'title', 'description', and optionally 'details'
     return [
         {
@@ -147,9 +253,10 @@ def run_dynamic_scanner(file_path):
         }
     ]
 
-def run_adversarial_scanner(file_path):
+def run_adversarial_scanner(artifact):
     # Dummy implementation: replace with actual logic to load model and data
     # and call your adversarial checks (e.g., adversarial robustness, membership inference, etc.)
+    # on the model shared through ``artifact`` (see run_dynamic_scanner)
     # Return a list of dicts, each with 'title', 'description', and optionally 'details'
     return [
         {
@@ -177,6 +284,8 @@ if __name__ == '__main__':
     y_test = np.eye(2)[np.random.randint(0, 2, 20)]
 
     print('Adversarial Robustness:', check_adversarial_robustness(model, x_test, y_test))
+    engine = RobustnessEngine(model, x_test.shape[1:], 2, batch_size=8)
+    print('Robustness curve:', engine.sweep(x_test, y_test, epsilons=(0.05, 0.1, 0.2), attacks=('fgsm', 'pgd', 'bim')))
     print('Membership Inference:', check_membership_inference(model, x_train, y_train, x_test, y_test))
     # For API checks, provide your actual API URL and test cases
     # print('API Input Validation:', check_input_validation('http://localhost:5000/predict', [{...}, {...}]))
@@ -0,0 +1,89 @@
+import math
+import os
+
+import numpy as np
+
+MIN_WINDOW = 4096
+MAX_WINDOWS = 4096
+# Bytes histogrammed per bincount call; bounds the int64 index temporaries to 8x this
+BATCH_BYTES = 8 * 1024 * 1024
+# From this window size on, one bincount per window beats the batched offset trick
+ROW_BINCOUNT_WINDOW = 64 * 1024
+HIGH_ENTROPY = 7.5  # bits per byte, typical of compressed or encrypted data
+
+
+def _entropy_table(window):
+    """``c * log2(c)`` for every possible byte count in a window."""
+    counts = np.arange(window + 1, dtype=np.float64)
+    table = np.zeros(window + 1)
+    table[1:] = counts[1:] * np.log2(counts[1:])
+    return table
+
+
+def _window_counts(block):
+    """Byte histogram of each row of a ``(rows, window)`` uint8 block."""
+    rows, window = block.shape
+    if window >= ROW_BINCOUNT_WINDOW:
+        counts = np.empty((rows, 256), dtype=np.intp)
+        for r in range(rows):
+            counts[r] = np.bincount(block[r], minlength=256)
+        return counts
+    # Small windows: offset each row into its own 256-bin range and count the batch at once
+    index = block.astype(np.intp)
+    index += (np.arange(rows, dtype=np.intp) * 256)[:, None]
+    return np.bincount(index.ravel(), minlength=rows * 256).reshape(rows, 256)
+
+
+def _window_entropy(block, table):
+    """Shannon entropy (bits/byte) of each row of a ``(rows, window)`` uint8 block."""
+    window = block.shape[1]
+    return math.log2(window) - table[_window_counts(block)].sum(axis=1) / window
+
+
+def entropy_profile(file_path, window=None, max_windows=MAX_WINDOWS, z_threshold=3.0, data=None):
+    """Entropy of every fixed-size window of the memory-mapped file, plus summary statistics.
+
+    The window grows with the file (to a power of two) so the profile never
+    exceeds ``max_windows`` values. Histograms come from ``bincount`` over
+    ``(rows, window)`` views of the map, one call per large window or one per
+    batch of small windows (with each row offset into its own 256 bins).
+    """
+    size = os.path.getsize(file_path)
+    profile = {
+        'size': size, 'window': 0, 'entropy': [], 'min': 0.0, 'max': 0.0, 'mean': 0.0,
+        'variance': 0.0, 'outlier_windows': 0, 'high_entropy_windows': 0
+    }
+    if size == 0:
+        return profile
+    if window is None:
+        window = max(MIN_WINDOW, 1 << math.ceil(math.log2(math.ceil(size / max_windows))))
+    window = min(window, size)
+
+    if data is None:
+        data = np.memmap(file_path, dtype=np.uint8, mode='r')
+    full = size // window
+    entropy = np.empty(full + (1 if size % window else 0))
+    table = _entropy_table(window)
+    rows_per_batch = max(1, BATCH_BYTES // window)
+    for start in range(0, full, rows_per_batch):
+        rows = min(rows_per_batch, full - start)
+        block = data[start * window:(start + rows) * window].reshape(rows, window)
+        entropy[start:start + rows] = _window_entropy(block, table)
+    if size % window:
+        tail = np.asarray(data[full * window:]).reshape(1, -1)
+        entropy[-1] = _window_entropy(tail, _entropy_table(tail.shape[1]))[0]
+    del data
+
+    std = entropy.std()
+    outliers = int((np.abs(entropy - entropy.mean()) > z_threshold * std).sum()) if std > 0 else 0
+    profile.update({
+        'window': window,
+        'entropy': np.round(entropy, 3).tolist(),
+        'min': float(entropy.min()),
+        'max': float(entropy.max()),
+        'mean': float(entropy.mean()),
+        'variance': float(entropy.var()),
+        'outlier_windows': outliers,
+        'high_entropy_windows': int((entropy > HIGH_ENTROPY).sum())
+    })
+    return profile
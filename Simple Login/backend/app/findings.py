@@ -0,0 +1,187 @@
+import json
+from array import array
+from collections import Counter
+
+# Line numbers recorded per kind of finding; later occurrences are only counted
+MAX_LINES_PER_KIND = 1000
+# Distinct codes kept per kind as examples
+MAX_EXAMPLES = 5
+
+
+def line_ranges(lines):
+    """Collapse line numbers into sorted ``[start, end]`` ranges."""
+    ranges = []
+    for line in sorted(set(lines)):
+        if ranges and line == ranges[-1][1] + 1:
+            ranges[-1][1] = line
+        else:
+            ranges.append([line, line])
+    return ranges
+
+
+class FindingSet:
+    """Static findings grouped by kind (attack, severity, CWE and, for pickle globals, the callable), stored column-wise.
+
+    Each kind is interned once; its occurrences are a count plus an
+    ``array`` of line numbers (capped), hits per archive member and a few
+    example codes, instead of one dict per hit. ``to_dicts`` materializes
+    one finding per kind with ``occurrences``, ``line_ranges`` and
+    ``members``, in the order kinds were first seen.
+    """
+
+    def __init__(self, max_lines=MAX_LINES_PER_KIND, max_examples=MAX_EXAMPLES):
+        self.max_lines = max_lines
+        self.max_examples = max_examples
+        self.kinds = []   # (attack, severity, cwe_id, callable)
+        self._ids = {}
+        self.counts = array('I')
+        self.lines = []   # per kind: array('I') of line numbers
+        self.examples = []  # per kind: [(line, code)]
+        self.members = []   # per kind: {archive member: hits} (capped like the lines)
+
+    def kind_id(self, attack, severity, cwe_id=None, callable=None):
+        key = (attack, severity, cwe_id, callable)
+        kind = self._ids.get(key)
+        if kind is None:
+            kind = self._ids[key] = len(self.kinds)
+            self.kinds.append(key)
+            self.counts.append(0)
+            self.lines.append(array('I'))
+            self.examples.append([])
+            self.members.append({})
+        return kind
+
+    def add(self, finding):
+        """Record one finding dict (``line``, ``code``, ``severity``, ``attack`` and optional ``cwe_id``/``callable``)."""
+        kind = self.kind_id(finding.get('attack'), finding.get('severity', 'Low'), finding.get('cwe_id'),
+                            finding.get('callable'))
+        self.add_hit(kind, finding.get('line') or 1, finding.get('code', ''), finding.get('occurrences', 1),
+                     finding.get('member'))
+
+    def add_hit(self, kind, line, code, occurrences=1, member=None):
+        self.counts[kind] += occurrences
+        if len(self.lines[kind]) < self.max_lines:
+            self.lines[kind].append(line)
+        members = self.members[kind]
+        if member is not None and (member in members or len(members) < self.max_lines):
+            members[member] = members.get(member, 0) + occurrences
+        examples = self.examples[kind]
+        if len(examples) < self.max_examples and all(code != seen for _, seen in examples):
+            examples.append((line, code))
+
+    def extend(self, findings):
+        for finding in findings:
+            self.add(finding)
+        return self
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self):
+        return iter(self.to_dicts())
+
+    def to_dicts(self):
+        """One finding dict per kind, ready for the API, the report and the database."""
+        findings = []
+        for kind, (attack, severity, cwe_id, callable) in enumerate(self.kinds):
+            count = self.counts[kind]
+            (line, code), others = self.examples[kind][0], self.examples[kind][1:]
+            if count > 1:
+                code = f"{code} (+{count - 1} more)"
+            finding = {'line': line, 'code': code, 'severity': severity, 'attack': attack}
+            if cwe_id:
+                finding['cwe_id'] = cwe_id
+            if callable:
+                finding['callable'] = callable
+            members = self.members[kind]
+            if count > 1:
+                finding['occurrences'] = count
+                finding['line_ranges'] = line_ranges(self.lines[kind])
+                finding['examples'] = [example for _, example in others]
+                if members:
+                    finding['members'] = dict(members)
+            elif members:
+                finding['member'] = next(iter(members))
+            findings.append(finding)
+        return findings
+
+
+def _grouping(finding):
+    """The occurrence fields of a finding dict, or of a stored row (where they live in ``details`` JSON)."""
+    if 'description' not in finding:
+        return finding
+    try:
+        details = json.loads(finding.get('details') or '{}')
+    except ValueError:
+        details = {}
+    return details if isinstance(details, dict) else {}
+
+
+def occurrence_keys(finding):
+    """Identity of each occurrence of a finding across scans, as a Counter.
+
+    Occurrences inside an archive are keyed by member, others by line;
+    hits past the recorded lines are counted under the kind alone.
+    Accepts both static finding dicts and ``Vulnerability.to_dict()`` rows.
+    """
+    attack = finding.get('attack') or finding.get('title')
+    grouping = _grouping(finding)
+    kind = (attack, str(finding.get('severity', 'Low')).title(), grouping.get('callable', finding.get('callable')))
+    count = grouping.get('occurrences', finding.get('occurrences', 1))
+    keys = Counter()
+    member = grouping.get('member', finding.get('member'))
+    if grouping.get('members'):
+        keys.update({(*kind, 'member', name): hits for name, hits in grouping['members'].items()})
+    elif member is not None:
+        keys[(*kind, 'member', member)] = count
+    elif grouping.get('line_ranges'):
+        keys.update((*kind, 'line', line) for start, end in grouping['line_ranges'] for line in range(start, end + 1))
+    else:
+        keys[(*kind, 'line', finding.get('line'))] = 1
+    recorded = sum(keys.values())
+    if count > recorded:
+        keys[(*kind, 'more')] = count - recorded
+    return keys
+
+
+def diff_findings(previous, current):
+    """``(new, resolved, unchanged)`` occurrences between two scans.
+
+    ``new`` holds the current findings with new occurrences and
+    ``resolved`` the previous ones with occurrences that are gone, each
+    with ``occurrences`` (and ``line_ranges``/``members``) narrowed to
+    those; ``unchanged`` counts the occurrences found in both.
+    """
+    before = [(finding, occurrence_keys(finding)) for finding in previous]
+    after = [(finding, occurrence_keys(finding)) for finding in current]
+    before_total = sum((keys for _, keys in before), Counter())
+    after_total = sum((keys for _, keys in after), Counter())
+
+    def changed(findings, other):
+        remaining = Counter(other)
+        out = []
+        for finding, keys in findings:
+            count, lines, members = 0, [], {}
+            for key, hits in keys.items():
+                matched = min(hits, remaining[key])
+                remaining[key] -= matched
+                if hits > matched:
+                    count += hits - matched
+                    if key[3] == 'line':
+                        lines.append(key[4])
+                    elif key[3] == 'member':
+                        members[key[4]] = hits - matched
+            if count:
+                entry = dict(finding, occurrences=count)
+                lines = [line for line in lines if line is not None]
+                if lines and ('line_ranges' in finding or len(lines) > 1):
+                    entry['line_ranges'] = line_ranges(lines)
+                else:
+                    entry.pop('line_ranges', None)
+                if members:
+                    entry['members'] = members
+                out.append(entry)
+        return out
+
+    unchanged = sum((before_total & after_total).values())
+    return changed(after, before_total), changed(before, after_total), unchanged
@@ -0,0 +1,268 @@
+import math
+import mmap
+import os
+import struct
+from collections import Counter
+
+import numpy as np
+
+from .checks import LARGE_METADATA, LISTED_CHARS
+from .safetensors_scanner import MAX_HEADER_BYTES, SUSPICIOUS_METADATA, HeaderError, OversizedHeader
+
+MAGIC = b'GGUF'
+DEFAULT_ALIGNMENT = 32
+# GGML_MAX_DIMS
+MAX_DIMS = 4
+
+# GGUF metadata value types: struct format of the fixed-size ones
+_SCALARS = {0: 'B', 1: 'b', 2: 'H', 3: 'h', 4: 'I', 5: 'i', 6: 'f', 7: '?', 10: 'Q', 11: 'q', 12: 'd'}
+_STRING, _ARRAY = 8, 9
+
+# ggml tensor types: name, elements per block, bytes per block, numpy dtype for unquantized ones
+GGML_TYPES = {
+    0: ('F32', 1, 4, np.float32), 1: ('F16', 1, 2, np.float16),
+    2: ('Q4_0', 32, 18, None), 3: ('Q4_1', 32, 20, None), 6: ('Q5_0', 32, 22, None), 7: ('Q5_1', 32, 24, None),
+    8: ('Q8_0', 32, 34, None), 9: ('Q8_1', 32, 36, None), 10: ('Q2_K', 256, 84, None), 11: ('Q3_K', 256, 110, None),
+    12: ('Q4_K', 256, 144, None), 13: ('Q5_K', 256, 176, None), 14: ('Q6_K', 256, 210, None), 15: ('Q8_K', 256, 292, None),
+    16: ('IQ2_XXS', 256, 66, None), 17: ('IQ2_XS', 256, 74, None), 18: ('IQ3_XXS', 256, 98, None),
+    19: ('IQ1_S', 256, 50, None), 20: ('IQ4_NL', 32, 18, None), 21: ('IQ3_S', 256, 110, None),
+    22: ('IQ2_S', 256, 82, None), 23: ('IQ4_XS', 256, 136, None), 24: ('I8', 1, 1, np.int8),
+    25: ('I16', 1, 2, np.int16), 26: ('I32', 1, 4, np.int32), 27: ('I64', 1, 8, np.int64),
+    28: ('F64', 1, 8, np.float64), 29: ('IQ1_M', 256, 56, None), 30: ('BF16', 1, 2, None),
+    34: ('TQ1_0', 256, 54, None), 35: ('TQ2_0', 256, 66, None), 39: ('MXFP4', 32, 17, None),
+}
+
+
+class _Reader:
+    """Sequential, bounds-checked reads of GGUF primitives from a buffer."""
+
+    def __init__(self, buf, endian='<'):
+        self.buf = buf
+        self.pos = 0
+        self.endian = endian
+
+    def read(self, fmt):
+        fmt = self.endian + fmt
+        size = struct.calcsize(fmt)
+        if self.pos + size > len(self.buf):
+            raise HeaderError(f'header runs past the end of the file at byte {self.pos}')
+        if self.pos > MAX_HEADER_BYTES:
+            raise OversizedHeader(f'metadata extends past {MAX_HEADER_BYTES} bytes')
+        (value,) = struct.unpack_from(fmt, self.buf, self.pos)
+        self.pos += size
+        return value
+
+    def skip(self, size):
+        if self.pos + size > len(self.buf):
+            raise HeaderError(f'header runs past the end of the file at byte {self.pos}')
+        if self.pos + size > MAX_HEADER_BYTES:
+            raise OversizedHeader(f'metadata extends past {MAX_HEADER_BYTES} bytes')
+        start = self.pos
+        self.pos += size
+        return start
+
+    def string(self):
+        length = self.read('Q')
+        start = self.skip(length)
+        return bytes(self.buf[start:start + length]).decode('utf-8', errors='replace')
+
+    def _skip_strings(self, count):
+        # Tight loop over the length prefixes: vocabularies hold 100k+ strings
+        unpack, buf, pos = struct.Struct(self.endian + 'Q').unpack_from, self.buf, self.pos
+        try:
+            for _ in range(count):
+                pos += 8 + unpack(buf, pos)[0]
+                if pos > MAX_HEADER_BYTES:
+                    raise OversizedHeader(f'metadata extends past {MAX_HEADER_BYTES} bytes')
+        except struct.error:
+            raise HeaderError(f'header runs past the end of the file at byte {pos}')
+        if pos > len(buf):
+            raise HeaderError(f'header runs past the end of the file at byte {pos}')
+        self.pos = pos
+
+    def value(self, kind):
+        """Read a metadata value; arrays become ``(element type, count)`` and are skipped over."""
+        if kind in _SCALARS:
+            return self.read(_SCALARS[kind])
+        if kind == _STRING:
+            return self.string()
+        if kind == _ARRAY:
+            element, count = self.read('I'), self.read('Q')
+            if element in _SCALARS:
+                self.skip(count * struct.calcsize(_SCALARS[element]))
+            elif element == _STRING:
+                self._skip_strings(count)
+            elif element == _ARRAY:
+                for _ in range(count):
+                    self.value(element)
+            else:
+                raise HeaderError(f'unknown array element type {element}')
+            return (element, count)
+        raise HeaderError(f'unknown metadata value type {kind}')
+
+
+def read_header(file_path):
+    """Parse the metadata and tensor infos of a GGUF file through a memory map.
+
+    Returns ``{'version', 'alignment', 'data_start', 'metadata', 'tensors'}``;
+    metadata is a list of ``(key, type, value)`` with arrays summarized as
+    ``(element type, count)``, and each tensor is a dict with ``name``,
+    ``type``, ``dims`` and absolute ``start``/``end`` offsets (``end`` is
+    None for unknown tensor types). Tensor data is never touched.
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < 24:
+            raise HeaderError('file too small for a GGUF header')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:4] != MAGIC:
+                raise HeaderError(f'bad magic {bytes(mm[:4])!r}')
+            reader = _Reader(mm)
+            reader.pos = 4
+            version = reader.read('I')
+            if version > 0xffff:  # Big-endian files (allowed since v3)
+                reader.endian = '>'
+                version = struct.unpack_from('>I', mm, 4)[0]
+            if version not in (2, 3):
+                raise HeaderError(f'unsupported GGUF version {version}')
+            tensor_count, kv_count = reader.read('Q'), reader.read('Q')
+            # Every entry takes at least 12 bytes, so counts beyond that cannot be real
+            if (tensor_count + kv_count) * 12 > len(mm):
+                raise HeaderError(f'{tensor_count} tensors and {kv_count} metadata entries cannot fit the file')
+
+            metadata, alignment = [], DEFAULT_ALIGNMENT
+            for _ in range(kv_count):
+                key = reader.string()
+                kind = reader.read('I')
+                value = reader.value(kind)
+                metadata.append((key, kind, value))
+                if key == 'general.alignment' and kind == 4:
+                    if value == 0 or value & (value - 1):
+                        raise HeaderError(f'general.alignment {value} is not a power of two')
+                    alignment = value
+
+            infos = []
+            for _ in range(tensor_count):
+                name = reader.string()
+                n_dims = reader.read('I')
+                if n_dims > MAX_DIMS:
+                    raise HeaderError(f'tensor {name[:LISTED_CHARS]!r} declares {n_dims} dimensions')
+                dims = [reader.read('Q') for _ in range(n_dims)]
+                infos.append((name, reader.read('I'), dims, reader.read('Q')))
+                if reader.pos > MAX_HEADER_BYTES:
+                    raise OversizedHeader(f'tensor infos extend past {MAX_HEADER_BYTES} bytes')
+            data_start = -(-reader.pos // alignment) * alignment
+
+    tensors = []
+    for name, kind, dims, offset in infos:
+        start = data_start + offset
+        end = None
+        if kind in GGML_TYPES:
+            _, block, block_bytes, _ = GGML_TYPES[kind]
+            end = start + math.prod(dims) // block * block_bytes
+        tensors.append({'name': name, 'type': kind, 'dims': dims, 'start': start, 'end': end})
+    return {'version': version, 'alignment': alignment, 'data_start': data_start,
+            'metadata': metadata, 'tensors': tensors}
+
+
+def scan_gguf(file_path):
+    """Validate GGUF metadata and tensor infos against the file size, without reading tensor data.
+
+    Flags oversized or malformed headers, tensors that overlap or fall
+    outside the file, unreferenced bytes beyond alignment padding, large
+    metadata strings and suspicious ones (e.g. chat templates that reach
+    for Python internals). Returns ``{'listing', 'findings'}``.
+    """
+    listing, findings = [], []
+
+    def add(line, code, severity, attack, cwe_id=None):
+        finding = {'line': line, 'code': code, 'severity': severity, 'attack': attack}
+        if cwe_id:
+            finding['cwe_id'] = cwe_id
+        findings.append(finding)
+
+    file_size = os.path.getsize(file_path)
+    try:
+        header = read_header(file_path)
+    except OversizedHeader as e:
+        add(1, f"Could not read GGUF header: {e}", 'High', 'Oversized Model Header', 'CWE-400')
+        return {'listing': [f'<Could not parse GGUF header: {e}>'], 'findings': findings}
+    except (HeaderError, OSError, ValueError) as e:
+        add(1, f"Could not read GGUF header: {e}", 'Medium', 'Malformed GGUF Header', 'CWE-20')
+        return {'listing': [f'<Could not parse GGUF header: {e}>'], 'findings': findings}
+
+    tensors, alignment = header['tensors'], header['alignment']
+    types = Counter(GGML_TYPES.get(t['type'], (f"type {t['type']}",))[0] for t in tensors)
+    listing.append(f"gguf version: {header['version']}")
+    listing.append(f"header: {header['data_start']} bytes, alignment {alignment}")
+    listing.append(f"tensors: {len(tensors)} holding {sum(t['end'] - t['start'] for t in tensors if t['end'])} bytes")
+    listing.append('types: ' + ', '.join(f"{name} x{n}" for name, n in sorted(types.items())))
+
+    for key, kind, value in header['metadata']:
+        key = key[:LISTED_CHARS]
+        if kind == _ARRAY:
+            listing.append(f"metadata {key}: array of {value[1]}")
+            continue
+        listing.append(f"metadata {key}: {str(value)[:LISTED_CHARS]}")
+        if kind != _STRING:
+            continue
+        if len(value) > LARGE_METADATA:
+            add(len(listing), f"{key} holds {len(value)} bytes", 'Medium', 'Large Embedded Metadata', 'CWE-506')
+        match = SUSPICIOUS_METADATA.search(value)
+        if match:
+            add(len(listing), f"{key} contains {match.group(0)!r}", 'High' if 'template' in key else 'Medium',
+                'Suspicious Model Metadata', 'CWE-94')
+
+    def tensor_finding(tensor, problem, severity, attack, cwe_id):
+        listing.append(f"tensor {tensor['name'][:LISTED_CHARS]}: {GGML_TYPES.get(tensor['type'], ('?',))[0]} "
+                       f"{tensor['dims']} bytes {tensor['start']}-{tensor['end']}")
+        add(len(listing), f"Tensor {tensor['name'][:LISTED_CHARS]!r} {problem}", severity, attack, cwe_id)
+
+    previous, covered = None, header['data_start']
+    for tensor in sorted(tensors, key=lambda t: t['start']):
+        if tensor['end'] is None:
+            tensor_finding(tensor, f"has unknown ggml type {tensor['type']}", 'Low', 'Malformed GGUF Header', 'CWE-20')
+            continue
+        block = GGML_TYPES[tensor['type']][1]
+        if tensor['dims'] and tensor['dims'][0] % block:
+            tensor_finding(tensor, f"has a row size not divisible by its block size {block}", 'High',
+                           'Inconsistent Tensor Extent', 'CWE-130')
+        if (tensor['start'] - header['data_start']) % alignment:
+            tensor_finding(tensor, f"is not aligned to {alignment} bytes", 'Low', 'Malformed GGUF Header', 'CWE-20')
+        covered = max(covered, min(tensor['end'], file_size))
+        if tensor['end'] > file_size:
+            tensor_finding(tensor, f"extends past the end of a {file_size}-byte file", 'High',
+                           'Out-of-Bounds Tensor Offset', 'CWE-125')
+            continue
+        if previous is not None and tensor['start'] < previous['end']:
+            tensor_finding(tensor, f"overlaps {previous['name'][:LISTED_CHARS]!r}", 'High',
+                           'Overlapping Tensor Data', 'CWE-119')
+        elif tensor['start'] - (previous['end'] if previous else header['data_start']) >= alignment:
+            gap = tensor['start'] - (previous['end'] if previous else header['data_start'])
+            tensor_finding(tensor, f"is preceded by {gap} unreferenced bytes", 'Medium',
+                           'Unreferenced Data in Model File', 'CWE-506')
+        if previous is None or tensor['end'] > previous['end']:
+            previous = tensor
+    if file_size - covered >= alignment:
+        listing.append(f"trailing data: {file_size - covered} bytes")
+        add(len(listing), f"{file_size - covered} bytes after the last tensor", 'Medium',
+            'Unreferenced Data in Model File', 'CWE-506')
+    return {'listing': listing, 'findings': findings}
+
+
+def tensor_views(file_path):
+    """Memory-mapped, zero-copy views of every in-bounds tensor, keyed by name.
+
+    Unquantized tensors get their numpy dtype and shape (GGUF lists the
+    fastest-varying dimension first, so dims are reversed); quantized and
+    BF16 tensors are raw ``uint8`` block data.
+    """
+    header = read_header(file_path)
+    data = np.memmap(file_path, dtype=np.uint8, mode='r')
+    views = {}
+    for tensor in header['tensors']:
+        if tensor['end'] is None or tensor['end'] > len(data):
+            continue
+        raw = data[tensor['start']:tensor['end']]
+        dtype = GGML_TYPES[tensor['type']][3]
+        views[tensor['name']] = raw if dtype is None else raw.view(dtype).reshape(tensor['dims'][::-1])
+    return views
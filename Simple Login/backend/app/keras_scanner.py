@@ -0,0 +1,204 @@
+import base64
+import binascii
+import json
+import mmap
+import re
+import zipfile
+
+from .checks import LISTED_CHARS
+
+HDF5_MAGIC = b'\x89HDF\r\n\x1a\n'
+# config.json of a .keras archive above this is refused (a real one is a few MB at most)
+MAX_CONFIG_BYTES = 64 * 1024 * 1024
+
+# Built-in Keras 2 layer and model classes; Keras 3 configs name their module instead
+KERAS_CLASSES = set('''
+Sequential Functional Model InputLayer Input Dense Activation Dropout Flatten Reshape Permute RepeatVector
+Lambda TFOpLambda SlicingOpLambda ActivityRegularization Masking Embedding Conv1D Conv2D Conv3D
+Conv1DTranspose Conv2DTranspose Conv3DTranspose SeparableConv1D SeparableConv2D DepthwiseConv1D
+DepthwiseConv2D Cropping1D Cropping2D Cropping3D UpSampling1D UpSampling2D UpSampling3D ZeroPadding1D
+ZeroPadding2D ZeroPadding3D MaxPooling1D MaxPooling2D MaxPooling3D AveragePooling1D AveragePooling2D
+AveragePooling3D GlobalMaxPooling1D GlobalMaxPooling2D GlobalMaxPooling3D GlobalAveragePooling1D
+GlobalAveragePooling2D GlobalAveragePooling3D LocallyConnected1D LocallyConnected2D RNN SimpleRNN GRU
+LSTM SimpleRNNCell GRUCell LSTMCell StackedRNNCells ConvLSTM1D ConvLSTM2D ConvLSTM3D Bidirectional
+TimeDistributed Add Subtract Multiply Average Maximum Minimum Concatenate Dot BatchNormalization
+LayerNormalization GroupNormalization UnitNormalization SpectralNormalization ReLU LeakyReLU PReLU ELU
+ThresholdedReLU Softmax GaussianNoise GaussianDropout AlphaDropout SpatialDropout1D SpatialDropout2D
+SpatialDropout3D Attention AdditiveAttention MultiHeadAttention GroupQueryAttention Rescaling
+Normalization Resizing CenterCrop Discretization CategoryEncoding Hashing HashedCrossing IntegerLookup
+StringLookup TextVectorization RandomFlip RandomRotation RandomZoom RandomContrast RandomCrop
+RandomTranslation RandomBrightness RandomHeight RandomWidth Identity EinsumDense Wrapper
+'''.split())
+KERAS_MODULES = ('keras', 'tensorflow', 'tf_keras')
+# Modules whose functions can run commands or code if a config names them
+DANGEROUS_MODULES = {'os', 'posix', 'nt', 'subprocess', 'builtins', '__builtin__', 'sys', 'shutil', 'socket',
+                     'importlib', 'runpy', 'pty', 'ctypes', 'pickle', 'marshal', 'code', 'codeop'}
+# Identifiers inside serialized bytecode worth naming in a finding
+SUSPICIOUS_NAMES = {'os', 'system', 'popen', 'subprocess', 'eval', 'exec', 'compile', '__import__', 'open',
+                    'socket', 'getattr', 'globals', 'builtins', 'spawn', 'remove', 'rmtree', 'urlopen', 'requests'}
+# Config keys that hold layers (models, wrappers and RNNs nest them)
+LAYER_KEYS = {'layers', 'layer', 'forward_layer', 'backward_layer', 'cell', 'cells'}
+_BASE64 = re.compile(r'^[A-Za-z0-9+/=\s]{24,}$')
+_IDENTIFIER = re.compile(rb'[A-Za-z_][A-Za-z0-9_]{1,}')
+
+
+class KerasConfigError(ValueError):
+    pass
+
+
+def _hdf5_config_fallback(file_path):
+    """Find the model_config attribute by its JSON shape when h5py is not installed."""
+    with open(file_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            decoder = json.JSONDecoder()
+            pos = mm.find(b'{"class_name"')
+            while pos != -1:
+                end = mm.find(b'\0', pos, pos + MAX_CONFIG_BYTES)
+                text = bytes(mm[pos:end if end != -1 else pos + MAX_CONFIG_BYTES]).decode('utf-8', errors='replace')
+                try:
+                    config, _ = decoder.raw_decode(text)
+                    if isinstance(config, dict) and 'config' in config:
+                        return config, {}
+                except ValueError:
+                    pass
+                pos = mm.find(b'{"class_name"', pos + 1)
+    return None, {}
+
+
+def read_keras_config(file_path):
+    """Return ``(config, info)`` for a .keras archive or an HDF5 model, reading no weights.
+
+    ``config`` is the parsed model config (None for weights-only files) and
+    ``info`` holds the container kind, Keras version and backend when known.
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(8)
+    if head.startswith(b'PK'):
+        with zipfile.ZipFile(file_path) as archive:
+            names = set(archive.namelist())
+            if 'config.json' not in names:
+                return None, {'container': 'zip'}
+            entry = archive.getinfo('config.json')
+            if entry.file_size > MAX_CONFIG_BYTES:
+                raise KerasConfigError(f'config.json declares {entry.file_size} bytes')
+            config = json.loads(archive.read(entry))
+            info = {'container': 'zip'}
+            if 'metadata.json' in names and archive.getinfo('metadata.json').file_size < 1024 * 1024:
+                metadata = json.loads(archive.read('metadata.json'))
+                info.update(keras_version=metadata.get('keras_version'))
+            return config, info
+    if head != HDF5_MAGIC:
+        raise KerasConfigError('neither a .keras zip archive nor an HDF5 file')
+    try:
+        import h5py  # Only HDF5 models pay for it
+    except ImportError:  # Falls back to locating the model_config JSON in the raw file
+        config, info = _hdf5_config_fallback(file_path)
+        return config, dict(info, container='hdf5 (raw search)')
+    with h5py.File(file_path, 'r') as model:
+        attrs = model.attrs
+        info = {'container': 'hdf5'}
+        for key in ('keras_version', 'backend'):
+            if key in attrs:
+                value = attrs[key]
+                info[key] = value.decode() if isinstance(value, bytes) else str(value)
+        if 'model_config' not in attrs:
+            return None, info
+        raw = attrs['model_config']
+    return json.loads(raw.decode('utf-8') if isinstance(raw, bytes) else raw), info
+
+
+def walk_config(node, path='model', is_layer=True):
+    """Yield ``(path, dict, is_layer)`` for every serialized object (anything with a ``class_name``) in a config."""
+    if isinstance(node, dict):
+        if 'class_name' in node:
+            name = node.get('config', {}).get('name') if isinstance(node.get('config'), dict) else None
+            path = f"{path}/{name}" if name else path
+            yield path, node, is_layer
+        for key, value in node.items():
+            yield from walk_config(value, path, key in LAYER_KEYS)
+    elif isinstance(node, list):
+        for value in node:
+            yield from walk_config(value, path, is_layer)
+
+
+def _strings(node):
+    if isinstance(node, str):
+        yield node
+    elif isinstance(node, dict):
+        for value in node.values():
+            yield from _strings(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _strings(value)
+
+
+def _bytecode(text):
+    """Decoded marshal data if ``text`` is a base64-encoded Python code object, else None."""
+    if not _BASE64.match(text):
+        return None
+    try:
+        raw = base64.b64decode(''.join(text.split()), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    # marshal TYPE_CODE, with or without FLAG_REF
+    return raw if raw[:1] in (b'c', b'\xe3') else None
+
+
+def scan_keras(file_path):
+    """Walk the layer graph of a Keras model config for Lambda layers, custom objects and bytecode.
+
+    Only ``config.json`` (.keras) or the ``model_config`` attribute (HDF5) is
+    read. Returns ``{'listing', 'findings'}``.
+    """
+    listing, findings = [], []
+
+    def add(line, code, severity, attack, cwe_id=None):
+        finding = {'line': line, 'code': code, 'severity': severity, 'attack': attack}
+        if cwe_id:
+            finding['cwe_id'] = cwe_id
+        findings.append(finding)
+
+    try:
+        config, info = read_keras_config(file_path)
+    except (KerasConfigError, OSError, ValueError, zipfile.BadZipFile) as e:
+        add(1, f"Could not read Keras model config: {e}", 'Medium', 'Malformed Keras Model', 'CWE-20')
+        return {'listing': [f'<Could not parse Keras model: {e}>'], 'findings': findings}
+
+    listing.append(f"container: {info['container']}")
+    listing.append(f"keras version: {info.get('keras_version') or '-'}, backend: {info.get('backend') or '-'}")
+    if not isinstance(config, dict):
+        listing.append('<no model config: weights-only file>')
+        return {'listing': listing, 'findings': findings}
+
+    for path, obj, is_layer in walk_config(config):
+        class_name = str(obj.get('class_name'))
+        module = obj.get('module')
+        listing.append(f"{path[:LISTED_CHARS]}: {class_name[:LISTED_CHARS]}" + (f" ({module})" if module else ''))
+        line = len(listing)
+        if class_name == 'Lambda':
+            add(line, f"Lambda {path[:LISTED_CHARS]} runs arbitrary Python when the model is loaded or called",
+                'High', 'Keras Lambda Layer', 'CWE-94')
+        elif class_name == 'function' and module:
+            target = f"{module}.{obj.get('config')}"[:LISTED_CHARS]
+            if module.split('.')[0] in DANGEROUS_MODULES:
+                add(line, f"{path[:LISTED_CHARS]} references {target}", 'High', 'Unsafe Function Reference', 'CWE-94')
+            elif not module.startswith(KERAS_MODULES):
+                add(line, f"{path[:LISTED_CHARS]} references {target}", 'Medium', 'Custom Keras Object', 'CWE-829')
+        elif module is not None:
+            # Keras 3: every object names its module; registered custom objects read "package>Name"
+            registered = obj.get('registered_name')
+            if not module.startswith(KERAS_MODULES) or (registered and registered != class_name):
+                add(line, f"{class_name[:LISTED_CHARS]} from {module} ({registered}) needs custom code to load",
+                    'Medium', 'Custom Keras Object', 'CWE-829')
+        elif '>' in class_name or (is_layer and class_name not in KERAS_CLASSES):
+            add(line, f"{class_name[:LISTED_CHARS]} is not a built-in Keras class", 'Medium', 'Custom Keras Object', 'CWE-829')
+
+    for text in _strings(config):
+        code = _bytecode(text)
+        if code is None:
+            continue
+        names = sorted({n.decode() for n in _IDENTIFIER.findall(code)} & SUSPICIOUS_NAMES)
+        listing.append(f"bytecode: {len(code)} bytes" + (f" naming {', '.join(names)}" if names else ''))
+        add(len(listing), f"Serialized Python bytecode ({len(code)} bytes)" + (f" using {', '.join(names)}" if names else ''),
+            'High', 'Serialized Python Bytecode', 'CWE-502')
+    return {'listing': listing, 'findings': findings}
@@ -0,0 +1,67 @@
+import importlib
+import threading
+import time
+import types
+
+# Every module declared with lazy_import, and how long each took to actually import
+_registry = {}
+_timings = {}
+
+
+class LazyModule(types.ModuleType):
+    """Stand-in for a heavy module, imported the first time one of its attributes is used."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+        self.__dict__['_lazy_lock'] = threading.Lock()
+
+    @property
+    def is_loaded(self):
+        return self.__dict__['_lazy_module'] is not None
+
+    def load(self):
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            with self.__dict__['_lazy_lock']:
+                module = self.__dict__['_lazy_module']
+                if module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self.__name__)
+                    _timings[self.__name__] = time.perf_counter() - start
+                    self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __dir__(self):
+        return dir(self.load())
+
+    def __repr__(self):
+        state = 'loaded' if self.is_loaded else 'not loaded'
+        return f'<lazy module {self.__name__!r} ({state})>'
+
+
+def lazy_import(name):
+    """Declare a module to import on first use; one shared proxy per module name."""
+    if name not in _registry:
+        _registry[name] = LazyModule(name)
+    return _registry[name]
+
+
+def warm_up(names=None):
+    """Import the given (default: all declared) lazy modules now; returns their import times."""
+    for name in names or list(_registry):
+        lazy_import(name).load()
+    return import_timings()
+
+
+def import_timings():
+    """Seconds spent importing each lazy module that has been loaded so far."""
+    return dict(_timings)
+
+
+def pending_modules():
+    """Lazy modules declared but not imported yet."""
+    return sorted(name for name, module in _registry.items() if not module.is_loaded)
@@ -0,0 +1,258 @@
+import atexit
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, workers only get timeouts and recycling
+    resource = None
+
+from config import Config
+
+
+# Tensors listed per loaded model; the rest only count towards ``parameters``
+MAX_TENSORS = 1000
+
+
+class LoaderError(Exception):
+    """A model could not be loaded in a sandboxed worker (error, timeout or killed by a limit)."""
+
+
+def _vm_bytes():
+    """Current virtual memory size of this process (Linux), or 0 when unknown."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _set_limits(memory_bytes, cpu_seconds):
+    """Cap address space growth and CPU time of the next job in this worker."""
+    if resource is None:
+        return
+    if memory_bytes:
+        # On top of what the interpreter and torch already map
+        limit = _vm_bytes() + memory_bytes
+        resource.setrlimit(resource.RLIMIT_AS, (limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+    if cpu_seconds:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        limit = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+        resource.setrlimit(resource.RLIMIT_CPU, (limit, resource.getrlimit(resource.RLIMIT_CPU)[1]))
+
+
+def introspect_model(file_path):
+    """Load a torch model and return only plain data: code lines and a little metadata."""
+    import torch
+    try:
+        model = torch.jit.load(file_path, map_location='cpu')
+        code_lines = model.code.split('\n')
+        kind = 'torchscript'
+    except Exception:
+        # Try loading as a regular PyTorch model; a full unpickle is what this rlimited worker is for, and
+        # torch >= 2.6 would otherwise default to weights_only=True and reject pickled nn.Modules
+        model = torch.load(file_path, map_location='cpu', weights_only=False)
+        code_lines = str(model).split('\n')
+        kind = 'pickle'
+    parameters = None
+    if hasattr(model, 'parameters'):
+        parameters = sum(p.numel() for p in model.parameters())
+    elif isinstance(model, dict):
+        parameters = sum(v.numel() for v in model.values() if hasattr(v, 'numel'))
+    if hasattr(model, 'state_dict'):
+        state = list(model.state_dict().items())
+    elif isinstance(model, dict):
+        state = [(str(k), v) for k, v in model.items() if hasattr(v, 'shape')]
+    else:
+        state = []
+    return {
+        'code_lines': code_lines,
+        'format': kind,
+        'type': type(model).__name__,
+        'parameters': parameters,
+        'tensors': [{'name': name, 'shape': list(t.shape), 'dtype': str(t.dtype)} for name, t in state[:MAX_TENSORS]],
+        'input_spec': _input_spec(model, state),
+        'torch_version': torch.__version__
+    }
+
+
+def _input_spec(model, state):
+    """The TorchScript forward arguments, else a shape from the first weight's fan-in (None: unknown size)."""
+    schema = getattr(getattr(model, 'forward', None), 'schema', None)
+    if schema is not None:
+        return {'source': 'schema', 'arguments': [{'name': arg.name, 'type': str(arg.type)}
+                                                  for arg in schema.arguments[1:]]}
+    for name, tensor in state:
+        if name.endswith('weight') and tensor.dim() >= 2:
+            return {'source': name, 'shape': [None, tensor.shape[1]] + [None] * (tensor.dim() - 2)}
+    return None
+
+
+def _worker_main(conn, memory_bytes, cpu_seconds):
+    import torch  # noqa: F401  (already imported by the forkserver; keeps spawn workers warm too)
+    while True:
+        try:
+            file_path = conn.recv()
+        except EOFError:
+            return
+        if file_path is None:
+            return
+        _set_limits(memory_bytes, cpu_seconds)
+        try:
+            conn.send(('ok', introspect_model(file_path)))
+        except MemoryError:
+            conn.send(('error', 'memory limit exceeded'))
+        except Exception as e:
+            conn.send(('error', f'{type(e).__name__}: {e}'))
+
+
+class _Worker:
+    def __init__(self, context, memory_bytes, cpu_seconds):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, memory_bytes, cpu_seconds), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class LoaderPool:
+    """Pre-forked processes with torch imported that load untrusted models outside the web process.
+
+    Workers come from a forkserver that has already imported torch (and this
+    module), so each one starts warm. Every job runs under address-space and CPU rlimits and
+    a hard wall-clock timeout. A worker that fails in any way (timeout,
+    crash, broken pipe) is killed and its slot refilled, never put back;
+    a replacement that cannot start is retried on the next load. Workers
+    are recycled after ``max_jobs`` loads, and only plain code lines and
+    metadata cross the pipe back.
+    """
+
+    def __init__(self, size=2, max_jobs=50, memory_mb=4096, cpu_seconds=60, timeout=120):
+        methods = multiprocessing.get_all_start_methods()
+        self.context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        if self.context.get_start_method() == 'forkserver':
+            self.context.set_forkserver_preload(['torch', __name__])
+        self.size = size
+        self.max_jobs = max_jobs
+        self.memory_bytes = memory_mb * 1024 * 1024
+        self.cpu_seconds = cpu_seconds
+        self.timeout = timeout
+        self._idle = queue.Queue()
+        self._closed = False
+        self._missing = size  # workers that died or were retired and are not replaced yet
+        self._lock = threading.Lock()
+        self._replenish()
+
+    def _spawn(self):
+        return _Worker(self.context, self.memory_bytes, self.cpu_seconds)
+
+    def _replenish(self):
+        """Start workers for the slots left empty; a failed start is retried on the next load."""
+        while not self._closed:
+            with self._lock:
+                if not self._missing:
+                    return
+                self._missing -= 1
+            try:
+                self._idle.put(self._spawn())
+            except Exception:
+                with self._lock:
+                    self._missing += 1
+                raise
+
+    def _release(self, worker, healthy, retire=False):
+        """Return a healthy worker to the pool; stop any other one and leave its slot to ``_replenish``."""
+        if healthy and not retire and not self._closed:
+            self._idle.put(worker)
+            return
+        try:
+            worker.stop(kill=not healthy)
+        finally:
+            with self._lock:
+                self._missing += 1
+
+    def load(self, file_path, timeout=None):
+        """Load and introspect ``file_path`` in a worker; raises LoaderError on failure."""
+        if self._closed:
+            raise LoaderError('loader pool is shut down')
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            self._replenish()
+        except Exception as e:
+            if self._idle.empty():
+                raise LoaderError(f'could not start a loader worker: {e}')
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise LoaderError(f'no loader worker free within {timeout}s')
+        healthy = retire = False
+        try:
+            try:
+                worker.conn.send(os.path.abspath(file_path))
+            except OSError as e:
+                raise LoaderError(f'loader worker unreachable: {e}')
+            if not worker.conn.poll(timeout):
+                raise LoaderError(f'loading timed out after {timeout}s')
+            try:
+                status, payload = worker.conn.recv()
+            except (EOFError, OSError):
+                worker.process.join(5)
+                exitcode = worker.process.exitcode
+                if exitcode == -getattr(signal, 'SIGXCPU', 0):
+                    raise LoaderError('CPU time limit exceeded')
+                raise LoaderError(f'loader worker died (exit code {exitcode})')
+            worker.jobs += 1
+            healthy = True
+            retire = worker.jobs >= self.max_jobs
+        finally:
+            # Anything but a clean reply leaves the worker in an unknown state: it is killed and replaced
+            self._release(worker, healthy, retire)
+        if status != 'ok':
+            raise LoaderError(payload)
+        return payload
+
+    def shutdown(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_loader_pool():
+    """The process-wide loader pool, started on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = LoaderPool(
+                    size=Config.LOADER_POOL_SIZE,
+                    max_jobs=Config.LOADER_MAX_JOBS,
+                    memory_mb=Config.LOADER_MEMORY_MB,
+                    cpu_seconds=Config.LOADER_CPU_SECONDS,
+                    timeout=Config.LOADER_TIMEOUT
+                )
+                atexit.register(_pool.shutdown)
+    return _pool
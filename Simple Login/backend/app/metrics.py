@@ -0,0 +1,339 @@
+import atexit
+import bisect
+import glob
+import json
+import os
+import re
+import threading
+import time
+
+from flask import Response, g, request
+
+from config import Config
+
+# Seconds buckets shared by request, stage, check and query latencies
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(13))  # 1 KB .. 16 GB
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_lock = threading.RLock()
+_metrics = {}
+_last_flush = 0.0
+
+
+class Metric:
+    """A counter, gauge or histogram whose samples are keyed by their label values.
+
+    Every update takes the module lock, so request threads and scan stage
+    threads share one instance. Multiple processes each keep their own and
+    meet at scrape time through METRICS_DIR (see ``collect``).
+    """
+
+    def __init__(self, name, documentation, kind, labels=(), buckets=None):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) if buckets else None
+        self.samples = {}
+        with _lock:
+            _metrics[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, '')) for label in self.labels)
+
+    def inc(self, amount=1, **labels):
+        with _lock:
+            key = self._key(labels)
+            self.samples[key] = self.samples.get(key, 0) + amount
+        _changed()
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with _lock:
+            self.samples[self._key(labels)] = value
+        _changed()
+
+    def observe(self, value, **labels):
+        """Histograms: one bucket count per upper bound, then +Inf, sum and count."""
+        with _lock:
+            key = self._key(labels)
+            sample = self.samples.get(key)
+            if sample is None:
+                sample = self.samples[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            sample[bisect.bisect_left(self.buckets, value)] += 1
+            sample[-2] += value
+            sample[-1] += 1
+        _changed()
+
+    def time(self, **labels):
+        """Context manager: observes the block's duration, or for a gauge counts the block while it runs."""
+        return _Timer(self, labels)
+
+
+class _Timer:
+    def __init__(self, metric, labels):
+        self.metric = metric
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        if self.metric.kind == 'gauge':
+            self.metric.inc(**self.labels)
+        return self
+
+    def __exit__(self, *exc):
+        if self.metric.kind == 'gauge':
+            self.metric.dec(**self.labels)
+        else:
+            self.metric.observe(time.perf_counter() - self.start, **self.labels)
+
+
+def counter(name, documentation, labels=()):
+    return Metric(name, documentation, 'counter', labels)
+
+
+def gauge(name, documentation, labels=()):
+    return Metric(name, documentation, 'gauge', labels)
+
+
+def histogram(name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+    return Metric(name, documentation, 'histogram', labels, buckets)
+
+
+HTTP_REQUEST_SECONDS = histogram('http_request_duration_seconds', 'Time spent handling HTTP requests.',
+                                 ('route', 'method', 'status'))
+HTTP_IN_FLIGHT = gauge('http_requests_in_flight', 'HTTP requests being handled.')
+UPLOAD_BYTES = histogram('upload_size_bytes', 'Size of uploaded model files.', buckets=SIZE_BUCKETS)
+SCANS = counter('scans_total', 'Uploads scanned, by whether the scan cache answered.', ('result',))
+SCANS_IN_FLIGHT = gauge('scans_in_flight', 'Uploads being scanned.')
+SCANNED_BYTES = counter('scanned_bytes_total', 'Bytes of uploads run through the scan stages.')
+STAGE_SECONDS = histogram('scan_stage_duration_seconds', 'Duration of each scan pipeline stage.', ('stage',))
+CHECK_SECONDS = histogram('scan_check_duration_seconds', 'Duration of each static check.', ('check',))
+FINDINGS = counter('scan_findings_total', 'Findings reported, weighted by occurrences.', ('source', 'severity'))
+DB_QUERY_SECONDS = histogram('db_query_duration_seconds', 'Duration of database statements.', ('statement',))
+
+
+def _reset_after_fork():
+    """A forked worker starts from zero: whatever it inherited is still counted by its parent."""
+    global _lock, _last_flush
+    _lock = threading.RLock()
+    _last_flush = 0.0
+    for metric in _metrics.values():
+        metric.samples = {}
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _directory():
+    return Config.METRICS_DIR
+
+
+def snapshot():
+    """This process's samples as plain JSON-ready data."""
+    with _lock:
+        return {name: {'kind': m.kind, 'help': m.documentation, 'labels': list(m.labels),
+                       'buckets': list(m.buckets) if m.buckets else None,
+                       'samples': [[list(key), list(value) if isinstance(value, list) else value]
+                                   for key, value in m.samples.items()]}
+                for name, m in _metrics.items()}
+
+
+def flush():
+    """Write this process's snapshot to METRICS_DIR (atomically), for whichever worker serves the scrape."""
+    global _last_flush
+    directory = _directory()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+    data = snapshot()
+    _last_flush = time.monotonic()
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f)
+    os.replace(path + '.tmp', path)
+
+
+def _changed():
+    # Throttled so a burst of updates costs one write; the tail is written at exit
+    if _directory() and time.monotonic() - _last_flush >= Config.METRICS_FLUSH_SECONDS:
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+atexit.register(lambda: _directory() and flush())
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Samples of every worker process: this one's live values plus the snapshots in METRICS_DIR.
+
+    Counters and histograms add up across processes, including ones that
+    have exited; gauges add up over live processes only.
+    """
+    merged = snapshot()
+    directory = _directory()
+    if not directory:
+        return merged
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        pid = int(re.search(r'metrics-(\d+)\.json$', path).group(1))
+        if pid == os.getpid():
+            continue
+        alive = _alive(pid)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, metric in data.items():
+            if metric['kind'] == 'gauge' and not alive:
+                continue
+            target = merged.setdefault(name, dict(metric, samples=[]))
+            samples = {tuple(key): value for key, value in target['samples']}
+            for key, value in metric['samples']:
+                key = tuple(key)
+                if key not in samples:
+                    samples[key] = value
+                elif isinstance(value, list):
+                    samples[key] = [a + b for a, b in zip(samples[key], value)]
+                else:
+                    samples[key] = samples[key] + value
+            target['samples'] = [[list(key), value] for key, value in samples.items()]
+    return merged
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(metrics=None):
+    """The Prometheus text exposition format (version 0.0.4) of ``collect()``."""
+    lines = []
+    for name, metric in sorted((metrics if metrics is not None else collect()).items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for values, value in sorted(metric['samples']):
+            if metric['kind'] != 'histogram':
+                lines.append(f"{name}{_labels(metric['labels'], values)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip([*metric['buckets'], float('inf')], value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(metric['labels'], values, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric['labels'], values)} {_number(value[-2])}")
+            lines.append(f"{name}_count{_labels(metric['labels'], values)} {value[-1]}")
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_response():
+    return Response(render(), mimetype=CONTENT_TYPE)
+
+
+def instrument_app(app):
+    """Time every request by route template, method and status, and count those in flight."""
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+
+    @app.after_request
+    def keep_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def observe_request(exc):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        HTTP_IN_FLIGHT.dec()
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, route=route, method=request.method,
+                                     status=g.pop('metrics_status', 500))
+
+
+def instrument_engine(engine):
+    """Time every statement the engine runs, labelled by its verb (SELECT, INSERT, ...)."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def observe_query(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('metrics_query_start')
+        if starts:
+            verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+            DB_QUERY_SECONDS.observe(time.perf_counter() - starts.pop(), statement=verb)
+
+    @event.listens_for(engine, 'handle_error')
+    def drop_query_timer(context):
+        starts = context.connection.info.get('metrics_query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+def record_findings(source, findings):
+    for finding in findings:
+        FINDINGS.inc(finding.get('occurrences', 1), source=source, severity=str(finding.get('severity', 'Low')).title())
+
+
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+_LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse(text):
+    """Parse exposition text into ``{(name, ((label, value), ...)): value}``, like a scraper would."""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        match = _SAMPLE.match(line)
+        if match is None:
+            raise ValueError(f'malformed sample line: {line!r}')
+        name, labels, value = match.groups()
+        labels = tuple(sorted((key, re.sub(r'\\(.)', lambda m: '\n' if m.group(1) == 'n' else m.group(1), raw))
+                              for key, raw in _LABEL.findall(labels or '')))
+        samples[(name, labels)] = float(value)
+    return samples
+
+
+def scrape(target):
+    """Stand-in scraper: fetch ``/metrics`` from a URL or a Flask app (through its test client) and parse it."""
+    if isinstance(target, str):
+        import requests
+        response = requests.get(target, timeout=10)
+        response.raise_for_status()
+        return parse(response.text)
+    response = target.test_client().get('/metrics')
+    if response.status_code != 200:
+        raise RuntimeError(f'/metrics answered {response.status_code}')
+    return parse(response.get_data(as_text=True))
@@ -1,6 +1,7 @@
 from . import db
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import json
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -27,6 +28,10 @@ class UploadedModel(db.Model):
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
     risk_score = db.Column(db.Float, nullable=True)
     high_risk = db.Column(db.Boolean, default=False)
+    features = db.Column(db.Text, nullable=True)  # JSON list from extract_model_features
+    anomaly_score = db.Column(db.Float, nullable=True)
+    parts_manifest = db.Column(db.Text, nullable=True)  # JSON per-member hashes and findings (archives, torch zips)
+    profile_trace = db.Column(db.Text, nullable=True)  # JSON span tree (and profile) of a traced scan
     # Relationship to vulnerabilities
     vulnerabilities = db.relationship('Vulnerability', backref='model', lazy=True)
 
@@ -39,7 +44,9 @@ class UploadedModel(db.Model):
             'report_path': self.report_path,
             'upload_date': self.upload_date.isoformat() if self.upload_date else None,
             'risk_score': self.risk_score,
-            'high_risk': self.high_risk
+            'high_risk': self.high_risk,
+            'anomaly_score': self.anomaly_score,
+            'has_trace': self.profile_trace is not None
         }
 
 class Vulnerability(db.Model):
@@ -66,6 +73,37 @@ class Vulnerability(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class ScanResultCache(db.Model):
+    """Findings and report inputs of a completed scan, keyed by file content, extension and rule-set version.
+
+    The extension is part of the key because it decides which checks run.
+    """
+    __table_args__ = (db.UniqueConstraint('file_hash', 'extension', 'ruleset_version'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    file_hash = db.Column(db.String(64), nullable=False, index=True)
+    extension = db.Column(db.String(16), nullable=False, default='')
+    ruleset_version = db.Column(db.String(20), nullable=False)
+    report_path = db.Column(db.String, nullable=False)
+    static_vulns = db.Column(db.Text, nullable=False)  # JSON lists
+    dynamic_vulns = db.Column(db.Text, nullable=False)
+    adversarial_vulns = db.Column(db.Text, nullable=False)
+    report_inputs = db.Column(db.Text, nullable=True)  # JSON code lines and entropy profile, to rebuild the report
+    size_bytes = db.Column(db.Integer, default=0)
+    hit_count = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_hit_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def findings(self):
+        return (
+            json.loads(self.static_vulns),
+            json.loads(self.dynamic_vulns),
+            json.loads(self.adversarial_vulns)
+        )
+
+    def inputs(self):
+        return json.loads(self.report_inputs) if self.report_inputs else {}
+
 class ScanReport(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     model_name = db.Column(db.String(256), nullable=False)
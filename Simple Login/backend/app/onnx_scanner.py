@@ -0,0 +1,275 @@
+import mmap
+import os
+from collections import Counter
+
+from .checks import LARGE_METADATA, LISTED_CHARS
+
+# Operator domains shipped with ONNX itself and with ONNX Runtime
+STANDARD_DOMAINS = {'', 'ai.onnx', 'ai.onnx.ml', 'ai.onnx.training', 'ai.onnx.preview.training', 'com.microsoft'}
+# Operators of the default ai.onnx domain
+STANDARD_OPS = set('''
+Abs Acos Acosh Add AffineGrid And ArgMax ArgMin Asin Asinh Atan Atanh Attention AveragePool BatchNormalization
+Bernoulli BitShift BitwiseAnd BitwiseNot BitwiseOr BitwiseXor BlackmanWindow Cast CastLike Ceil Celu
+CenterCropPad Clip Col2Im Compress Concat ConcatFromSequence Constant ConstantOfShape Conv ConvInteger
+ConvTranspose Cos Cosh CumSum DFT DeformConv DepthToSpace DequantizeLinear Det Div Dropout
+DynamicQuantizeLinear Einsum Elu Equal Erf Exp Expand EyeLike Flatten Floor GRU Gather GatherElements
+GatherND Gelu Gemm GlobalAveragePool GlobalLpPool GlobalMaxPool Greater GreaterOrEqual GridSample
+GroupNormalization HammingWindow HannWindow HardSigmoid HardSwish Hardmax Identity If ImageDecoder
+InstanceNormalization IsInf IsNaN LRN LSTM LayerNormalization LeakyRelu Less LessOrEqual Log LogSoftmax
+Loop LpNormalization LpPool MatMul MatMulInteger Max MaxPool MaxRoiPool MaxUnpool Mean
+MeanVarianceNormalization MelWeightMatrix Min Mish Mod Mul Multinomial Neg NegativeLogLikelihoodLoss
+NonMaxSuppression NonZero Not OneHot Optional OptionalGetElement OptionalHasElement Or PRelu Pad Pow
+QLinearConv QLinearMatMul QuantizeLinear RMSNormalization RNN RandomNormal RandomNormalLike RandomUniform
+RandomUniformLike Range Reciprocal ReduceL1 ReduceL2 ReduceLogSum ReduceLogSumExp ReduceMax ReduceMean
+ReduceMin ReduceProd ReduceSum ReduceSumSquare RegexFullMatch Relu Reshape Resize ReverseSequence
+RoiAlign RotaryEmbedding Round STFT Scan Scatter ScatterElements ScatterND Selu SequenceAt
+SequenceConstruct SequenceEmpty SequenceErase SequenceInsert SequenceLength SequenceMap Shape Shrink
+Sigmoid Sign Sin Sinh Size Slice Softmax SoftmaxCrossEntropyLoss Softplus Softsign SpaceToDepth Split
+SplitToSequence Sqrt Squeeze StringConcat StringNormalizer StringSplit Sub Sum Swish Tan Tanh TensorScatter
+TfIdfVectorizer ThresholdedRelu Tile TopK Transpose Trilu Unique Unsqueeze Upsample Where Xor
+'''.split())
+
+_VARINT, _I64, _LEN, _I32 = 0, 1, 2, 5
+
+
+class OnnxParseError(ValueError):
+    pass
+
+
+def _varint(buf, pos):
+    result = shift = 0
+    while True:
+        if pos >= len(buf):
+            raise OnnxParseError('truncated varint')
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7f) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise OnnxParseError('varint too long')
+
+
+def _fields(buf, start, end):
+    """Yield ``(field, wire_type, value)``; length-delimited values are ``(start, end)`` spans, not bytes."""
+    pos = start
+    while pos < end:
+        key, pos = _varint(buf, pos)
+        field, wire = key >> 3, key & 7
+        if wire == _VARINT:
+            value, pos = _varint(buf, pos)
+        elif wire == _LEN:
+            length, pos = _varint(buf, pos)
+            value = (pos, pos + length)
+            pos += length
+        elif wire == _I64:
+            value, pos = None, pos + 8
+        elif wire == _I32:
+            value, pos = None, pos + 4
+        else:
+            raise OnnxParseError(f'unsupported wire type {wire} at byte {pos}')
+        if pos > end:
+            raise OnnxParseError(f'field {field} runs past its message at byte {pos}')
+        yield field, wire, value
+
+
+def _string(buf, span, limit=None):
+    start, end = span
+    if limit is not None:
+        end = min(end, start + limit)
+    return bytes(buf[start:end]).decode('utf-8', errors='replace')
+
+
+class OnnxStructure:
+    """Graph structure of an ONNX model, walked straight off the protobuf wire format.
+
+    Only the messages that describe the graph are decoded; tensor payloads
+    (``raw_data`` and the typed data fields) are stepped over by their
+    length prefix, so the walk costs the same for 1 MB and 1 GB of weights.
+    """
+
+    def __init__(self):
+        self.producer = ''
+        self.producer_version = ''
+        self.opsets = {}
+        self.op_counts = Counter()
+        self.custom_ops = Counter()  # (domain, op_type) -> count
+        self.functions = []
+        self.metadata = []           # (key, value preview, size)
+        self.external_data = []      # (tensor name, location)
+        self.tensors = 0
+        self.doc_bytes = 0
+
+    def parse_model(self, buf):
+        for field, wire, value in _fields(buf, 0, len(buf)):
+            if wire != _LEN:
+                continue
+            if field == 2:
+                self.producer = _string(buf, value, LISTED_CHARS)
+            elif field == 3:
+                self.producer_version = _string(buf, value, LISTED_CHARS)
+            elif field == 6:
+                self._doc(buf, value)
+            elif field == 7:
+                self.parse_graph(buf, value)
+            elif field == 8:
+                domain, version = '', 0
+                for f, w, v in _fields(buf, *value):
+                    if f == 1 and w == _LEN:
+                        domain = _string(buf, v)
+                    elif f == 2 and w == _VARINT:
+                        version = v
+                self.opsets[domain] = version
+            elif field == 14:
+                self._metadata(buf, value)
+            elif field == 25:
+                self._function(buf, value)
+
+    def parse_graph(self, buf, span):
+        for field, wire, value in _fields(buf, *span):
+            if wire != _LEN:
+                continue
+            if field == 1:
+                self._node(buf, value)
+            elif field in (5, 15):
+                self._tensor(buf, value if field == 5 else self._sparse_values(buf, value))
+            elif field == 10:
+                self._doc(buf, value)
+
+    def _node(self, buf, span):
+        op_type, domain = '', ''
+        for field, wire, value in _fields(buf, *span):
+            if wire != _LEN:
+                continue
+            if field == 4:
+                op_type = _string(buf, value)
+            elif field == 7:
+                domain = _string(buf, value)
+            elif field == 5:
+                self._attribute(buf, value)
+            elif field == 6:
+                self._doc(buf, value)
+        self.op_counts[(domain, op_type)] += 1
+        if domain not in STANDARD_DOMAINS or (domain in ('', 'ai.onnx') and op_type not in STANDARD_OPS):
+            self.custom_ops[(domain, op_type)] += 1
+
+    def _attribute(self, buf, span):
+        # Control-flow bodies (If/Loop/Scan) are subgraphs; tensors may hold external data
+        for field, wire, value in _fields(buf, *span):
+            if wire != _LEN:
+                continue
+            if field in (6, 7):
+                self.parse_graph(buf, value)
+            elif field in (5, 10):
+                self._tensor(buf, value)
+
+    def _tensor(self, buf, span):
+        if span is None:
+            return
+        self.tensors += 1
+        name, location, external = '', '', False
+        for field, wire, value in _fields(buf, *span):
+            if field == 8 and wire == _LEN:
+                name = _string(buf, value, LISTED_CHARS)
+            elif field == 13 and wire == _LEN:
+                key, val = self._entry(buf, value)
+                if key == 'location':
+                    location = val
+            elif field == 14 and wire == _VARINT:
+                external = value == 1
+        if external or location:
+            self.external_data.append((name, location))
+
+    def _sparse_values(self, buf, span):
+        for field, wire, value in _fields(buf, *span):
+            if field == 1 and wire == _LEN:
+                return value
+        return None
+
+    def _function(self, buf, span):
+        name, domain = '', ''
+        for field, wire, value in _fields(buf, *span):
+            if wire != _LEN:
+                continue
+            if field == 1:
+                name = _string(buf, value)
+            elif field == 10:
+                domain = _string(buf, value)
+            elif field == 4:
+                self._node(buf, value)
+        self.functions.append((domain, name))
+
+    def _metadata(self, buf, span):
+        key, value = '', (0, 0)
+        for field, wire, v in _fields(buf, *span):
+            if field == 1 and wire == _LEN:
+                key = _string(buf, v, LISTED_CHARS)
+            elif field == 2 and wire == _LEN:
+                value = v
+        self.metadata.append((key, _string(buf, value, LISTED_CHARS), value[1] - value[0]))
+
+    def _entry(self, buf, span):
+        key = value = ''
+        for field, wire, v in _fields(buf, *span):
+            if field == 1 and wire == _LEN:
+                key = _string(buf, v)
+            elif field == 2 and wire == _LEN:
+                value = _string(buf, v, 4096)
+        return key, value
+
+    def _doc(self, buf, span):
+        self.doc_bytes += span[1] - span[0]
+
+
+def scan_onnx(file_path):
+    """Parse the graph of an ONNX file (memory-mapped) and flag custom ops, external data and big metadata.
+
+    Returns ``{'listing', 'findings'}`` in the static finding shape; the
+    listing summarizes the structure and findings point at its lines.
+    """
+    listing, findings = [], []
+
+    def add(line, code, severity, attack, cwe_id=None):
+        finding = {'line': line, 'code': code, 'severity': severity, 'attack': attack}
+        if cwe_id:
+            finding['cwe_id'] = cwe_id
+        findings.append(finding)
+
+    structure = OnnxStructure()
+    try:
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise OnnxParseError('empty file')
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                structure.parse_model(mm)
+    except (OnnxParseError, OSError, ValueError) as e:
+        add(1, f"Could not parse ONNX protobuf: {e}", 'Medium', 'Malformed ONNX Model', 'CWE-20')
+        return {'listing': [f'<Could not parse ONNX model: {e}>'], 'findings': findings}
+
+    listing.append(f"producer: {structure.producer or '-'} {structure.producer_version}".rstrip())
+    listing.append('opsets: ' + ', '.join(f"{d or 'ai.onnx'}={v}" for d, v in sorted(structure.opsets.items())))
+    listing.append(f"tensors: {structure.tensors}")
+    for (domain, op_type), count in sorted(structure.op_counts.items()):
+        listing.append(f"op {domain or 'ai.onnx'}::{op_type} x{count}")
+        if (domain, op_type) in structure.custom_ops:
+            add(len(listing), f"{domain or 'ai.onnx'}::{op_type} used {count} time(s)", 'Medium',
+                'Custom or Unknown ONNX Operator', 'CWE-829')
+    for domain, name in structure.functions:
+        listing.append(f"function {domain}::{name}")
+        add(len(listing), f"Model-local function {domain}::{name}", 'Low', 'Custom ONNX Function')
+    for key, preview, size in structure.metadata:
+        listing.append(f"metadata {key}: {preview}")
+        if size > LARGE_METADATA:
+            add(len(listing), f"metadata_props[{key!r}] holds {size} bytes", 'Medium',
+                'Large Embedded Metadata', 'CWE-506')
+    if structure.doc_bytes > LARGE_METADATA:
+        add(1, f"doc_string fields hold {structure.doc_bytes} bytes", 'Medium', 'Large Embedded Metadata', 'CWE-506')
+    for name, location in structure.external_data:
+        listing.append(f"external data {name}: {location}")
+        if os.path.isabs(location) or '..' in location.replace('\\', '/').split('/'):
+            add(len(listing), f"Tensor {name} loads data from {location!r}", 'High',
+                'External Data Path Traversal', 'CWE-22')
+        else:
+            add(len(listing), f"Tensor {name} loads data from {location!r}", 'Low', 'External Tensor Data Reference')
+    return {'listing': listing, 'findings': findings}
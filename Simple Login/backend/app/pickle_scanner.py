@@ -0,0 +1,460 @@
+import bz2
+import gzip
+import lzma
+import pickletools
+import re
+import time
+import uuid
+import zipfile
+from fnmatch import fnmatchcase
+from functools import lru_cache
+
+# Globals are matched as "module.callable" glob patterns. The denylist wins
+# over the allowlist; anything on neither list is reported as unknown.
+# Denylist patterns are plain fnmatch globs (``*`` may cross dots, which only
+# widens them). In allowlist patterns ``*`` stays within one dotted name and
+# ``**`` spans submodules, and a dotted callable (a protocol-4 qualname such
+# as ``os.popen`` looked up on an allowed module) is never allowed.
+DEFAULT_DENYLIST = [
+    'os.*', 'posix.*', 'nt.*', 'subprocess.*', 'sys.*', 'shutil.*', 'socket.*',
+    'pty.*', 'runpy.*', 'importlib.*', 'webbrowser.*', 'ctypes.*', 'marshal.*',
+    'code.*', 'pickle.*', '_pickle.*', 'multiprocessing.*', 'signal.*',
+    'urllib.*', 'http.*', 'requests.*', 'asyncio.*', 'types.*',
+    'builtins.eval', 'builtins.exec', 'builtins.compile', 'builtins.__import__',
+    'builtins.open', 'builtins.getattr', 'builtins.setattr', 'builtins.delattr',
+    'builtins.globals', 'builtins.locals', 'builtins.vars', 'builtins.breakpoint',
+    'builtins.input',
+    '__builtin__.eval', '__builtin__.exec', '__builtin__.compile', '__builtin__.__import__',
+    '__builtin__.open', '__builtin__.getattr', '__builtin__.execfile', '__builtin__.file',
+    'operator.attrgetter', 'operator.methodcaller',
+    'torch.load', 'torch.hub.*', 'torch.storage._load_from_bytes',
+    'numpy.load', 'numpy.testing.*',
+]
+
+DEFAULT_ALLOWLIST = [
+    'collections.OrderedDict', 'collections.defaultdict', 'collections.Counter',
+    'collections.deque', 'copyreg._reconstructor', 'copy_reg._reconstructor',
+    'builtins.set', 'builtins.frozenset', 'builtins.list', 'builtins.dict',
+    'builtins.tuple', 'builtins.bytearray', 'builtins.bytes', 'builtins.str',
+    'builtins.int', 'builtins.float', 'builtins.complex', 'builtins.bool',
+    'builtins.slice', 'builtins.range', 'builtins.object',
+    '__builtin__.set', '__builtin__.frozenset', '__builtin__.list', '__builtin__.dict',
+    '__builtin__.tuple', '__builtin__.bytearray', '__builtin__.object',
+    '__builtin__.complex', '__builtin__.slice', '_codecs.encode',
+    'numpy.core.multiarray._reconstruct', 'numpy._core.multiarray._reconstruct',
+    'numpy.core.multiarray.scalar', 'numpy._core.multiarray.scalar',
+    'numpy.core.numeric._frombuffer', 'numpy._core.numeric._frombuffer',
+    'numpy.ndarray', 'numpy.dtype', 'numpy.dtypes.*', 'numpy.random._pickle.*',
+    'torch._utils._rebuild_tensor', 'torch._utils._rebuild_tensor_v2',
+    'torch._utils._rebuild_parameter', 'torch._utils._rebuild_parameter_with_state',
+    'torch.*Storage', 'torch.Size', 'torch.device', 'torch.float*', 'torch.int*',
+    'torch.uint8', 'torch.bool', 'torch.bfloat16', 'torch.complex*', 'torch.half',
+    'joblib.numpy_pickle.NumpyArrayWrapper', 'sklearn.**',
+]
+
+# Small containers are rebuilt so STACK_GLOBAL operands and joblib array
+# headers can be resolved; anything larger is kept as an opaque marker.
+MAX_CONTAINER_ITEMS = 32
+# Memo entries tracked per stream; a stream can PUT without limit, so later entries resolve as opaque
+MAX_MEMO_ENTRIES = 1 << 18
+
+JOBLIB_ARRAY_WRAPPER = 'joblib.numpy_pickle.NumpyArrayWrapper'
+SEVERITY_ORDER = ('allowed', 'unknown', 'critical')
+
+_MARK = object()
+_OPAQUE = object()
+
+
+class _Global:
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+
+class _Instance:
+    __slots__ = ('cls', 'args', 'state')
+
+    def __init__(self, cls, args):
+        self.cls = cls
+        self.args = args
+        self.state = None
+
+
+@lru_cache(maxsize=None)
+def _allow_pattern(pattern):
+    parts = re.split(r'(\*\*|\*|\?)', pattern)
+    wildcards = {'**': '.*', '*': '[^.]*', '?': '[^.]'}
+    return re.compile(''.join(wildcards.get(part, re.escape(part)) for part in parts))
+
+
+def classify_global(module, attr, allowlist=None, denylist=None):
+    """Return 'critical', 'allowed' or 'unknown' for the global ``attr`` of ``module``."""
+    name = f'{module}.{attr}'
+    denylist = DEFAULT_DENYLIST if denylist is None else denylist
+    # A dotted attr is resolved by getattr chains from the module, so its own prefix counts too
+    if any(fnmatchcase(name, p) or ('.' in attr and fnmatchcase(attr, p)) for p in denylist):
+        return 'critical'
+    if '.' in attr:
+        return 'unknown'
+    if any(_allow_pattern(p).fullmatch(name) for p in (DEFAULT_ALLOWLIST if allowlist is None else allowlist)):
+        return 'allowed'
+    return 'unknown'
+
+
+class PickleStreamScanner:
+    """Walk pickle opcodes with ``pickletools.genops`` without executing them.
+
+    Only a shallow symbolic stack is kept: primitives, small tuples/dicts and
+    references to globals. That is enough to resolve ``STACK_GLOBAL`` operands
+    (including memoised strings) and to step over the raw array data joblib
+    writes between pickle opcodes, while memory stays bounded by the largest
+    single opcode argument and ``MAX_MEMO_ENTRIES`` rather than by the size
+    of the file.
+    """
+
+    def __init__(self, allowlist=None, denylist=None, stop_on_critical=False, deadline=None):
+        self.allowlist = allowlist
+        self.denylist = denylist
+        self.stop_on_critical = stop_on_critical
+        self.deadline = deadline  # time.monotonic() value after which scanning stops
+        self.timed_out = False
+        self.globals = {}
+        self.opcodes = 0
+        self.streams = 0
+        self.stopped_early = False
+        self.memo_overflows = 0  # streams that memoised more than MAX_MEMO_ENTRIES values
+        self.error = None
+        self._status_cache = {}
+
+    def result(self):
+        return {
+            'globals': self.globals,
+            'opcodes': self.opcodes,
+            'streams': self.streams,
+            'stopped_early': self.stopped_early,
+            'timed_out': self.timed_out,
+            'memo_overflows': self.memo_overflows,
+            'error': self.error
+        }
+
+    def scan(self, f, source=None):
+        """Scan every pickle stream in the binary file object ``f``."""
+        peek = getattr(f, 'peek', None)
+        while not self.stopped_early:
+            if peek is not None and not peek(1)[:1]:
+                break
+            try:
+                if not self._scan_stream(f, source):
+                    break
+            except ValueError as e:
+                # Data after the last complete stream (e.g. legacy torch.save
+                # storages) is not an error; a broken first stream is.
+                if self.streams == 0:
+                    self.error = str(e)
+                break
+            if peek is None:
+                break
+        return self.result()
+
+    def _scan_stream(self, f, source):
+        stack = []
+        memo = {}
+        memo_count = 0
+        memo_overflow = False
+        started = False
+
+        def pop():
+            return stack.pop() if stack else _OPAQUE
+
+        def pop_mark():
+            items = []
+            while stack:
+                item = stack.pop()
+                if item is _MARK:
+                    break
+                items.append(item)
+            items.reverse()
+            return items
+
+        for op, arg, pos in pickletools.genops(f):
+            started = True
+            self.opcodes += 1
+            name = op.name
+            if self.deadline is not None and not self.opcodes % 4096 and time.monotonic() > self.deadline:
+                self.stopped_early = self.timed_out = True
+                break
+
+            if name in ('PROTO', 'FRAME', 'STOP'):
+                continue
+            elif name == 'MARK':
+                stack.append(_MARK)
+            elif name == 'POP':
+                pop()
+            elif name == 'POP_MARK':
+                pop_mark()
+            elif name == 'DUP':
+                stack.append(stack[-1] if stack else _OPAQUE)
+            elif name in ('GLOBAL', 'INST'):
+                module, _, attr = arg.partition(' ')
+                ref = self._record(f'{module}.{attr}', pos, source, called=(name == 'INST'), module=module, attr=attr)
+                if name == 'INST':
+                    pop_mark()
+                    stack.append(_Instance(ref.name, None))
+                else:
+                    stack.append(ref)
+            elif name == 'STACK_GLOBAL':
+                attr, module = pop(), pop()
+                if isinstance(module, str) and isinstance(attr, str):
+                    stack.append(self._record(f'{module}.{attr}', pos, source, module=module, attr=attr))
+                else:
+                    stack.append(self._record('<unresolved STACK_GLOBAL>', pos, source))
+            elif name in ('EXT1', 'EXT2', 'EXT4'):
+                stack.append(self._record(f'<extension code {arg}>', pos, source))
+            elif name in ('REDUCE', 'NEWOBJ', 'NEWOBJ_EX', 'OBJ'):
+                if name == 'OBJ':
+                    items = pop_mark()
+                    func, args = (items[0], tuple(items[1:])) if items else (_OPAQUE, ())
+                else:
+                    if name == 'NEWOBJ_EX':
+                        pop()
+                    args, func = pop(), pop()
+                if isinstance(func, _Global):
+                    self._record(func.name, pos, source, called=True, referenced=False)
+                    stack.append(_Instance(func.name, args))
+                else:
+                    stack.append(_OPAQUE)
+            elif name == 'BUILD':
+                state = pop()
+                obj = stack[-1] if stack else _OPAQUE
+                if isinstance(obj, _Instance):
+                    obj.state = state
+                    if obj.cls == JOBLIB_ARRAY_WRAPPER:
+                        stack[-1] = _OPAQUE
+                        self._skip_joblib_array(f, obj, source)
+            elif name in ('PUT', 'BINPUT', 'LONG_BINPUT', 'MEMOIZE'):
+                index = memo_count if name == 'MEMOIZE' else arg
+                memo_count = max(memo_count, index + 1)
+                value = stack[-1] if stack else _OPAQUE
+                if index not in memo and len(memo) >= MAX_MEMO_ENTRIES:
+                    memo_overflow = True
+                elif value is not _OPAQUE:
+                    memo[index] = value
+            elif name in ('GET', 'BINGET', 'LONG_BINGET'):
+                stack.append(memo.get(arg, _OPAQUE))
+            elif name == 'NONE':
+                stack.append(None)
+            elif name in ('NEWTRUE', 'NEWFALSE'):
+                stack.append(name == 'NEWTRUE')
+            elif name == 'EMPTY_TUPLE':
+                stack.append(())
+            elif name in ('TUPLE1', 'TUPLE2', 'TUPLE3'):
+                n = int(name[-1])
+                items = [pop() for _ in range(n)]
+                items.reverse()
+                stack.append(tuple(items))
+            elif name == 'TUPLE':
+                items = pop_mark()
+                stack.append(tuple(items) if len(items) <= MAX_CONTAINER_ITEMS else _OPAQUE)
+            elif name == 'EMPTY_DICT':
+                stack.append({})
+            elif name in ('DICT', 'SETITEM', 'SETITEMS'):
+                if name == 'SETITEM':
+                    value, key = pop(), pop()
+                    items = [key, value]
+                else:
+                    items = pop_mark()
+                if name == 'DICT':
+                    stack.append({})
+                target = stack[-1] if stack else None
+                if isinstance(target, dict):
+                    for key, value in zip(items[::2], items[1::2]):
+                        if len(target) >= MAX_CONTAINER_ITEMS:
+                            break
+                        if isinstance(key, (str, int, float, bool, type(None))):
+                            target[key] = value
+            elif op.arg is not None and not op.stack_before and len(op.stack_after) == 1:
+                # Constant pushes: keep strings and machine-sized numbers only
+                if isinstance(arg, str) or isinstance(arg, float) or (isinstance(arg, int) and arg.bit_length() < 64):
+                    stack.append(arg)
+                else:
+                    stack.append(_OPAQUE)
+            else:
+                # Everything else only matters for its stack effect
+                before = op.stack_before
+                if pickletools.markobject in before:
+                    pop_mark()
+                    for _ in range(before.index(pickletools.markobject)):
+                        pop()
+                else:
+                    for _ in range(len(before)):
+                        pop()
+                stack.extend(_OPAQUE for _ in op.stack_after)
+
+            if self.stopped_early:
+                break
+
+        if started:
+            self.streams += 1
+        if memo_overflow:
+            self.memo_overflows += 1
+        return started
+
+    def _record(self, name, pos, source, called=False, referenced=True, module=None, attr=None):
+        """Count a reference or call of ``name``; ``module``/``attr`` are given where the global is resolved.
+
+        Different module/attr splits can join into one name ('a.b' + 'c' and
+        'a' + 'b.c'), so a name keeps the most severe status seen for it.
+        """
+        status = None
+        if module is not None:
+            status = self._status_cache.get((module, attr))
+            if status is None:
+                status = self._status_cache[(module, attr)] = classify_global(module, attr, self.allowlist,
+                                                                               self.denylist)
+        elif name.startswith('<'):
+            status = 'critical'
+        hit = self.globals.get(name)
+        if hit is None:
+            hit = self.globals[name] = {
+                'status': status or 'unknown',
+                'references': 0,
+                'calls': 0,
+                'offset': pos,
+                'source': source
+            }
+        elif status is not None and SEVERITY_ORDER.index(status) > SEVERITY_ORDER.index(hit['status']):
+            hit['status'] = status
+        if referenced:
+            hit['references'] += 1
+        if called:
+            hit['calls'] += 1
+        if hit['status'] == 'critical' and self.stop_on_critical:
+            self.stopped_early = True
+        return _Global(name)
+
+    def _skip_joblib_array(self, f, wrapper, source):
+        """Step over the raw array bytes joblib writes right after a wrapper's BUILD."""
+        state = wrapper.state if isinstance(wrapper.state, dict) else {}
+        shape = state.get('shape')
+        dtype = state.get('dtype')
+        if not isinstance(shape, tuple) or not isinstance(dtype, _Instance):
+            raise ValueError('joblib array header could not be resolved')
+        dtype_args = dtype.args if isinstance(dtype.args, tuple) else ()
+        dtype_state = dtype.state if isinstance(dtype.state, tuple) else ()
+        descr = dtype_args[0] if dtype_args and isinstance(dtype_args[0], str) else ''
+        if descr.startswith('O'):
+            # Object arrays are stored as a nested pickle stream
+            nested = PickleStreamScanner(self.allowlist, self.denylist, self.stop_on_critical, self.deadline)
+            nested.globals = self.globals
+            nested._status_cache = self._status_cache
+            nested._scan_stream(f, source)
+            self.opcodes += nested.opcodes
+            self.memo_overflows += nested.memo_overflows
+            self.stopped_early = nested.stopped_early
+            self.timed_out = nested.timed_out
+            return
+        if len(dtype_state) > 5 and isinstance(dtype_state[5], int) and dtype_state[5] > 0:
+            itemsize = dtype_state[5]
+        else:
+            digits = ''.join(c for c in descr if c.isdigit())
+            if not digits:
+                raise ValueError(f'unsupported joblib array dtype {descr!r}')
+            itemsize = int(digits)
+        count = 1
+        for dim in shape:
+            count *= dim
+        if 'numpy_array_alignment_bytes' in state:
+            padding = f.read(1)
+            _skip(f, int.from_bytes(padding, 'little'))
+        _skip(f, count * itemsize)
+
+
+def _skip(f, n):
+    if n <= 0:
+        return
+    try:
+        f.seek(n, 1)
+    except (OSError, ValueError, AttributeError):
+        while n > 0:
+            chunk = f.read(min(n, 1 << 20))
+            if not chunk:
+                break
+            n -= len(chunk)
+
+
+def open_pickle_stream(file_path):
+    """Open ``file_path`` for opcode scanning, decompressing joblib gzip/bz2/xz files."""
+    with open(file_path, 'rb') as f:
+        magic = f.read(6)
+    if magic.startswith(b'\x1f\x8b'):
+        return gzip.open(file_path, 'rb')
+    if magic.startswith(b'BZh'):
+        return bz2.open(file_path, 'rb')
+    if magic.startswith(b'\xfd7zXZ'):
+        return lzma.open(file_path, 'rb')
+    return open(file_path, 'rb')
+
+
+def scan_pickle_file(file_path, allowlist=None, denylist=None, stop_on_critical=False, deadline=None):
+    """Scan a pickle/joblib file, or every ``.pkl`` member of a torch.save zip archive."""
+    scanner = PickleStreamScanner(allowlist, denylist, stop_on_critical, deadline)
+    if zipfile.is_zipfile(file_path):
+        with zipfile.ZipFile(file_path) as zf:
+            for member in zf.namelist():
+                if not member.endswith('.pkl'):
+                    continue
+                with zf.open(member) as f:
+                    scanner.scan(f, source=member)
+                if scanner.stopped_early:
+                    break
+    else:
+        with open_pickle_stream(file_path) as f:
+            scanner.scan(f)
+    return scanner.result()
+
+
+def pickle_vulnerabilities(result):
+    """Vulnerability entries for the non-allowlisted globals and problems in a scan result."""
+    vulnerabilities = []
+    for name, hit in result['globals'].items():
+        if hit['status'] == 'allowed':
+            continue
+        critical = hit['status'] == 'critical'
+        location = f"byte offset {hit['offset']}" + (f" of {hit['source']}" if hit['source'] else '')
+        vulnerabilities.append({
+            "id": str(uuid.uuid4()),
+            "title": "Dangerous Pickle Global Detected" if critical else "Unrecognized Pickle Global",
+            "description": f"{name} referenced {hit['references']} time(s) and called {hit['calls']} time(s), first at {location}",
+            "severity": "HIGH" if critical else "MEDIUM",
+            "cwe_id": "CWE-502",
+            "callable": name,
+            "offset": hit['offset']
+        })
+    if result['stopped_early']:
+        vulnerabilities.append({
+            "id": str(uuid.uuid4()),
+            "title": "Pickle Analysis Stopped Early",
+            "description": "Time budget ran out; later opcodes were not analyzed" if result['timed_out']
+                           else "Scan stopped at the first critical global; later opcodes were not analyzed",
+            "severity": "LOW",
+            "cwe_id": "CWE-502"
+        })
+    if result['memo_overflows']:
+        vulnerabilities.append({
+            "id": str(uuid.uuid4()),
+            "title": "Pickle Memo Limit Exceeded",
+            "description": f"{result['memo_overflows']} stream(s) memoised more than {MAX_MEMO_ENTRIES} values; "
+                           "globals built from later memo entries could not be resolved",
+            "severity": "MEDIUM",
+            "cwe_id": "CWE-770"
+        })
+    if result['error']:
+        vulnerabilities.append({
+            "id": str(uuid.uuid4()),
+            "title": "Pickle Analysis Failed",
+            "description": result['error'],
+            "severity": "MEDIUM",
+            "cwe_id": "CWE-20"
+        })
+    return vulnerabilities
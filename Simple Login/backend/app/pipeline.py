@@ -0,0 +1,82 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Default for stages whose failure must fail the whole pipeline
+REQUIRED = object()
+
+
+class StageError(Exception):
+    """A required stage failed or timed out, or the stage graph cannot be completed."""
+
+
+class Stage:
+    """One step of a pipeline: ``func`` is called with its deps' results as keyword arguments."""
+
+    def __init__(self, name, func, deps=(), timeout=None, default=REQUIRED):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.default = default
+
+    def fallback(self):
+        return self.default() if callable(self.default) else self.default
+
+
+def run_stages(stages, executor=None):
+    """Run a stage graph, starting each stage as soon as all of its deps have finished.
+
+    Independent stages run concurrently on ``executor`` (a thread pool sized to
+    the graph by default; any ``concurrent.futures`` executor works for
+    picklable stages). A stage that raises or outlives its timeout yields its
+    ``default`` instead, so its dependents still run, and is listed in
+    ``errors``; stages without a default raise StageError. A timeout only
+    abandons the stage's result: Python threads cannot be interrupted, so the
+    stage keeps running in the background and must not rely on anything the
+    caller tears down afterwards unless it checks for that and stops (see
+    ``ModelArtifact.holding``).
+
+    Returns ``(results, errors, timings)`` keyed by stage name.
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max(1, len(stages)), thread_name_prefix='scan-stage')
+    pending = {stage.name: stage for stage in stages}
+    running = {}  # future -> (stage, start time)
+    results, errors, timings = {}, {}, {}
+    try:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if all(dep in results for dep in stage.deps):
+                    del pending[name]
+                    kwargs = {dep: results[dep] for dep in stage.deps}
+                    running[executor.submit(stage.func, **kwargs)] = (stage, time.monotonic())
+            if not running:
+                raise StageError(f'unknown or cyclic dependencies: {sorted(pending)}')
+
+            deadlines = [start + stage.timeout for stage, start in running.values() if stage.timeout is not None]
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            now = time.monotonic()
+            for future, (stage, start) in list(running.items()):
+                if future in done:
+                    error = future.exception()
+                elif stage.timeout is not None and now - start >= stage.timeout:
+                    future.cancel()
+                    error = TimeoutError(f'timed out after {stage.timeout}s')
+                else:
+                    continue
+                del running[future]
+                timings[stage.name] = now - start
+                if error is None:
+                    results[stage.name] = future.result()
+                elif stage.default is REQUIRED:
+                    raise StageError(f'stage {stage.name!r} failed: {error}') from error
+                else:
+                    errors[stage.name] = str(error) or type(error).__name__
+                    results[stage.name] = stage.fallback()
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+    return results, errors, timings
@@ -24,7 +24,7 @@ class PDF(FPDF):
         self.set_text_color(0, 0, 0)
         self.ln(2)
 
-    def add_table_of_contents(self, file_name):
+    def add_table_of_contents(self, file_name, with_entropy=False):
         self.add_page()
         self.section_title('Table of Contents')
         self.set_font('Arial', '', 12)
@@ -35,13 +35,22 @@ class PDF(FPDF):
         self.cell(0, 8, f'5. Static Vulnerabilities ....................................... 4', ln=1)
         self.cell(0, 8, f'6. Dynamic Vulnerabilities ...................................... 5', ln=1)
         self.cell(0, 8, f'7. Adversarial Vulnerabilities ................................. 6', ln=1)
+        if with_entropy:
+            self.cell(0, 8, f'8. Entropy Profile .............................................. 7', ln=1)
         self.ln(5)
 
-    def add_code_section(self, code_lines, vuln_lines):
+    def add_code_section(self, code_lines, vuln_lines, line_numbers=None, total_lines=None):
         self.add_page()
         self.section_title('Model File Content')
+        if line_numbers is not None:
+            self.set_font('Arial', 'I', 9)
+            self.cell(0, 6, f'Excerpt: {len(code_lines)} of {total_lines} lines, around the findings', ln=1)
         self.set_font('Courier', '', 9)
-        for i, line in enumerate(code_lines, 1):
+        previous = 0
+        for i, line in zip(line_numbers or range(1, len(code_lines) + 1), code_lines):
+            if i > previous + 1 and line_numbers is not None:
+                self.cell(0, 5, '   ...', ln=1)
+            previous = i
             if i in vuln_lines:
                 color = SEVERITY_COLORS[vuln_lines[i]['severity']]
                 self.set_fill_color(*color)
@@ -79,8 +88,43 @@ class PDF(FPDF):
     def add_adversarial_section(self, adversarial_results):
         self.add_vuln_table(adversarial_results, section_title='Adversarial Vulnerabilities', columns=['Vulnerability', 'Severity', 'Description', 'Details'])
 
+    def add_entropy_section(self, profile):
+        self.add_page()
+        self.section_title('Entropy Profile')
+        self.set_font('Arial', '', 10)
+        values = profile['entropy']
+        rows = [
+            ('File size', f"{profile['size']} bytes"),
+            ('Window size', f"{profile['window']} bytes ({len(values)} windows)"),
+            ('Entropy min / mean / max', f"{profile['min']:.3f} / {profile['mean']:.3f} / {profile['max']:.3f} bits per byte"),
+            ('Entropy variance', f"{profile['variance']:.4f}"),
+            ('Outlier windows', str(profile['outlier_windows'])),
+            ('High-entropy windows (> 7.5)', str(profile['high_entropy_windows'])),
+        ]
+        for label, value in rows:
+            self.cell(70, 8, label, 1)
+            self.cell(0, 8, value, 1, ln=1)
+        if len(values) < 2:
+            return
+        # Entropy (0-8 bits/byte) per window, drawn as a polyline
+        x0, y0 = self.l_margin, self.get_y() + 6
+        width, height = self.w - self.l_margin - self.r_margin, 60
+        self.set_draw_color(150, 150, 150)
+        self.rect(x0, y0, width, height)
+        points = values[::max(1, len(values) // 400)]
+        dx = width / (len(points) - 1)
+        self.set_draw_color(0, 102, 204)
+        for i in range(1, len(points)):
+            self.line(x0 + (i - 1) * dx, y0 + height * (1 - points[i - 1] / 8),
+                      x0 + i * dx, y0 + height * (1 - points[i] / 8))
+        self.set_draw_color(0, 0, 0)
+        self.set_y(y0 + height + 2)
+        self.set_font('Arial', '', 8)
+        self.cell(0, 5, 'Entropy (0-8 bits per byte) of each window, from start to end of file', ln=1, align='C')
+
 
-def generate_pdf_report(code_lines, static_vulns, dynamic_vulns, adversarial_vulns, output_path, file_name=None):
+def generate_pdf_report(code_lines, static_vulns, dynamic_vulns, adversarial_vulns, output_path, file_name=None, entropy_profile=None,
+                        line_numbers=None, total_lines=None):
     pdf = PDF()
     pdf.add_page()
     # Cover page
@@ -99,14 +143,22 @@ def generate_pdf_report(code_lines, static_vulns, dynamic_vulns, adversarial_vul
     pdf.multi_cell(0, 10, 'This report provides a detailed analysis of the uploaded machine learning model file, highlighting any detected vulnerabilities and summarizing the results in a clear, professional format.')
     pdf.ln(10)
     # Table of Contents
-    pdf.add_table_of_contents(file_name or "<unknown>")
+    pdf.add_table_of_contents(file_name or "<unknown>", with_entropy=entropy_profile is not None)
     # Model code section
-    vuln_lines = {v['line']: v for v in static_vulns if 'line' in v}
-    pdf.add_code_section(code_lines, vuln_lines)
+    vuln_lines = {}
+    for v in static_vulns:
+        # Grouped findings highlight every line they occurred on
+        for start, end in v.get('line_ranges') or ([[v['line'], v['line']]] if 'line' in v else []):
+            for line in range(start, end + 1):
+                vuln_lines[line] = v
+    pdf.add_code_section(code_lines, vuln_lines, line_numbers, total_lines)
     # Static Vulnerabilities
     pdf.add_vuln_table(static_vulns, section_title='Static Vulnerabilities')
     # Dynamic Vulnerabilities
     pdf.add_dynamic_section(dynamic_vulns)
     # Adversarial Vulnerabilities
     pdf.add_adversarial_section(adversarial_vulns)
+    # Entropy Profile
+    if entropy_profile is not None:
+        pdf.add_entropy_section(entropy_profile)
     pdf.output(output_path)
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, Response, g, request, jsonify, send_from_directory, current_app
 from .models import User, db
 import os
 from werkzeug.utils import secure_filename
@@ -9,10 +9,17 @@ from flask_mail import Message
 from app import mail
 from datetime import datetime, timedelta
 import random
-from .scanner import scan_model
+from .artifact import ModelArtifact
+from .checks import ScanContext
+from .findings import diff_findings
+from .rules import RULESET_VERSION
+from .scanner import run_checks, extract_model_features, anomaly_detection, anomaly_findings
+from .pipeline import Stage, run_stages
+from . import metrics, scan_cache, tracing
 from .report_generator import generate_pdf_report
 from .dynamic_scanner import run_dynamic_scanner, run_adversarial_scanner
 import uuid
+import json
 
 auth_blueprint = Blueprint('auth', __name__)
 
@@ -20,7 +27,7 @@ auth_blueprint = Blueprint('auth', __name__)
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
 ALLOWED_EXTENSIONS = {'h5', 'pkl', 'pt', 'joblib', 'onnx', 'sav', 'model', 'bin', 'zip', 'tar', 'gz', 
                      'pytorch', 'keras', 'pb', 'tflite', 'pmml', 'mlmodel', 'xgb', 'cbm', 'pickle', 
-                     'txt', 'csv', 'json', 'xml', 'yml', 'yaml'}
+                     'safetensors', 'gguf', 'txt', 'csv', 'json', 'xml', 'yml', 'yaml'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -41,6 +48,113 @@ def login():
     else:
         return jsonify({'message': 'Invalid username or password'}), 401
 
+def grouped_details(finding):
+    """Occurrence count, line ranges, examples, archive members and pickle callable of a static finding, as JSON."""
+    details = {key: finding[key] for key in ('occurrences', 'line_ranges', 'examples', 'members', 'member', 'callable')
+               if key in finding}
+    return json.dumps(details) if details else ''
+
+def previous_upload(filename, model_id, with_manifest=False):
+    """The latest earlier upload under the same filename (optionally only one with a parts manifest)."""
+    query = UploadedModel.query.filter(UploadedModel.filename == filename, UploadedModel.id != model_id)
+    if with_manifest:
+        query = query.filter(UploadedModel.parts_manifest.isnot(None))
+    return query.order_by(UploadedModel.id.desc()).first()
+
+def previous_parts(filename, model_id):
+    """Per-member manifest of the last version of a file, if it was built under the current rule set."""
+    upload = previous_upload(filename, model_id, with_manifest=True)
+    if upload is None:
+        return None
+    manifest = json.loads(upload.parts_manifest)
+    return manifest['parts'] if manifest.get('ruleset') == RULESET_VERSION else None
+
+def version_diff(previous, static_vulns, static=None):
+    """New and resolved static findings against the previous version of the upload."""
+    if previous is None:
+        return None
+    before = [v.to_dict() for v in Vulnerability.query.filter_by(model_id=previous.id, type='static')]
+    new, resolved, unchanged = diff_findings(before, static_vulns)
+    diff = {
+        'previous_upload_id': previous.id,
+        'new': new,
+        'resolved': [{key: v[key] for key in ('title', 'severity', 'description', 'line', 'occurrences')}
+                     for v in resolved],
+        'unchanged': unchanged
+    }
+    if static is not None and static.parts:
+        diff['parts'] = {'reused': static.reused_parts, 'rescanned': len(static.parts) - static.reused_parts}
+    return diff
+
+def persist_findings(model_id, static_vulns, dynamic_vulns, adversarial_vulns, features=None, anomaly=None,
+                     parts=None):
+    """Save the flattened vulnerabilities, risk score, anomaly features and parts manifest of an upload."""
+    uploaded_model = db.session.get(UploadedModel, model_id)
+
+    # Helper to flatten and tag vulnerabilities
+    def flatten_vulns(vulns, vtype):
+        for v in vulns:
+            yield Vulnerability(
+                model_id=model_id,
+                type=vtype,
+                title=v.get('title') or v.get('attack') or v.get('Vulnerability'),
+                severity=v.get('severity', 'Low'),
+                description=v.get('description', v.get('code', '')),
+                details=v.get('details') or grouped_details(v),
+                line=v.get('line')
+            )
+
+    weights = [v.get('occurrences', 1) for v in (*static_vulns, *dynamic_vulns, *adversarial_vulns)]
+
+    # Save all vulnerabilities
+    all_vulns = list(flatten_vulns(static_vulns, 'static')) + \
+                list(flatten_vulns(dynamic_vulns, 'dynamic')) + \
+                list(flatten_vulns(adversarial_vulns, 'adversarial'))
+
+    for vuln in all_vulns:
+        db.session.add(vuln)
+
+    # Calculate risk score (simple example: high if any High severity)
+    high_risk = any(v.severity.lower() == 'high' for v in all_vulns)
+    uploaded_model.high_risk = high_risk
+    # Grouped findings still weigh once per occurrence
+    uploaded_model.risk_score = sum({'low': 1, 'medium': 2, 'high': 3}.get(v.severity.lower(), 1) * occurrences
+                                    for v, occurrences in zip(all_vulns, weights))
+
+    if features:
+        uploaded_model.features = json.dumps(features)
+    if anomaly and anomaly['analysis_complete']:
+        uploaded_model.anomaly_score = anomaly['anomaly_score']
+    if parts:
+        uploaded_model.parts_manifest = json.dumps({'ruleset': RULESET_VERSION, 'parts': parts})
+
+    db.session.commit()
+
+def record_scan_metrics(file_size, stage_timings, results, static_vulns):
+    metrics.SCANS.inc(result='scanned')
+    metrics.SCANNED_BYTES.inc(file_size)
+    for stage, seconds in stage_timings.items():
+        metrics.STAGE_SECONDS.observe(seconds, stage=stage)
+    for check, seconds in results['static'].timings.items():
+        metrics.CHECK_SECONDS.observe(seconds, check=check)
+    metrics.record_findings('static', static_vulns)
+    metrics.record_findings('dynamic', results['dynamic'])
+    metrics.record_findings('adversarial', results['adversarial'])
+
+
+@auth_blueprint.route('/metrics', methods=['GET'])
+def get_metrics():
+    return metrics.metrics_response()
+
+
+@auth_blueprint.teardown_request
+def close_scan_artifact(exc):
+    # Normally closed at the end of upload_file; this covers a scan that raised
+    artifact = g.pop('scan_artifact', None)
+    if artifact is not None:
+        artifact.close()
+
+
 @auth_blueprint.route('/api/upload', methods=['POST'])
 def upload_file():
     if 'file' not in request.files:
@@ -55,63 +169,132 @@ def upload_file():
         # Create uploads directory if it doesn't exist
         os.makedirs(UPLOAD_FOLDER, exist_ok=True)
         file_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(file_path)
+        # Opt-in span tree (and profile) of this upload, stored with it; a no-op when off
+        trace = tracing.start_trace(request.headers.get('X-Scan-Trace'))
+        with trace.span('load'):
+            file.save(file_path)
+            # Every stage reads the file through this one artifact; it is closed once the scan is done
+            artifact = g.scan_artifact = ModelArtifact(file_path)
+            file_size = artifact.size
+            metrics.UPLOAD_BYTES.observe(file_size)
         
-        # Save to database
+            # Reuse the findings of an identical file scanned as the same extension under the same rule set
+            file_hash = artifact.sha256
+        with trace.span('cache_lookup'):
+            cached = scan_cache.lookup(file_hash, artifact.ext)
         report_filename = f'report_{uuid.uuid4().hex}.pdf'
         report_path = os.path.join(UPLOAD_FOLDER, report_filename)
+
+        # Save to database
         uploaded_model = UploadedModel(
             filename=filename,
             file_path=file_path,
             report_path=report_filename,
             status='pending'
         )
-        db.session.add(uploaded_model)
-        db.session.commit()
-        
-        code_lines, static_vulns = scan_model(file_path)
-        dynamic_vulns = run_dynamic_scanner(file_path)
-        adversarial_vulns = run_adversarial_scanner(file_path)
-        generate_pdf_report(
-            code_lines,
-            static_vulns,         # from scanner.py
-            dynamic_vulns,        # from dynamic_scanner.py
-            adversarial_vulns,    # from dynamic_scanner.py (adversarial results)
-            report_path,
-            filename
-        )
-        
-        # Helper to flatten and tag vulnerabilities
-        def flatten_vulns(vulns, vtype):
-            for v in vulns:
-                yield Vulnerability(
-                    model_id=uploaded_model.id,
-                    type=vtype,
-                    title=v.get('title') or v.get('attack') or v.get('Vulnerability'),
-                    severity=v.get('severity', 'Low'),
-                    description=v.get('description', v.get('code', '')),
-                    details=v.get('details', ''),
-                    line=v.get('line')
+        with trace.span('db_commit'):
+            db.session.add(uploaded_model)
+            db.session.commit()
+
+            # Findings are diffed against the last upload of the same file; its manifest spares unchanged members
+            previous = previous_upload(filename, uploaded_model.id)
+            parts = previous_parts(filename, uploaded_model.id)
+        check_timings = {}
+        if cached:
+            cached_findings = cached.findings()
+            diff = version_diff(previous, cached_findings[0])
+            with trace.span('persist'):
+                persist_findings(uploaded_model.id, *cached_findings)
+            # A fresh report from the cached inputs, so the cover names this upload
+            inputs = cached.inputs()
+            with trace.span('report'):
+                generate_pdf_report(inputs.get('code_lines', []), *cached_findings, report_path, filename,
+                                    entropy_profile=inputs.get('entropy_profile'),
+                                    line_numbers=inputs.get('line_numbers'), total_lines=inputs.get('total_lines'))
+            incomplete = {}
+            metrics.SCANS.inc(result='cache_hit')
+        else:
+            app = current_app._get_current_object()
+            model_id = uploaded_model.id
+
+            def detect_anomaly(entropy):
+                # Keep the features for the anomaly detector's training corpus
+                features = extract_model_features(file_path, entropy)
+                return features, anomaly_detection(file_path, features)
+
+            def report(static, dynamic, adversarial, entropy, anomaly):
+                generate_pdf_report(
+                    static.code_lines,
+                    static.findings.to_dicts() + anomaly_findings(anomaly[1]),  # from scanner.py
+                    dynamic,              # from dynamic_scanner.py
+                    adversarial,          # from dynamic_scanner.py (adversarial results)
+                    report_path,
+                    filename,
+                    entropy_profile=entropy,
+                    line_numbers=static.line_numbers,
+                    total_lines=static.total_lines
                 )
 
-        # Save all vulnerabilities
-        all_vulns = list(flatten_vulns(static_vulns, 'static')) + \
-                    list(flatten_vulns(dynamic_vulns, 'dynamic')) + \
-                    list(flatten_vulns(adversarial_vulns, 'adversarial'))
+            def persist(static, dynamic, adversarial, anomaly):
+                # Runs on a worker thread, so it needs its own app context (and DB session)
+                with app.app_context():
+                    persist_findings(model_id, static.findings.to_dicts() + anomaly_findings(anomaly[1]),
+                                     dynamic, adversarial, *anomaly, parts=static.parts)
+
+            # Independent scans run concurrently; report and persistence start once their inputs are ready.
+            # A timed-out stage keeps running after the artifact is closed, so each one holds the artifact's views
+            hold = artifact.holding
+            timeout = current_app.config['SCAN_STAGE_TIMEOUT']
+            budget = current_app.config['SCAN_BUDGET_SECONDS']
+            with metrics.SCANS_IN_FLIGHT.time():
+                results, incomplete, stage_timings = run_stages([
+                    # The anomaly check runs as its own stage so it can share the entropy profile
+                    Stage('static', trace.wrap('static', hold(lambda: run_checks(file_path, budget, skip=('anomaly',),
+                                                                                 previous_parts=parts,
+                                                                                 artifact=artifact))),
+                          timeout=timeout, default=lambda: ScanContext(file_path, artifact=artifact)),
+                    Stage('dynamic', trace.wrap('dynamic', hold(lambda: run_dynamic_scanner(artifact))),
+                          timeout=timeout, default=list),
+                    Stage('adversarial', trace.wrap('adversarial', hold(lambda: run_adversarial_scanner(artifact))),
+                          timeout=timeout, default=list),
+                    Stage('entropy', trace.wrap('entropy', hold(lambda: artifact.entropy)),
+                          timeout=timeout, default=None),
+                    Stage('anomaly', trace.wrap('anomaly', detect_anomaly), deps=['entropy'], timeout=timeout,
+                          default=(None, {"anomaly_score": 0.0, "is_anomalous": False, "analysis_complete": False})),
+                    Stage('report', trace.wrap('report', report),
+                          deps=['static', 'dynamic', 'adversarial', 'entropy', 'anomaly']),
+                    Stage('persist', trace.wrap('persist', persist), deps=['static', 'dynamic', 'adversarial', 'anomaly'])
+                ])
+            check_timings = {name: round(seconds, 4) for name, seconds in results['static'].timings.items()}
+            static_vulns = results['static'].findings.to_dicts() + anomaly_findings(results['anomaly'][1])
+            record_scan_metrics(file_size, stage_timings, results, static_vulns)
+            trace.add_check_spans(results['static'])
+            diff = version_diff(previous, static_vulns, results['static'])
+            # Only complete scans are reused for identical uploads
+            if not incomplete and results['static'].complete:
+                static = results['static']
+                scan_cache.store(file_hash, artifact.ext, report_filename, static_vulns, results['dynamic'],
+                                 results['adversarial'], {'code_lines': static.code_lines,
+                                                          'line_numbers': static.line_numbers,
+                                                          'total_lines': static.total_lines,
+                                                          'entropy_profile': results['entropy']})
+
+        artifact.close()
+
+        if trace.enabled:
+            uploaded_model.profile_trace = json.dumps(trace.to_dict())
+            db.session.commit()
 
-        for vuln in all_vulns:
-            db.session.add(vuln)
-
-        # Calculate risk score (simple example: high if any High severity)
-        high_risk = any(v.severity.lower() == 'high' for v in all_vulns)
-        uploaded_model.high_risk = high_risk
-        uploaded_model.risk_score = sum({'low': 1, 'medium': 2, 'high': 3}.get(v.severity.lower(), 1) for v in all_vulns)
-
-        db.session.commit()
-        
         # Return the full URL for the report
         report_url = f'http://localhost:5000/uploads/{report_filename}'
-        return jsonify({'report_url': report_url}), 201
+        return jsonify({
+            'report_url': report_url,
+            'cache_hit': cached is not None,
+            'incomplete_stages': sorted(incomplete),
+            'check_timings': check_timings,
+            'diff': diff,
+            'trace_url': f'http://localhost:5000/api/uploads/{uploaded_model.id}/trace' if trace.enabled else None
+        }), 201
     
     return jsonify({'error': 'File type not allowed'}), 400
 
@@ -126,6 +309,14 @@ def get_uploads():
         for upload in uploads
     ])
 
+@auth_blueprint.route('/api/uploads/<int:model_id>/trace', methods=['GET'])
+def get_upload_trace(model_id):
+    uploaded_model = db.session.get(UploadedModel, model_id)
+    if uploaded_model is None or uploaded_model.profile_trace is None:
+        return jsonify({'error': 'No trace recorded for this upload'}), 404
+    return Response(uploaded_model.profile_trace, mimetype='application/json',
+                    headers={'Content-Disposition': f'attachment; filename=trace_{model_id}.json'})
+
 @auth_blueprint.route('/api/signup', methods=['POST'])
 def signup():
     data = request.json
@@ -0,0 +1,372 @@
+import _compat_pickle
+import collections
+import pickle
+import struct
+
+from .pickle_scanner import JOBLIB_ARRAY_WRAPPER, classify_global, open_pickle_stream
+
+NUMPY_KINDS = {'f': 'float', 'i': 'int', 'u': 'uint', 'c': 'complex'}
+NUMPY_NAMES = {'b1': 'bool', 'O': 'object', 'U': 'str', 'S': 'bytes', 'V': 'void',
+               'M8': 'datetime64', 'm8': 'timedelta64'}
+STRUCT_CODES = {'f2': 'e', 'f4': 'f', 'f8': 'd', 'i1': 'b', 'i2': 'h', 'i4': 'i', 'i8': 'q',
+                'u1': 'B', 'u2': 'H', 'u4': 'I', 'u8': 'Q', 'b1': '?'}
+
+TORCH_STORAGE_DTYPES = {
+    'DoubleStorage': 'float64', 'FloatStorage': 'float32', 'HalfStorage': 'float16',
+    'BFloat16Storage': 'bfloat16', 'LongStorage': 'int64', 'IntStorage': 'int32',
+    'ShortStorage': 'int16', 'CharStorage': 'int8', 'ByteStorage': 'uint8',
+    'BoolStorage': 'bool', 'ComplexFloatStorage': 'complex64',
+    'ComplexDoubleStorage': 'complex128', 'UntypedStorage': 'uint8',
+}
+
+# Byte strings larger than this are skipped and replaced by a placeholder
+LARGE_BYTES = 1 << 16
+# Items (or bytes) one unpickle may build through the container and bytes constructors of
+# SAFE_GLOBALS beyond what the stream itself holds: range() arguments and memoized
+# arguments passed more than once could otherwise grow without bound
+MAX_ALLOCATED_ITEMS = 1 << 24
+
+TORCH_DTYPES = {
+    'float64', 'float32', 'float16', 'bfloat16', 'half', 'double', 'float',
+    'int64', 'int32', 'int16', 'int8', 'uint8', 'long', 'int', 'short', 'bool',
+    'complex64', 'complex128',
+}
+
+
+class ArrayPlaceholder:
+    """Stand-in for an ndarray or tensor: keeps shape, dtype and size, never the data."""
+
+    def __init__(self, kind, shape=(), dtype=None):
+        self.kind = kind
+        self.shape = tuple(shape)
+        self.dtype = dtype
+
+    @property
+    def size(self):
+        size = 1
+        for dim in self.shape:
+            size *= dim
+        return size
+
+    def __setstate__(self, state):
+        # ndarray state: ([version,] shape, dtype, is_fortran, raw data)
+        if isinstance(state, tuple) and len(state) == 5:
+            state = state[1:]
+        if isinstance(state, tuple) and len(state) == 4:
+            shape, dtype = state[0], state[1]
+            self.shape = tuple(shape) if isinstance(shape, (tuple, list)) else ()
+            self.dtype = str(dtype)
+
+    def __repr__(self):
+        return f'<{self.kind} dtype={self.dtype} dims={self.shape} size={self.size}>'
+
+
+class BytesPlaceholder:
+    """Stand-in for a large byte string (usually raw array data) that was skipped."""
+
+    def __init__(self, length):
+        self.length = length
+
+    def __repr__(self):
+        return f'<bytes len={self.length}>'
+
+
+class DtypePlaceholder:
+    """Stand-in for ``numpy.dtype``; resolves the type code to a readable name."""
+
+    def __init__(self, descr='', align=False, copy=True):
+        self.descr = str(descr)
+        self.itemsize = None
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple) and len(state) > 5 and isinstance(state[5], int) and state[5] > 0:
+            self.itemsize = state[5]
+
+    @property
+    def name(self):
+        descr = self.descr.lstrip('<>|=')
+        if descr in NUMPY_NAMES:
+            return NUMPY_NAMES[descr]
+        digits = ''.join(c for c in descr if c.isdigit())
+        if descr[:1] in NUMPY_KINDS and digits:
+            return f'{NUMPY_KINDS[descr[0]]}{int(digits) * 8}'
+        return NUMPY_NAMES.get(descr[:1], descr)
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return f'dtype({self.name})'
+
+
+class StoragePlaceholder:
+    """Stand-in for a torch storage referenced through ``persistent_load``."""
+
+    def __init__(self, dtype, key, numel):
+        self.dtype = dtype
+        self.key = key
+        self.numel = numel
+
+    def __repr__(self):
+        return f'<storage dtype={self.dtype} key={self.key} numel={self.numel}>'
+
+
+class ObjectPlaceholder:
+    """Stand-in for an allowlisted class: records its arguments and state but runs none of its code."""
+
+    qualname = 'object'
+
+    def __new__(cls, *args, **kwargs):
+        obj = super().__new__(cls)
+        obj.args = args
+        obj.state = None
+        return obj
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __setstate__(self, state):
+        self.state = state
+
+    def __repr__(self):
+        return f'<{self.qualname}>'
+
+
+_placeholder_classes = {}
+
+
+def placeholder_class(qualname):
+    cls = _placeholder_classes.get(qualname)
+    if cls is None:
+        cls = type(qualname.rsplit('.', 1)[-1], (ObjectPlaceholder,), {'qualname': qualname})
+        _placeholder_classes[qualname] = cls
+    return cls
+
+
+def _reconstruct_array(subtype, shape, dtype):
+    return ArrayPlaceholder('ndarray', shape)
+
+
+def _frombuffer(buffer, dtype, shape, order='C'):
+    # Protocol 5 arrays: numpy.core.numeric._frombuffer(buffer, dtype, shape, order)
+    return ArrayPlaceholder('ndarray', shape, str(dtype))
+
+
+def _numpy_scalar(dtype, data=None):
+    code = STRUCT_CODES.get(getattr(dtype, 'descr', '').lstrip('<>|='))
+    if code and isinstance(data, bytes) and len(data) == struct.calcsize(code):
+        return struct.unpack('<' + code, data)[0]
+    return ArrayPlaceholder('scalar', (), str(dtype))
+
+
+def _rebuild_tensor(storage, storage_offset, size, stride=None, *args, **kwargs):
+    return ArrayPlaceholder('tensor', size if isinstance(size, (tuple, list)) else (),
+                            getattr(storage, 'dtype', None))
+
+
+def _rebuild_parameter(data, *args, **kwargs):
+    if isinstance(data, ArrayPlaceholder):
+        data.kind = 'parameter'
+    return data
+
+
+def _encode(text, encoding='utf-8'):
+    # Protocols 0-2 pickle bytes as _codecs.encode(str, 'latin1')
+    if not isinstance(text, str) or encoding not in ('latin1', 'latin-1', 'utf-8', 'utf8', 'ascii'):
+        raise pickle.UnpicklingError(f'_codecs.encode called with {encoding!r}')
+    return text.encode(encoding)
+
+
+def _reconstructor(cls, base, state=None):
+    if not (isinstance(cls, type) and issubclass(cls, ObjectPlaceholder)):
+        raise pickle.UnpicklingError(f'copyreg._reconstructor called with {cls!r}')
+    return cls.__new__(cls)
+
+
+SAFE_GLOBALS = {
+    'builtins.set': set, 'builtins.frozenset': frozenset, 'builtins.list': list,
+    'builtins.dict': dict, 'builtins.tuple': tuple, 'builtins.bytearray': bytearray,
+    'builtins.bytes': bytes, 'builtins.str': str, 'builtins.int': int,
+    'builtins.float': float, 'builtins.complex': complex, 'builtins.bool': bool,
+    'builtins.slice': slice, 'builtins.range': range, 'builtins.object': object,
+    'collections.OrderedDict': collections.OrderedDict,
+    'collections.defaultdict': collections.defaultdict,
+    'collections.Counter': collections.Counter,
+    'collections.deque': collections.deque,
+    'copyreg._reconstructor': _reconstructor,
+    '_codecs.encode': _encode,
+    'numpy.core.multiarray._reconstruct': _reconstruct_array,
+    'numpy._core.multiarray._reconstruct': _reconstruct_array,
+    'numpy.core.multiarray.scalar': _numpy_scalar,
+    'numpy._core.multiarray.scalar': _numpy_scalar,
+    'numpy.core.numeric._frombuffer': _frombuffer,
+    'numpy._core.numeric._frombuffer': _frombuffer,
+    'numpy.dtype': DtypePlaceholder,
+    'torch._utils._rebuild_tensor': _rebuild_tensor,
+    'torch._utils._rebuild_tensor_v2': _rebuild_tensor,
+    'torch._utils._rebuild_parameter': _rebuild_parameter,
+    'torch._utils._rebuild_parameter_with_state': _rebuild_parameter,
+    'torch.Size': tuple,
+}
+# Constructors whose result grows with their arguments (see MAX_ALLOCATED_ITEMS)
+SIZED_GLOBALS = {
+    'builtins.set', 'builtins.frozenset', 'builtins.list', 'builtins.dict', 'builtins.tuple',
+    'builtins.bytearray', 'builtins.bytes', 'builtins.str', 'collections.OrderedDict',
+    'collections.Counter', 'collections.deque', '_codecs.encode', 'torch.Size',
+}
+SIZE_ARGUMENT_GLOBALS = ('builtins.bytes', 'builtins.bytearray')
+
+
+def _size(value):
+    try:
+        return len(value)
+    except OverflowError:  # range() longer than sys.maxsize
+        return float('inf')
+    except TypeError:
+        return 0
+
+
+class RestrictedUnpickler(pickle._Unpickler):
+    """Unpickler that rebuilds containers and primitives only.
+
+    Arrays and tensors become ``ArrayPlaceholder`` objects, other allowlisted
+    classes become ``ObjectPlaceholder`` stubs, and any other global raises
+    ``UnpicklingError`` before it can be imported. The pure-Python unpickler
+    is used so large byte strings and the raw array data joblib writes
+    between opcodes can be skipped instead of read.
+    """
+
+    dispatch = dict(pickle._Unpickler.dispatch)
+
+    def __init__(self, file, allowlist=None, denylist=None):
+        super().__init__(file)
+        self._fh = file
+        self.allowlist = allowlist
+        self.denylist = denylist
+        self.allocated = 0
+        self._consumed = set()  # ids of arguments already copied once
+
+    def find_class(self, module, name):
+        if self.proto < 3 and self.fix_imports:
+            if (module, name) in _compat_pickle.NAME_MAPPING:
+                module, name = _compat_pickle.NAME_MAPPING[(module, name)]
+            elif module in _compat_pickle.IMPORT_MAPPING:
+                module = _compat_pickle.IMPORT_MAPPING[module]
+        qualname = f'{module}.{name}'
+        status = classify_global(module, name, self.allowlist, self.denylist)
+        if status == 'critical':
+            raise pickle.UnpicklingError(f"global '{qualname}' is forbidden")
+        if qualname in SAFE_GLOBALS:
+            if qualname in SIZED_GLOBALS:
+                return self._sized(qualname, SAFE_GLOBALS[qualname])
+            return SAFE_GLOBALS[qualname]
+        if status != 'allowed':
+            raise pickle.UnpicklingError(f"global '{qualname}' is not allowlisted")
+        if module == 'torch' and name.endswith('Storage'):
+            return TORCH_STORAGE_DTYPES.get(name, name)
+        if module == 'torch' and name in TORCH_DTYPES:
+            return qualname
+        return placeholder_class(qualname)
+
+    def _sized(self, qualname, factory):
+        """``factory`` refusing size arguments (``bytes(10**12)``) and charging what it builds to the budget.
+
+        An argument's first copy is free (the stream already paid for it);
+        ranges and arguments passed again are charged their length.
+        """
+        def build(*args, **kwargs):
+            if qualname in SIZE_ARGUMENT_GLOBALS and args and type(args[0]) is int:
+                raise pickle.UnpicklingError(f'{qualname} called with a size')
+            for arg in (*args, *kwargs.values()):
+                if isinstance(arg, range) or id(arg) in self._consumed:
+                    self.allocated += _size(arg)
+                else:
+                    self._consumed.add(id(arg))
+            if self.allocated > MAX_ALLOCATED_ITEMS:
+                raise pickle.UnpicklingError(f'more than {MAX_ALLOCATED_ITEMS} items built by {qualname} and '
+                                             f'other constructors')
+            return factory(*args, **kwargs)
+        return build
+
+    def persistent_load(self, pid):
+        # torch.save: ('storage', storage_type, key, location, numel)
+        if isinstance(pid, tuple) and len(pid) >= 5 and pid[0] == 'storage':
+            return StoragePlaceholder(pid[1], pid[2], pid[4])
+        raise pickle.UnpicklingError(f'unsupported persistent id {pid!r}')
+
+    def load_build(self):
+        pickle._Unpickler.load_build(self)
+        inst = self.stack[-1]
+        if isinstance(inst, ObjectPlaceholder) and inst.qualname == JOBLIB_ARRAY_WRAPPER:
+            self.stack[-1] = self._read_joblib_array(inst.state or {})
+    dispatch[pickle.BUILD[0]] = load_build
+
+    def _load_bytes(self, size, factory=bytes):
+        frame = self._unframer.current_frame
+        if size > LARGE_BYTES and (frame is None or frame.tell() >= len(frame.getbuffer())):
+            self._skip(size)
+            self.append(BytesPlaceholder(size))
+        else:
+            self.append(factory(self.read(size)))
+
+    def load_binbytes(self):
+        self._load_bytes(struct.unpack('<I', self.read(4))[0])
+    dispatch[pickle.BINBYTES[0]] = load_binbytes
+
+    def load_binbytes8(self):
+        self._load_bytes(struct.unpack('<Q', self.read(8))[0])
+    dispatch[pickle.BINBYTES8[0]] = load_binbytes8
+
+    def load_bytearray8(self):
+        self._load_bytes(struct.unpack('<Q', self.read(8))[0], bytearray)
+    dispatch[pickle.BYTEARRAY8[0]] = load_bytearray8
+
+    def _read_joblib_array(self, state):
+        shape = tuple(state.get('shape') or ())
+        dtype = state.get('dtype')
+        placeholder = ArrayPlaceholder('ndarray', shape, str(dtype))
+        descr = getattr(dtype, 'descr', '')
+        if descr.startswith('O'):
+            # Object arrays are stored as a nested pickle stream
+            nested = RestrictedUnpickler(self._fh, self.allowlist, self.denylist)
+            nested.load()
+            return placeholder
+        itemsize = getattr(dtype, 'itemsize', None)
+        if not itemsize:
+            digits = ''.join(c for c in descr if c.isdigit())
+            if not digits:
+                raise pickle.UnpicklingError(f'unsupported joblib array dtype {descr!r}')
+            itemsize = int(digits)
+        if 'numpy_array_alignment_bytes' in state:
+            self._skip(int.from_bytes(self.read(1), 'little'))
+        self._skip(placeholder.size * itemsize)
+        return placeholder
+
+    def _skip(self, n):
+        frame = self._unframer.current_frame
+        if frame is not None and frame.tell() < len(frame.getbuffer()):
+            self.read(n)
+            return
+        try:
+            self._fh.seek(n, 1)
+        except (OSError, ValueError, AttributeError):
+            while n > 0:
+                chunk = self._fh.read(min(n, 1 << 20))
+                if not chunk:
+                    break
+                n -= len(chunk)
+
+
+def restricted_load(file_path, allowlist=None, denylist=None):
+    """Unpickle ``file_path`` without importing or running any of its globals."""
+    with open_pickle_stream(file_path) as f:
+        return RestrictedUnpickler(f, allowlist, denylist).load()
+
+
+def placeholder_items(obj):
+    """Return the key/value pairs of a dict or of a placeholder's dict state, else None."""
+    if isinstance(obj, dict):
+        return obj.items()
+    if isinstance(obj, ObjectPlaceholder) and isinstance(obj.state, dict):
+        return obj.state.items()
+    return None
@@ -0,0 +1,181 @@
+import json
+import math
+import os
+import re
+import struct
+from collections import Counter
+
+import numpy as np
+
+from .checks import LARGE_METADATA, LISTED_CHARS
+
+# The reference implementation refuses headers above 100 MB
+MAX_HEADER_BYTES = 100 * 1024 * 1024
+
+DTYPES = {
+    'BOOL': np.bool_, 'U8': np.uint8, 'I8': np.int8, 'U16': np.uint16, 'I16': np.int16,
+    'U32': np.uint32, 'I32': np.int32, 'U64': np.uint64, 'I64': np.int64,
+    'F16': np.float16, 'F32': np.float32, 'F64': np.float64,
+    'BF16': 2, 'F8_E4M3': 1, 'F8_E5M2': 1,  # no numpy dtype: item size only, exposed as raw bytes
+}
+
+# Metadata strings that look like code or template injection (e.g. Jinja sandbox escapes)
+SUSPICIOUS_METADATA = re.compile(
+    r'__(class|globals|subclasses|builtins|import|init|mro|base)__|\bos\.(system|popen)|\bsubprocess\b'
+    r'|\b(eval|exec|compile)\s*\(|\bpickle\.loads\b|\bimport\s+os\b', re.IGNORECASE
+)
+
+
+class HeaderError(ValueError):
+    pass
+
+
+class OversizedHeader(HeaderError):
+    pass
+
+
+def _itemsize(dtype):
+    kind = DTYPES[dtype]
+    return kind if isinstance(kind, int) else np.dtype(kind).itemsize
+
+
+def read_header(file_path):
+    """Parse the JSON header of a safetensors file.
+
+    Returns ``(header_size, metadata, tensors)`` where each tensor is a dict
+    with ``name``, ``dtype``, ``shape`` and absolute ``start``/``end`` byte
+    offsets. Only the first ``8 + header_size`` bytes are read.
+    """
+    with open(file_path, 'rb') as f:
+        prefix = f.read(8)
+        if len(prefix) < 8:
+            raise HeaderError('file too small for a safetensors header')
+        (header_size,) = struct.unpack('<Q', prefix)
+        if header_size > MAX_HEADER_BYTES:
+            raise OversizedHeader(f'header declares {header_size} bytes (limit {MAX_HEADER_BYTES})')
+        raw = f.read(header_size)
+    if len(raw) < header_size:
+        raise HeaderError(f'header declares {header_size} bytes but the file ends first')
+    try:
+        header = json.loads(raw)
+    except ValueError as e:
+        raise HeaderError(f'header is not valid JSON: {e}')
+    if not isinstance(header, dict):
+        raise HeaderError('header is not a JSON object')
+
+    metadata = header.pop('__metadata__', None) or {}
+    if not isinstance(metadata, dict):
+        raise HeaderError('__metadata__ is not a JSON object')
+    data_start = 8 + header_size
+    tensors = []
+    for name, info in header.items():
+        try:
+            begin, end = info['data_offsets']
+            if not isinstance(info['dtype'], str):
+                raise TypeError
+            tensors.append({
+                'name': name, 'dtype': info['dtype'], 'shape': [int(d) for d in info['shape']],
+                'start': data_start + int(begin), 'end': data_start + int(end)
+            })
+        except (KeyError, TypeError, ValueError):
+            raise HeaderError(f'tensor {name!r} has a malformed entry')
+    return header_size, metadata, tensors
+
+
+def scan_safetensors(file_path):
+    """Validate the header of a safetensors file against its size, without reading tensor data.
+
+    Flags oversized headers, spans that overlap, fall outside the file or
+    disagree with dtype and shape, unreferenced bytes between tensors and
+    suspicious metadata strings. Returns ``{'listing', 'findings'}``.
+    """
+    listing, findings = [], []
+
+    def add(line, code, severity, attack, cwe_id=None):
+        finding = {'line': line, 'code': code, 'severity': severity, 'attack': attack}
+        if cwe_id:
+            finding['cwe_id'] = cwe_id
+        findings.append(finding)
+
+    file_size = os.path.getsize(file_path)
+    try:
+        header_size, metadata, tensors = read_header(file_path)
+    except OversizedHeader as e:
+        add(1, f"Could not read safetensors header: {e}", 'High', 'Oversized Model Header', 'CWE-400')
+        return {'listing': [f'<Could not parse safetensors header: {e}>'], 'findings': findings}
+    except HeaderError as e:
+        add(1, f"Could not read safetensors header: {e}", 'Medium', 'Malformed Safetensors Header', 'CWE-20')
+        return {'listing': [f'<Could not parse safetensors header: {e}>'], 'findings': findings}
+
+    data_start = 8 + header_size
+    dtypes = Counter(t['dtype'] for t in tensors)
+    listing.append(f"header: {header_size} bytes")
+    listing.append(f"tensors: {len(tensors)} holding {sum(t['end'] - t['start'] for t in tensors)} bytes")
+    listing.append('dtypes: ' + ', '.join(f"{d} x{n}" for d, n in sorted(dtypes.items())))
+    # Tensor entries take ~100 bytes each; anything far beyond that is padding or a payload
+    if header_size > LARGE_METADATA + 1024 * len(tensors):
+        add(1, f"Header of {header_size} bytes for {len(tensors)} tensors", 'Medium', 'Oversized Model Header', 'CWE-400')
+
+    for key, value in metadata.items():
+        value = value if isinstance(value, str) else json.dumps(value)
+        listing.append(f"metadata {str(key)[:LISTED_CHARS]}: {value[:LISTED_CHARS]}")
+        if len(value) > LARGE_METADATA:
+            add(len(listing), f"__metadata__[{key!r}] holds {len(value)} bytes", 'Medium',
+                'Large Embedded Metadata', 'CWE-506')
+        match = SUSPICIOUS_METADATA.search(value)
+        if match:
+            add(len(listing), f"__metadata__[{key!r}] contains {match.group(0)!r}", 'Medium',
+                'Suspicious Model Metadata', 'CWE-94')
+
+    def tensor_finding(tensor, problem, severity, attack, cwe_id):
+        listing.append(f"tensor {tensor['name'][:LISTED_CHARS]}: {tensor['dtype']} {tensor['shape']} "
+                       f"bytes {tensor['start']}-{tensor['end']}")
+        add(len(listing), f"Tensor {tensor['name'][:LISTED_CHARS]!r} {problem}", severity, attack, cwe_id)
+
+    previous, covered = None, data_start
+    for tensor in sorted(tensors, key=lambda t: (t['start'], t['end'])):
+        if tensor['dtype'] not in DTYPES:
+            tensor_finding(tensor, f"has unknown dtype {tensor['dtype']!r}", 'Low', 'Malformed Safetensors Header', 'CWE-20')
+        elif tensor['end'] - tensor['start'] != math.prod(tensor['shape']) * _itemsize(tensor['dtype']):
+            tensor_finding(tensor, "span does not match its dtype and shape", 'High',
+                           'Inconsistent Tensor Extent', 'CWE-130')
+        covered = max(covered, min(tensor['end'], file_size))
+        if tensor['start'] < data_start or tensor['end'] < tensor['start'] or tensor['end'] > file_size:
+            tensor_finding(tensor, f"points outside the data section of a {file_size}-byte file", 'High',
+                           'Out-of-Bounds Tensor Offset', 'CWE-125')
+            continue
+        if previous is not None and tensor['start'] < previous['end']:
+            tensor_finding(tensor, f"overlaps {previous['name'][:LISTED_CHARS]!r}", 'High',
+                           'Overlapping Tensor Data', 'CWE-119')
+        elif tensor['start'] > (previous['end'] if previous else data_start):
+            gap = tensor['start'] - (previous['end'] if previous else data_start)
+            tensor_finding(tensor, f"is preceded by {gap} unreferenced bytes", 'Medium',
+                           'Unreferenced Data in Model File', 'CWE-506')
+        if previous is None or tensor['end'] > previous['end']:
+            previous = tensor
+    if file_size > covered:
+        listing.append(f"trailing data: {file_size - covered} bytes")
+        add(len(listing), f"{file_size - covered} bytes after the last tensor", 'Medium',
+            'Unreferenced Data in Model File', 'CWE-506')
+    return {'listing': listing, 'findings': findings}
+
+
+def tensor_views(file_path):
+    """Memory-mapped, zero-copy numpy views of every in-bounds tensor, keyed by name.
+
+    Dtypes without a numpy equivalent (BF16, FP8) are returned as raw
+    ``uint8`` views. Nothing is read until a view is touched.
+    """
+    _, _, tensors = read_header(file_path)
+    data = np.memmap(file_path, dtype=np.uint8, mode='r')
+    views = {}
+    for tensor in tensors:
+        if not tensor['start'] <= tensor['end'] <= len(data) or tensor['dtype'] not in DTYPES:
+            continue
+        raw = data[tensor['start']:tensor['end']]
+        kind = DTYPES[tensor['dtype']]
+        if isinstance(kind, int) or raw.size != math.prod(tensor['shape']) * np.dtype(kind).itemsize:
+            views[tensor['name']] = raw
+        else:
+            views[tensor['name']] = raw.view(kind).reshape(tensor['shape'])
+    return views
@@ -0,0 +1,73 @@
+import json
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from app.models import ScanResultCache
+from .rules import RULESET_VERSION
+
+
+def lookup(file_hash, extension):
+    """Return the cache entry for ``file_hash`` uploaded as ``extension`` under the current rule set, or None.
+
+    The same bytes under another extension go through other checks, so they never share an entry.
+    """
+    entry = ScanResultCache.query.filter_by(file_hash=file_hash, extension=extension,
+                                            ruleset_version=RULESET_VERSION).first()
+    if entry is None:
+        return None
+    max_age = timedelta(hours=current_app.config['SCAN_CACHE_MAX_AGE_HOURS'])
+    if entry.created_at < datetime.utcnow() - max_age:
+        db.session.delete(entry)
+        db.session.commit()
+        return None
+    entry.hit_count = (entry.hit_count or 0) + 1
+    entry.last_hit_at = datetime.utcnow()
+    db.session.commit()
+    return entry
+
+
+def store(file_hash, extension, report_path, static_vulns, dynamic_vulns, adversarial_vulns, report_inputs=None):
+    """Cache the findings of a completed scan and what its report was built from, then evict.
+
+    ``report_inputs`` (code lines, line numbers and entropy profile) let a
+    hit build its own report, with its own filename on the cover.
+    """
+    payload = [json.dumps(v, default=str) for v in (static_vulns, dynamic_vulns, adversarial_vulns, report_inputs or {})]
+    entry = ScanResultCache.query.filter_by(file_hash=file_hash, extension=extension,
+                                            ruleset_version=RULESET_VERSION).first()
+    if entry is None:
+        entry = ScanResultCache(file_hash=file_hash, extension=extension, ruleset_version=RULESET_VERSION)
+        db.session.add(entry)
+    entry.report_path = report_path
+    entry.static_vulns, entry.dynamic_vulns, entry.adversarial_vulns, entry.report_inputs = payload
+    entry.size_bytes = sum(len(p) for p in payload)
+    entry.created_at = entry.last_hit_at = datetime.utcnow()
+    db.session.commit()
+    evict()
+
+
+def evict():
+    """Drop expired or outdated entries, then least recently hit ones until under the size limit.
+
+    Report files are left alone: they still belong to the uploads that produced them.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=current_app.config['SCAN_CACHE_MAX_AGE_HOURS'])
+    ScanResultCache.query.filter(
+        (ScanResultCache.created_at < cutoff) | (ScanResultCache.ruleset_version != RULESET_VERSION)
+    ).delete(synchronize_session=False)
+
+    max_bytes = current_app.config['SCAN_CACHE_MAX_BYTES']
+    total = db.session.query(db.func.coalesce(db.func.sum(ScanResultCache.size_bytes), 0)).scalar()
+    if total > max_bytes:
+        entries = db.session.query(ScanResultCache.id, ScanResultCache.size_bytes) \
+            .order_by(ScanResultCache.last_hit_at.asc()).all()
+        stale = []
+        for entry_id, size in entries:
+            if total <= max_bytes:
+                break
+            stale.append(entry_id)
+            total -= size or 0
+        ScanResultCache.query.filter(ScanResultCache.id.in_(stale)).delete(synchronize_session=False)
+    db.session.commit()
@@ -0,0 +1,40 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from config import Config
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_scan_pool():
+    """The process-wide pool for the signature and archive scans, started on first use.
+
+    Its processes come from a forkserver (spawn where there is none), never
+    a plain fork of the threaded web process, and live as long as the app,
+    so each one imports the scanners once. Work submitted here must stop by
+    itself at its deadline: a running job cannot be cancelled.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                _pool = ProcessPoolExecutor(max_workers=Config.SCAN_WORKERS or os.cpu_count() or 1,
+                                            mp_context=context)
+                atexit.register(_pool.shutdown, cancel_futures=True)
+    return _pool
+
+
+def discard_scan_pool(pool):
+    """Forget ``pool`` after it broke (a worker died) so the next scan starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
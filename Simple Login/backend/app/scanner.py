@@ -1,284 +1,294 @@
 import os
-import torch
-import re
-import pickle
 import hashlib
-import pickletools
 import uuid
+import zipfile
 import numpy as np
-from sklearn.ensemble import IsolationForest
+from .rules import RuleEngine
+from .pickle_scanner import scan_pickle_file, pickle_vulnerabilities
+from .safe_unpickler import restricted_load, placeholder_items
+from .signature_scanner import signature_scan, signature_vulnerabilities
+from .archive_scanner import scan_archive
+from .onnx_scanner import scan_onnx
+from .tflite_scanner import scan_tflite
+from .safetensors_scanner import scan_safetensors
+from .gguf_scanner import scan_gguf
+from .keras_scanner import scan_keras
+from .text_scanner import scan_text
+from .tensor_stats import analyze_tensors
+from .entropy import entropy_profile
+from .anomaly import score_batch
+from .lazy import lazy_import
+from .artifact import ModelArtifact
+from .checks import (register_check, run_checks, as_finding, MODERATE, EXPENSIVE,
+                     PICKLE_EXTENSIONS, TORCH_EXTENSIONS, ARCHIVE_EXTENSIONS, ONNX_EXTENSIONS, TFLITE_EXTENSIONS,
+                     SAFETENSORS_EXTENSIONS, GGUF_EXTENSIONS, TENSOR_FILE_EXTENSIONS, KERAS_EXTENSIONS,
+                     STRUCTURED_EXTENSIONS)
 
-def scan_model(file_path):
-    findings = []
-    code_lines = []
-    ext = os.path.splitext(file_path)[1].lower()
+torch = lazy_import('torch')
 
-    # 1. Insecure Serialization Formats
-    if ext in ['.pkl', '.pickle', '.joblib']:
-        findings.append({
-            'line': 1,
-            'code': f"File extension: {ext}",
-            'severity': 'High',
-            'attack': 'Insecure Serialization Format (Pickle/Joblib)'
-        })
+RULE_ENGINE = RuleEngine()
 
-    if ext in ['.pkl', '.pickle', '.joblib']:
-        # Try to load pickle and scan keys/values
-        try:
-            with open(file_path, 'rb') as f:
-                obj = pickle.load(f)
-            # If it's a dict, scan keys/values
-            if isinstance(obj, dict):
-                for k, v in obj.items():
-                    line = f"{k}: {v}"
-                    code_lines.append(line)
-                    # 2. Lack of Model Obfuscation & 3. Plaintext Sensitive Metadata
-                    if re.search(r'(layer|weight|bias|label|trainable)', str(k), re.IGNORECASE) or re.search(r'(layer|weight|bias|label|trainable)', str(v), re.IGNORECASE):
-                        findings.append({
-                            'line': len(code_lines),
-                            'code': line,
-                            'severity': 'Medium',
-                            'attack': 'Lack of Model Obfuscation / Plaintext Metadata'
-                        })
-                    if re.search(r'(username|password|email|token)', str(k), re.IGNORECASE) or re.search(r'(username|password|email|token)', str(v), re.IGNORECASE):
-                        findings.append({
-                            'line': len(code_lines),
-                            'code': line,
-                            'severity': 'High',
-                            'attack': 'Plaintext Sensitive Metadata'
-                        })
-                    if re.search(r'(debug|log|trace|print)', str(k), re.IGNORECASE) or re.search(r'(debug|log|trace|print)', str(v), re.IGNORECASE):
-                        findings.append({
-                            'line': len(code_lines),
-                            'code': line,
-                            'severity': 'Low',
-                            'attack': 'Exposed Debugging Information'
-                        })
-                    if re.search(r'(input_shape|shape=)', str(k), re.IGNORECASE) or re.search(r'(input_shape|shape=)', str(v), re.IGNORECASE):
-                        findings.append({
-                            'line': len(code_lines),
-                            'code': line,
-                            'severity': 'Medium',
-                            'attack': 'Hardcoded Input Shapes Without Validation'
-                        })
-                    if re.search(r'(lambda|custom|def )', str(k), re.IGNORECASE) or re.search(r'(lambda|custom|def )', str(v), re.IGNORECASE):
-                        findings.append({
-                            'line': len(code_lines),
-                            'code': line,
-                            'severity': 'High',
-                            'attack': 'Custom Layers or Unsafe Code Artifacts'
-                        })
-            else:
-                # Not a dict, just scan string representation
-                code_lines = str(obj).split('\n')
-        except Exception as e:
-            code_lines = [f'<Could not parse pickle file: {e}>']
-    else:
-        # Existing logic for .pt and other files
-        try:
-            if ext == '.pt':
-                try:
-                    model = torch.jit.load(file_path)
-                    code = model.code
-                    code_lines = code.split('\n')
-                except Exception:
-                    # Try loading as a regular PyTorch model
-                    try:
-                        model = torch.load(file_path)
-                        code_lines = str(model).split('\n')
-                    except Exception as e:
-                        code_lines = [f'<Could not parse model code: {e}>']
-                for i, line in enumerate(code_lines, 1):
-                    if re.search(r'(layer|weight|bias|label|trainable)', line, re.IGNORECASE):
-                        findings.append({
-                            'line': i,
-                            'code': line,
-                            'severity': 'Medium',
-                            'attack': 'Lack of Model Obfuscation / Plaintext Metadata'
-                        })
-                    if re.search(r'(username|password|email|token)', line, re.IGNORECASE):
-                        findings.append({
-                            'line': i,
-                            'code': line,
-                            'severity': 'High',
-                            'attack': 'Plaintext Sensitive Metadata'
-                        })
-            else:
-                with open(file_path, 'r', errors='ignore') as f:
-                    code_lines = f.readlines()
-                    for i, line in enumerate(code_lines, 1):
-                        if re.search(r'(layer|weight|bias|label|trainable)', line, re.IGNORECASE):
-                            findings.append({
-                                'line': i,
-                                'code': line.strip(),
-                                'severity': 'Medium',
-                                'attack': 'Lack of Model Obfuscation / Plaintext Metadata'
-                            })
-                        if re.search(r'(username|password|email|token)', line, re.IGNORECASE):
-                            findings.append({
-                                'line': i,
-                                'code': line.strip(),
-                                'severity': 'High',
-                                'attack': 'Plaintext Sensitive Metadata'
-                            })
-        except Exception as e:
-            code_lines = ["<Could not parse model code: {}>".format(e)]
+def scan_model(model, budget=None, skip=()):
+    """Run the registered checks over a model file (a path or a ModelArtifact); returns ``(code_lines, findings)``."""
+    artifact = ModelArtifact.of(model)
+    ctx = run_checks(artifact.file_path, budget, skip, artifact=artifact)
+    if artifact is not model:
+        artifact.close()
+    return ctx.code_lines, ctx.findings.to_dicts()
+
+def scanned_by_member(ctx):
+    """torch.save zip checkpoints go through the archive check member by member, not the whole-file scans."""
+    return ctx.ext in TORCH_EXTENSIONS and zipfile.is_zipfile(ctx.file_path)
+
+# 1. Insecure Serialization Formats
+@register_check('serialization_format', extensions=PICKLE_EXTENSIONS)
+def check_serialization_format(ctx):
+    yield {
+        'line': 1,
+        'code': f"File extension: {ctx.ext}",
+        'severity': 'High',
+        'attack': 'Insecure Serialization Format (Pickle/Joblib)'
+    }
 
-    # 4. Missing or Weak File Protection
-    findings.append({
+# 4. Missing or Weak File Protection
+@register_check('file_protection')
+def check_file_protection(ctx):
+    yield {
         'line': 1,
         'code': "No encryption or signature detected",
         'severity': 'Medium',
         'attack': 'Missing or Weak File Protection'
-    })
+    }
 
-    # 5. Use of Vulnerable Libraries/Frameworks
+# 5. Use of Vulnerable Libraries/Frameworks
+@register_check('library_versions', extensions=TORCH_EXTENSIONS)
+def check_library_versions(ctx):
     torch_version = torch.__version__
     if torch_version < "2.0.0":  # Example threshold
-        findings.append({
+        yield {
             'line': 1,
             'code': f"PyTorch version: {torch_version}",
             'severity': 'Medium',
             'attack': 'Use of Potentially Vulnerable Library'
-        })
-
-    # 6. Exposed Debugging Information (for non-pkl files, already checked for pkl above)
-    if ext not in ['.pkl', '.pickle', '.joblib']:
-        for i, line in enumerate(code_lines, 1):
-            if re.search(r'(debug|log|trace|print)', line, re.IGNORECASE):
-                findings.append({
-                    'line': i,
-                    'code': line.strip(),
-                    'severity': 'Low',
-                    'attack': 'Exposed Debugging Information'
-                })
-
-    # 7. Hardcoded Input Shapes Without Validation (for non-pkl files, already checked for pkl above)
-    if ext not in ['.pkl', '.pickle', '.joblib']:
-        for i, line in enumerate(code_lines, 1):
-            if re.search(r'(input_shape|shape=)', line, re.IGNORECASE):
-                findings.append({
-                    'line': i,
-                    'code': line.strip(),
-                    'severity': 'Medium',
-                    'attack': 'Hardcoded Input Shapes Without Validation'
-                })
-
-    # 8. Custom Layers or Unsafe Code Artifacts (for non-pkl files, already checked for pkl above)
-    if ext not in ['.pkl', '.pickle', '.joblib']:
-        for i, line in enumerate(code_lines, 1):
-            if re.search(r'(lambda|custom|def )', line, re.IGNORECASE):
-                findings.append({
-                    'line': i,
-                    'code': line.strip(),
-                    'severity': 'High',
-                    'attack': 'Custom Layers or Unsafe Code Artifacts'
-                })
-
-    # 9. Missing Model Documentation
-    if not any('doc' in str(line) or '#' in str(line) for line in code_lines):
-        findings.append({
+        }
+
+# 10. Overly Permissive Permissions
+@register_check('permissions')
+def check_permissions(ctx):
+    perms = oct(os.stat(ctx.file_path).st_mode)[-3:]
+    if perms in ['777', '666', '755']:
+        yield {
+            'line': 1,
+            'code': f"File permissions: {perms}",
+            'severity': 'High',
+            'attack': 'Overly Permissive Permissions'
+        }
+
+@register_check('large_file')
+def check_large_file(ctx):
+    yield from map(as_finding, dos_risk_large_file(ctx.file_path))
+
+def extract_code_lines(file_path, ext, artifact=None):
+    """Recover readable lines (pickle keys/values, TorchScript code, text excerpt) for the code checks."""
+    if ext in ARCHIVE_EXTENSIONS + ONNX_EXTENSIONS + TFLITE_EXTENSIONS + TENSOR_FILE_EXTENSIONS + KERAS_EXTENSIONS:
+        return []  # The archive, graph, header and config checks provide a listing instead
+    if ext in PICKLE_EXTENSIONS:
+        # Load containers and primitives only (arrays become placeholders)
+        try:
+            obj = restricted_load(file_path)
+            items = placeholder_items(obj)
+            # If it's a dict (or an object with dict state), list keys/values
+            if items is not None:
+                return [f"{k}: {v}" for k, v in items]
+            # Not a dict, just use the string representation
+            return str(obj).split('\n')
+        except Exception as e:
+            return [f'<Could not parse pickle file: {e}>']
+    try:
+        if ext in TORCH_EXTENSIONS:
+            # torch.jit.load / torch.load unpickle untrusted data: the artifact does it once, in a sandboxed worker
+            if artifact is None:
+                with ModelArtifact(file_path) as artifact:
+                    loaded = artifact.introspection
+            else:
+                loaded = artifact.introspection
+            if 'error' in loaded:
+                return [f"<Could not parse model code: {loaded['error']}>"]
+            return loaded['code_lines']
+        # Never hold a whole text file: only the excerpt around rule hits is kept
+        return scan_text(file_path)['lines']
+    except Exception as e:
+        return ["<Could not parse model code: {}>".format(e)]
+
+@register_check('extract_code', extensions=PICKLE_EXTENSIONS + TORCH_EXTENSIONS, cost=MODERATE, budget=60)
+def check_extract_code(ctx):
+    ctx.code_lines = list(ctx.artifact.code_lines)  # Later checks append their listings
+    yield from ()  # Feeds the code checks below; no findings of its own
+
+@register_check('text_stream', exclude=STRUCTURED_EXTENSIONS, cost=MODERATE, budget=60)
+def check_text_stream(ctx):
+    """Rules applied while streaming text and unknown formats; keeps an excerpt, not every line."""
+    result = scan_text(ctx.file_path, deadline=ctx.check_deadline)
+    ctx.code_lines, ctx.line_numbers = result['lines'], result['line_numbers']
+    ctx.total_lines, ctx.documented = result['total_lines'], result['documented']
+    yield from result['findings']
+
+@register_check('onnx_structure', extensions=ONNX_EXTENSIONS, cost=MODERATE, budget=60)
+def check_onnx_structure(ctx):
+    """Graph structure of ONNX models, parsed without reading initializer data."""
+    result = scan_onnx(ctx.file_path)
+    ctx.code_lines = result['listing']
+    yield from result['findings']
+
+@register_check('tflite_structure', extensions=TFLITE_EXTENSIONS, cost=MODERATE, budget=60)
+def check_tflite_structure(ctx):
+    """Operator codes, metadata and buffer table of TFLite models, without reading buffer data."""
+    result = scan_tflite(ctx.file_path)
+    ctx.code_lines = result['listing']
+    yield from result['findings']
+
+@register_check('safetensors_header', extensions=SAFETENSORS_EXTENSIONS)
+def check_safetensors_header(ctx):
+    """JSON header of safetensors checkpoints, validated against the file size."""
+    result = scan_safetensors(ctx.file_path)
+    ctx.code_lines = result['listing']
+    yield from result['findings']
+
+@register_check('gguf_header', extensions=GGUF_EXTENSIONS)
+def check_gguf_header(ctx):
+    """Metadata and tensor infos of GGUF checkpoints, validated against the file size."""
+    result = scan_gguf(ctx.file_path)
+    ctx.code_lines = result['listing']
+    yield from result['findings']
+
+@register_check('keras_config', extensions=KERAS_EXTENSIONS)
+def check_keras_config(ctx):
+    """Layer graph of Keras models from their config alone; weight datasets are never opened."""
+    result = scan_keras(ctx.file_path)
+    ctx.code_lines = result['listing']
+    yield from result['findings']
+
+# 2, 3, 6, 7, 8. Every rule category in one pass over the code lines
+@register_check('code_patterns')
+def check_code_patterns(ctx):
+    if ctx.line_numbers is None:  # Streamed text was matched line by line already
+        yield from RULE_ENGINE.findings_for_lines(ctx.code_lines)
+
+# 9. Missing Model Documentation
+@register_check('documentation')
+def check_documentation(ctx):
+    documented = ctx.documented
+    if documented is None:
+        documented = any('doc' in str(line) or '#' in str(line) for line in ctx.code_lines)
+    if not documented:
+        yield {
             'line': 1,
             'code': "No documentation or comments found",
             'severity': 'Low',
             'attack': 'Missing Model Documentation'
-        })
+        }
 
-    # 10. Overly Permissive Permissions
-    try:
-        perms = oct(os.stat(file_path).st_mode)[-3:]
-        if perms in ['777', '666', '755']:
-            findings.append({
-                'line': 1,
-                'code': f"File permissions: {perms}",
-                'severity': 'High',
-                'attack': 'Overly Permissive Permissions'
-            })
-    except Exception:
-        pass
+@register_check('pickle_opcodes', extensions=PICKLE_EXTENSIONS + TORCH_EXTENSIONS, cost=MODERATE, budget=60)
+def check_pickle_opcodes(ctx):
+    if scanned_by_member(ctx):
+        return
+    yield from map(as_finding, pickle_opcode_analysis(ctx.file_path, deadline=ctx.check_deadline))
+
+# Tensor-only formats: the header checks account for every byte, so there is no payload to look for
+@register_check('byte_signatures', cost=EXPENSIVE, budget=60, exclude=ARCHIVE_EXTENSIONS + TENSOR_FILE_EXTENSIONS)
+def check_byte_signatures(ctx):
+    if scanned_by_member(ctx):
+        return
+    yield from map(as_finding, byte_level_pattern_scan(ctx.file_path, deadline=ctx.check_deadline))
 
-    return code_lines, findings
+@register_check('archive_members', extensions=ARCHIVE_EXTENSIONS + TORCH_EXTENSIONS, cost=EXPENSIVE, budget=300)
+def check_archive_members(ctx):
+    """Scan inside zip/tar/compressed uploads and torch.save zips, rescanning only members changed since the
+    previous version; the member listing becomes the code lines of archives."""
+    if ctx.ext in TORCH_EXTENSIONS and not scanned_by_member(ctx):
+        return
+    result = scan_archive(ctx.file_path, deadline=ctx.check_deadline, previous=ctx.previous_parts)
+    if ctx.ext in ARCHIVE_EXTENSIONS:
+        ctx.code_lines = result['listing']
+    ctx.parts, ctx.reused_parts = result['parts'] or None, result['reused']
+    yield from result['findings']
+
+@register_check('tensor_stats', extensions=TORCH_EXTENSIONS + SAFETENSORS_EXTENSIONS, cost=EXPENSIVE, budget=120)
+def check_tensor_stats(ctx):
+    """Weight values of torch.save zips and safetensors files, read through a memory map; flagged tensors
+    are appended to the code lines."""
+    if ctx.ext in TORCH_EXTENSIONS and not scanned_by_member(ctx):
+        return  # Legacy torch pickles have no addressable storages
+    result = analyze_tensors(ctx.file_path, deadline=ctx.check_deadline)
+    offset = len(ctx.code_lines)
+    ctx.code_lines = ctx.code_lines + result['listing']
+    for finding in result['findings']:
+        yield dict(finding, line=finding['line'] + offset)
+
+@register_check('anomaly', cost=EXPENSIVE, budget=30)
+def check_anomaly(ctx):
+    yield from anomaly_findings(anomaly_detection(ctx.file_path, extract_model_features(ctx.file_path,
+                                                                                      ctx.artifact.entropy)))
 
 def calculate_file_hash(file_path):
     """Calculate SHA256 hash of the file."""
     sha256 = hashlib.sha256()
     with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b''):
+        for chunk in iter(lambda: f.read(1 << 20), b''):
             sha256.update(chunk)
     return sha256.hexdigest()
 
-def extract_model_features(file_path):
-    """Extract simple features: file size and entropy of first 1024 bytes."""
+def extract_model_features(file_path, profile=None):
+    """Extract features: file size and the whole-file entropy profile summary."""
     try:
-        features = [os.path.getsize(file_path)]
-        with open(file_path, 'rb') as f:
-            data = f.read(1024)
-            byte_counts = [0] * 256
-            for byte in data:
-                byte_counts[byte] += 1
-            entropy = -sum((c / len(data)) * np.log2(c / len(data)) for c in byte_counts if c > 0)
-            features.append(entropy)
+        profile = profile or entropy_profile(file_path)
+        features = [
+            profile['size'],
+            profile['entropy'][0] if profile['entropy'] else 0.0,
+            profile['mean'],
+            profile['min'],
+            profile['max'],
+            profile['variance'],
+            profile['outlier_windows'],
+            profile['high_entropy_windows']
+        ]
         return features[:10] + [0] * (10 - len(features))  # Pad to 10
     except Exception:
         return []
 
-def anomaly_detection(file_path):
-    """Detect anomalous model files using IsolationForest on simple features."""
-    features = extract_model_features(file_path)
+def anomaly_detection(file_path, features=None):
+    """Score a model file with the corpus-trained anomaly detector (see train_anomaly_model.py)."""
+    features = features or extract_model_features(file_path)
     if not features:
         return {"anomaly_score": 0.0, "is_anomalous": False, "analysis_complete": False}
-    iso_forest = IsolationForest(contamination=0.1, random_state=42)
-    preds = iso_forest.fit_predict([features])
-    score = abs(iso_forest.score_samples([features])[0])
-    return {
-        "anomaly_score": score,
-        "is_anomalous": preds[0] == -1,
-        "analysis_complete": True
-    }
+    return score_batch([features])[0]
 
-def pickle_opcode_analysis(file_path):
-    """Analyze pickle files for dangerous opcodes."""
-    vulnerabilities = []
+def anomaly_findings(anomaly):
+    """Static finding for an upload the anomaly detector flagged, if any."""
+    if not anomaly['is_anomalous']:
+        return []
+    return [{
+        'line': 1,
+        'code': f"Anomaly score: {anomaly['anomaly_score']:.3f}",
+        'severity': 'Medium',
+        'attack': 'Anomalous Model File'
+    }]
+
+def pickle_opcode_analysis(file_path, allowlist=None, denylist=None, stop_on_critical=False, deadline=None):
+    """Stream pickle opcodes without executing them and flag dangerous or unknown globals."""
     try:
-        opcodes = []
-        with open(file_path, 'rb') as f:
-            pickletools.dis(f, opcodes)
-        for opcode in opcodes:
-            if any(x in str(opcode) for x in ['GLOBAL', 'REDUCE', 'BUILD', 'INST']):
-                vulnerabilities.append({
-                    "id": str(uuid.uuid4()),
-                    "title": "Dangerous Pickle Opcode Detected",
-                    "description": f"Unsafe opcode found: {opcode}",
-                    "severity": "HIGH",
-                    "cwe_id": "CWE-502"
-                })
+        result = scan_pickle_file(file_path, allowlist, denylist, stop_on_critical, deadline)
     except Exception as e:
-        vulnerabilities.append({
-            "id": str(uuid.uuid4()),
-            "title": "Pickle Analysis Failed",
-            "description": str(e),
-            "severity": "MEDIUM",
-            "cwe_id": "CWE-20"
-        })
-    return vulnerabilities
+        result = {'globals': {}, 'stopped_early': False, 'timed_out': False, 'memo_overflows': 0, 'error': str(e)}
+    return pickle_vulnerabilities(result)
 
-def byte_level_pattern_scan(file_path):
-    """Scan first 1024 bytes for suspicious code patterns."""
-    vulnerabilities = []
+def byte_level_pattern_scan(file_path, signatures=None, workers=None, deadline=None):
+    """Scan the whole file (memory-mapped, in parallel segments) for suspicious code patterns."""
     try:
-        with open(file_path, 'rb') as f:
-            content = f.read(1024)
-            if b'_import_' in content or b'eval(' in content:
-                vulnerabilities.append({
-                    "id": str(uuid.uuid4()),
-                    "title": "Suspicious Code Pattern",
-                    "description": "Detected dangerous patterns in file",
-                    "severity": "HIGH",
-                    "cwe_id": "CWE-95"
-                })
+        hits = signature_scan(file_path, signatures, workers, deadline=deadline)
     except Exception:
-        pass
-    return vulnerabilities
+        hits = []
+    return signature_vulnerabilities(hits)
 
 def dos_risk_large_file(file_path, threshold_mb=100):
     """Flag large files as potential DoS risk."""
@@ -0,0 +1,190 @@
+import mmap
+import os
+import re
+import time
+import uuid
+from concurrent.futures import TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from config import Config
+from .scan_pool import discard_scan_pool, get_scan_pool
+
+# (signature, title, severity, cwe_id)
+DEFAULT_SIGNATURES = [
+    (b'_import_', 'Dynamic Import in Model File', 'HIGH', 'CWE-95'),
+    (b'eval(', 'Eval Call in Model File', 'HIGH', 'CWE-95'),
+    (b'exec(', 'Exec Call in Model File', 'HIGH', 'CWE-95'),
+    (b'compile(', 'Code Compilation in Model File', 'HIGH', 'CWE-95'),
+    (b'os.system', 'Shell Command Execution', 'HIGH', 'CWE-78'),
+    (b'posix\nsystem', 'Shell Command Execution (Pickle Global)', 'HIGH', 'CWE-78'),
+    (b'nt\nsystem', 'Shell Command Execution (Pickle Global)', 'HIGH', 'CWE-78'),
+    (b'subprocess', 'Subprocess Invocation', 'HIGH', 'CWE-78'),
+    (b'/bin/sh', 'Shell Path Reference', 'HIGH', 'CWE-78'),
+    (b'builtins\neval', 'Eval Builtin (Pickle Global)', 'HIGH', 'CWE-95'),
+    (b'builtins\nexec', 'Exec Builtin (Pickle Global)', 'HIGH', 'CWE-95'),
+    (b'socket.socket', 'Network Socket Creation', 'MEDIUM', 'CWE-913'),
+    (b'marshal.loads', 'Marshalled Code Object', 'MEDIUM', 'CWE-502'),
+    (b'base64.b64decode', 'Encoded Payload Decoding', 'MEDIUM', 'CWE-506'),
+]
+
+SEGMENT_SIZE = 64 * 1024 * 1024
+# A segment is matched this much at a time, so a worker notices its deadline between slices
+SLICE_SIZE = 4 * 1024 * 1024
+# Offsets kept per signature; counts are always exact
+MAX_OFFSETS = 100
+
+
+@lru_cache(maxsize=8)
+def _compile(patterns):
+    return re.compile(b'|'.join(re.escape(p) for p in patterns))
+
+
+def _scan_segment(file_path, patterns, start, end, max_offsets, deadline=None):
+    """Scan ``[start, end)`` of the file plus enough overlap to catch patterns crossing ``end``.
+
+    With a ``deadline`` the scan stops after the slice in progress when it
+    passes, so pool workers never outlive the scan that submitted them.
+    """
+    regex = _compile(patterns)
+    index = {p: i for i, p in enumerate(patterns)}
+    counts = [0] * len(patterns)
+    offsets = [[] for _ in patterns]
+    overlap = max(len(p) for p in patterns) - 1
+    with open(file_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for slice_start in range(start, end, SLICE_SIZE):
+                if deadline is not None and time.monotonic() > deadline:
+                    break
+                slice_end = min(slice_start + SLICE_SIZE, end)
+                for m in regex.finditer(mm, slice_start, min(slice_end + overlap, len(mm))):
+                    if m.start() >= slice_end:
+                        break
+                    i = index[m.group()]
+                    counts[i] += 1
+                    if len(offsets[i]) < max_offsets:
+                        offsets[i].append(m.start())
+    return counts, offsets
+
+
+def signature_scan(file_path, signatures=None, workers=None, segment_size=SEGMENT_SIZE, max_offsets=MAX_OFFSETS,
+                   deadline=None):
+    """Memory-map the whole file and match every signature in one pass per segment.
+
+    Segments are scanned by the shared scan pool (the regex engine holds the
+    GIL, so threads would not help) when the file spans more than one segment
+    and ``workers`` allows it. Returns a list of ``{'signature', 'title',
+    'severity', 'cwe_id', 'count', 'offsets'}`` for the signatures that were
+    found. With a ``deadline`` (a ``time.monotonic()`` value) segments not
+    started by then are cancelled and the ones running stop where they are;
+    the hits are what the segments returned by then had matched.
+    """
+    signatures = DEFAULT_SIGNATURES if signatures is None else signatures
+    size = os.path.getsize(file_path)
+    if size == 0 or not signatures:
+        return []
+    patterns = tuple(s[0] for s in signatures)
+    segments = [(start, min(start + segment_size, size)) for start in range(0, size, segment_size)]
+    workers = min(workers or Config.SCAN_WORKERS or os.cpu_count() or 1, len(segments))
+
+    results = []
+    if workers > 1:
+        pool = get_scan_pool()
+        futures = []
+        try:
+            for start, end in segments:
+                futures.append(pool.submit(_scan_segment, file_path, patterns, start, end, max_offsets, deadline))
+            for future in futures:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    results.append(future.result(timeout=timeout))
+                except FuturesTimeout:
+                    break
+        except BrokenProcessPool:
+            discard_scan_pool(pool)
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+    else:
+        for start, end in segments:
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            results.append(_scan_segment(file_path, patterns, start, end, max_offsets))
+
+    return _collect(signatures, results, max_offsets)
+
+
+def _collect(signatures, results, max_offsets):
+    """Merge per-segment ``(counts, offsets)`` into hit dicts for the signatures that were found."""
+    hits = []
+    for i, (pattern, title, severity, cwe_id) in enumerate(signatures):
+        count = sum(counts[i] for counts, _ in results)
+        if not count:
+            continue
+        offsets = [o for _, segment_offsets in results for o in segment_offsets[i]][:max_offsets]
+        hits.append({
+            'signature': pattern,
+            'title': title,
+            'severity': severity,
+            'cwe_id': cwe_id,
+            'count': count,
+            'offsets': offsets
+        })
+    return hits
+
+
+class SignatureMatcher:
+    """Incremental signature matching over a stream fed chunk by chunk (for data that cannot be mapped).
+
+    The last ``len(longest signature) - 1`` bytes of each chunk are kept so
+    matches that cross a chunk boundary are still found; offsets are relative
+    to the start of the stream.
+    """
+
+    def __init__(self, signatures=None, max_offsets=MAX_OFFSETS):
+        self.signatures = DEFAULT_SIGNATURES if signatures is None else signatures
+        self.max_offsets = max_offsets
+        patterns = tuple(s[0] for s in self.signatures)
+        self._regex = _compile(patterns) if patterns else None
+        self._index = {p: i for i, p in enumerate(patterns)}
+        self._overlap = max((len(p) for p in patterns), default=1) - 1
+        self._counts = [0] * len(patterns)
+        self._offsets = [[] for _ in patterns]
+        self._tail = b''
+        self._position = 0
+
+    def feed(self, chunk):
+        if self._regex is None or not chunk:
+            return
+        data = self._tail + chunk
+        start = self._position - len(self._tail)
+        for m in self._regex.finditer(data):
+            if m.end() <= len(self._tail):
+                continue  # Already counted with the previous chunk
+            i = self._index[m.group()]
+            self._counts[i] += 1
+            if len(self._offsets[i]) < self.max_offsets:
+                self._offsets[i].append(start + m.start())
+        self._position += len(chunk)
+        self._tail = data[-self._overlap:] if self._overlap else b''
+
+    def hits(self):
+        return _collect(self.signatures, [(self._counts, self._offsets)], self.max_offsets)
+
+
+def signature_vulnerabilities(hits):
+    """Vulnerability entries for signature hits."""
+    vulnerabilities = []
+    for hit in hits:
+        offsets = ', '.join(str(o) for o in hit['offsets'][:10])
+        more = ', ...' if hit['count'] > 10 else ''
+        vulnerabilities.append({
+            "id": str(uuid.uuid4()),
+            "title": hit['title'],
+            "description": f"Found {hit['signature']!r} {hit['count']} time(s) at byte offsets {offsets}{more}",
+            "severity": hit['severity'],
+            "cwe_id": hit['cwe_id'],
+            "offsets": hit['offsets']
+        })
+    return vulnerabilities
@@ -0,0 +1,241 @@
+import mmap
+import pickletools
+import re
+import struct
+import time
+import zipfile
+
+import numpy as np
+
+from .checks import LISTED_CHARS
+from .safetensors_scanner import DTYPES, read_header
+
+# Elements processed per batch; bounds the temporaries of every vectorized step
+BATCH_ELEMENTS = 8 * 1024 * 1024
+# Elements per batch whose low bytes feed the entropy histograms (an evenly spaced sample)
+HISTOGRAM_SAMPLES = 512 * 1024
+# Tensors smaller than this are too short for a meaningful low-byte entropy
+MIN_STEGO_ELEMENTS = 4096
+# Finite weights beyond this magnitude break or dominate inference
+EXTREME_MAGNITUDE = 1e6
+
+# Typed storage classes named in the data.pkl of a torch.save zip
+TORCH_STORAGES = {
+    'FloatStorage': np.float32, 'DoubleStorage': np.float64, 'HalfStorage': np.float16, 'BFloat16Storage': 'bf16',
+    'LongStorage': np.int64, 'IntStorage': np.int32, 'ShortStorage': np.int16, 'CharStorage': np.int8,
+    'ByteStorage': np.uint8, 'BoolStorage': np.bool_,
+}
+_PRINTABLE = np.zeros(256, dtype=bool)
+_PRINTABLE[[9, 10, 13, *range(32, 127)]] = True
+_ZIP_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+_STORAGE_MEMBER = re.compile(r'(^|/)data/([^/]+)$')
+
+
+def _storages(zf, pickle_name):
+    """Map storage keys to ``(dtype, tensor name)`` from the persistent ids in data.pkl, without unpickling it.
+
+    Each id is the tuple ``('storage', <storage class>, key, location,
+    numel)``; the tensor name is the last string before it (the state-dict
+    key). Repeated strings and classes come back through the memo.
+    """
+    storages, memo, recent, label = {}, {}, [], None
+    with zf.open(pickle_name) as f:
+        for opcode, arg, _ in pickletools.genops(f):
+            name = opcode.name
+            if name in ('PUT', 'BINPUT', 'LONG_BINPUT', 'MEMOIZE'):
+                memo[len(memo) if name == 'MEMOIZE' else arg] = recent[-1] if recent else None
+                continue
+            if name in ('GET', 'BINGET', 'LONG_BINGET'):
+                value = memo.get(arg)
+            elif name == 'GLOBAL':
+                value = tuple(arg.split(' ', 1))
+            elif name == 'STACK_GLOBAL':
+                value, recent = tuple(recent[-2:]), recent[:-2]
+            else:
+                value = arg if isinstance(arg, str) else None
+            if value == 'storage':
+                label = next((v for v in reversed(recent) if isinstance(v, str)), None)
+            recent = (recent + [value])[-8:]
+            if len(recent) >= 3 and recent[-3] == 'storage' and isinstance(recent[-2], tuple) \
+                    and recent[-2][0] == 'torch' and isinstance(recent[-1], str):
+                dtype = TORCH_STORAGES.get(recent[-2][-1])
+                if dtype is not None:
+                    storages[recent[-1]] = (dtype, label)
+    return storages
+
+
+def torch_tensor_spans(file_path):
+    """Byte spans of the stored storages of a torch.save zip, with dtype and tensor name when data.pkl gives them."""
+    spans = []
+    with zipfile.ZipFile(file_path) as zf:
+        pickles = [name for name in zf.namelist() if name.endswith('data.pkl')]
+        try:
+            storages = _storages(zf, pickles[0]) if pickles else {}
+        except (ValueError, EOFError, IndexError):
+            storages = {}
+        with open(file_path, 'rb') as f:
+            for info in zf.infolist():
+                match = _STORAGE_MEMBER.search(info.filename)
+                if match is None or info.compress_type != zipfile.ZIP_STORED or not info.file_size:
+                    continue
+                f.seek(info.header_offset)
+                header = f.read(_ZIP_LOCAL_HEADER.size)
+                if len(header) < _ZIP_LOCAL_HEADER.size or header[:4] != b'PK\x03\x04':
+                    continue
+                *_, name_length, extra_length = _ZIP_LOCAL_HEADER.unpack(header)
+                start = info.header_offset + _ZIP_LOCAL_HEADER.size + name_length + extra_length
+                dtype, label = storages.get(match.group(2), (None, None))
+                spans.append({'name': f"{label} ({info.filename})" if label else info.filename, 'dtype': dtype,
+                              'start': start, 'end': start + info.file_size})
+    return spans
+
+
+def safetensors_tensor_spans(file_path):
+    _, _, tensors = read_header(file_path)
+    spans = []
+    for tensor in tensors:
+        kind = DTYPES.get(tensor['dtype'])
+        dtype = 'bf16' if tensor['dtype'] == 'BF16' else None if kind is None or isinstance(kind, int) else kind
+        spans.append({'name': tensor['name'], 'dtype': dtype, 'start': tensor['start'], 'end': tensor['end']})
+    return spans
+
+
+def _entropy(counts):
+    total = counts.sum()
+    if not total:
+        return 0.0
+    p = counts[counts > 0] / total
+    return float(-(p * np.log2(p)).sum())
+
+
+class TensorStats:
+    """Running statistics of one tensor, updated batch by batch."""
+
+    def __init__(self, name, dtype, itemsize):
+        self.name = name
+        self.dtype = dtype
+        self.itemsize = itemsize
+        self.elements = self.nan = self.inf = 0
+        self.min = self.max = None
+        # Histograms of the least significant byte and the one above it (little-endian)
+        self.low = np.zeros(256, dtype=np.int64)
+        self.next = np.zeros(256, dtype=np.int64)
+
+    def update(self, raw):
+        """Fold in a batch given as raw little-endian bytes."""
+        if self.dtype is None:
+            return
+        if self.dtype == 'bf16':
+            bits = raw.view(np.uint16)
+            values = (bits.astype(np.uint32) << 16).view(np.float32)
+        else:
+            values = raw.view(self.dtype)
+        self.elements += values.size
+        if values.dtype.kind == 'f' and not np.isfinite(values).all():
+            self.nan += int(np.count_nonzero(np.isnan(values)))
+            self.inf += int(np.count_nonzero(np.isinf(values)))
+            values = values[np.isfinite(values)]
+        if values.size and values.dtype != np.bool_:
+            low, high = values.min().item(), values.max().item()
+            self.min = low if self.min is None else min(self.min, low)
+            self.max = high if self.max is None else max(self.max, high)
+        if self.itemsize > 1:
+            stride = self.itemsize * max(1, -(-raw.size // self.itemsize // HISTOGRAM_SAMPLES))
+            self.low += np.bincount(raw[0::stride], minlength=256)
+            self.next += np.bincount(raw[1::stride], minlength=256)
+
+    def summary(self):
+        return {
+            'name': self.name, 'dtype': 'BF16' if self.dtype == 'bf16' else getattr(self.dtype, '__name__', None),
+            'elements': self.elements, 'nan': self.nan, 'inf': self.inf, 'min': self.min, 'max': self.max,
+            'low_entropy': round(_entropy(self.low), 3), 'next_entropy': round(_entropy(self.next), 3),
+            'low_printable': round(float(self.low[_PRINTABLE].sum() / max(1, self.low.sum())), 3)
+        }
+
+
+def _itemsize(dtype):
+    return 2 if dtype == 'bf16' else 1 if dtype is None else np.dtype(dtype).itemsize
+
+
+def tensor_statistics(file_path, spans, deadline=None, batch_elements=BATCH_ELEMENTS):
+    """Per-tensor statistics over one memory map of ``file_path``, in fixed-size vectorized batches.
+
+    Pages are dropped from the mapping once a batch is done, so resident
+    memory stays around one batch whatever the checkpoint size. Returns
+    ``(stats, stopped)``.
+    """
+    with open(file_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data = np.frombuffer(mm, dtype=np.uint8)
+            try:
+                stats, stopped = _scan_spans(mm, data, spans, deadline, batch_elements)
+            finally:
+                del data  # The buffer export must go before the map can close
+    return stats, stopped
+
+
+def _scan_spans(mm, data, spans, deadline, batch_elements):
+    stats = []
+    for span in spans:
+        if span['dtype'] is None or not 0 <= span['start'] <= span['end'] <= len(data):
+            continue
+        itemsize = _itemsize(span['dtype'])
+        step = batch_elements * itemsize
+        tensor = TensorStats(span['name'], span['dtype'], itemsize)
+        end = span['start'] + (span['end'] - span['start']) // itemsize * itemsize
+        for start in range(span['start'], end, step):
+            if deadline is not None and time.monotonic() >= deadline:
+                return stats, True
+            tensor.update(data[start:min(start + step, end)])
+            if hasattr(mm, 'madvise'):
+                page = start - start % mmap.PAGESIZE
+                mm.madvise(mmap.MADV_DONTNEED, page, min(start + step, end) - page)
+        stats.append(tensor.summary())
+    return stats, False
+
+
+def stats_findings(stats):
+    """``(listing, findings)`` for tensors with non-finite values, extreme magnitudes or odd low-order bytes."""
+    listing, findings = [], []
+
+    def add(tensor, code, severity, attack, cwe_id):
+        line = f"tensor {tensor['name'][:LISTED_CHARS]}: {tensor['dtype']} x{tensor['elements']}, " \
+               f"range {tensor['min']}..{tensor['max']}, nan {tensor['nan']}, inf {tensor['inf']}, " \
+               f"low-byte entropy {tensor['low_entropy']} (next {tensor['next_entropy']})"
+        if not listing or listing[-1] != line:
+            listing.append(line)
+        findings.append({'line': len(listing), 'code': f"Tensor {tensor['name'][:LISTED_CHARS]!r} {code}",
+                         'severity': severity, 'attack': attack, 'cwe_id': cwe_id})
+
+    for tensor in stats:
+        if tensor['nan'] or tensor['inf']:
+            add(tensor, f"holds {tensor['nan']} NaN and {tensor['inf']} infinite values", 'Medium',
+                'Non-Finite Weights', 'CWE-1284')
+        magnitude = max(abs(tensor['min'] or 0), abs(tensor['max'] or 0))
+        if tensor['dtype'] in ('float16', 'float32', 'float64', 'BF16') and magnitude > EXTREME_MAGNITUDE:
+            add(tensor, f"has weights of magnitude {magnitude:.3g}", 'Low', 'Extreme Weight Magnitude', 'CWE-1284')
+        # In narrower floats the byte above the low one is mostly exponent, which is never noise-like
+        if tensor['elements'] < MIN_STEGO_ELEMENTS or tensor['dtype'] not in ('float32', 'float64'):
+            continue
+        low, above = tensor['low_entropy'], tensor['next_entropy']
+        # Trained weights have noise-like low bytes, as random as the byte above them. Text stands out
+        # as a low byte far more regular yet mostly printable; random data stands out in low bytes
+        # that a lower-precision origin (e.g. upcast bf16) left constant.
+        if 2.0 < low < above - 2.0 and tensor['low_printable'] > 0.95:
+            add(tensor, f"low-order bytes look like text ({low:.2f} bits, {tensor['low_printable']:.0%} printable)",
+                'High', 'Possible Steganographic Payload in Weights', 'CWE-506')
+        elif low > 7.0 and above < 4.0:
+            add(tensor, f"low-order bytes are random ({low:.2f} bits) while the byte above is not ({above:.2f} bits)",
+                'Medium', 'Possible Steganographic Payload in Weights', 'CWE-506')
+    return listing, findings
+
+
+def analyze_tensors(file_path, deadline=None):
+    """Weight statistics of a torch.save zip or safetensors file, read through a memory map without building the model.
+
+    Returns ``{'stats', 'listing', 'findings', 'stopped'}``.
+    """
+    spans = torch_tensor_spans(file_path) if zipfile.is_zipfile(file_path) else safetensors_tensor_spans(file_path)
+    stats, stopped = tensor_statistics(file_path, spans, deadline)
+    listing, findings = stats_findings(stats)
+    return {'stats': stats, 'listing': listing, 'findings': findings, 'stopped': stopped}
@@ -0,0 +1,140 @@
+import re
+import time
+from collections import deque
+
+from .rules import RuleEngine
+
+RULE_ENGINE = RuleEngine()
+
+# Lines kept before and after every finding for the report excerpt
+CONTEXT_LINES = 2
+# Always kept from the top of the file (CSV headers, document roots)
+HEAD_LINES = 20
+# Findings kept per rule; further matches are only counted, in one summary finding
+MAX_FINDINGS_PER_RULE = 100
+# Longer lines are matched in fragments of about this size
+MAX_LINE_CHARS = 64 * 1024
+# Characters of a line kept in the excerpt and in finding codes
+LINE_CHARS = 500
+# Characters read and matched per batch
+BATCH_CHARS = 1024 * 1024
+
+
+class TextStreamScanner:
+    """Apply the rules to a text file batch by batch, keeping only an excerpt around the findings.
+
+    Memory is bounded by one batch, the excerpt and the capped findings,
+    whatever the size of the file. ``lines`` and ``line_numbers`` form the
+    excerpt: the file head plus ``context`` lines around each kept finding.
+    """
+
+    def __init__(self, rule_engine=None, context=CONTEXT_LINES, max_findings_per_rule=MAX_FINDINGS_PER_RULE):
+        self.engine = rule_engine or RULE_ENGINE
+        self._patterns = [re.compile(pattern) for _, pattern, _, _ in self.engine.rules]
+        self.context = context
+        self.max_findings_per_rule = max_findings_per_rule
+        self.excerpt = {}  # line number -> text
+        self.findings = []
+        self.counts = [0] * len(self.engine.rules)
+        self.first_dropped = [None] * len(self.engine.rules)
+        self.total_lines = 0
+        self.documented = False
+        self.stopped = False
+        self._tail = deque(maxlen=context)  # (line number, text) just before the current batch
+        self._keep_until = 0                # after-context still owed to the previous batch's hits
+
+    def scan(self, f, deadline=None):
+        line_no, carry = 1, ''
+        while True:
+            chunk = f.read(BATCH_CHARS)
+            if not chunk:
+                break
+            texts = (carry + chunk).split('\n')
+            carry = texts.pop()
+            first, line_no = line_no, line_no + len(texts)
+            if len(carry) >= MAX_LINE_CHARS:
+                # Very long line: match what we have, the rest continues the same line number
+                texts.append(carry)
+                carry = ''
+            self._scan_batch(first, texts)
+            if deadline is not None and time.monotonic() >= deadline:
+                self.stopped = True
+                break
+        if carry and not self.stopped:
+            self._scan_batch(line_no, [carry])
+            line_no += 1
+        self.total_lines = line_no - 1
+        return self
+
+    def _scan_batch(self, first, texts):
+        """Match ``texts``, the lines numbered ``first`` on (repeated numbers only for split long lines)."""
+        raw = '\n'.join(texts)
+        if not self.documented:
+            self.documented = 'doc' in raw or '#' in raw
+        text = raw.lower()
+        wanted = set()
+        for rule, pattern in enumerate(self._patterns):
+            pos = line = 0
+            while True:
+                m = pattern.search(text, pos)
+                if m is None:
+                    break
+                line += text.count('\n', pos, m.start())
+                number = first + line
+                if self.counts[rule] < self.max_findings_per_rule:
+                    self.findings.append(self.engine.finding(number, texts[line].strip()[:LINE_CHARS], rule))
+                    wanted.update(range(number - self.context, number + self.context + 1))
+                elif self.first_dropped[rule] is None:
+                    self.first_dropped[rule] = number
+                # Past the cap a matching line is only counted; either way once per line, then the next line
+                self.counts[rule] += 1
+                pos = text.find('\n', m.end()) + 1
+                if pos == 0:
+                    break
+                line += 1
+        self.findings.sort(key=lambda finding: finding['line'])
+
+        for number, text in self._tail:
+            if number in wanted:
+                self._keep(number, text)
+        last = first + len(texts) - 1
+        keep = set(range(first, min(max(HEAD_LINES, self._keep_until), last) + 1))
+        for number in keep.union(wanted):
+            if first <= number <= last:
+                self._keep(number, texts[number - first])
+        if wanted:
+            self._keep_until = max(self._keep_until, max(wanted))
+        if self.context:
+            self._tail.extend((first + i, texts[i]) for i in range(max(0, len(texts) - self.context), len(texts)))
+
+    def _keep(self, number, text):
+        if number not in self.excerpt:
+            self.excerpt[number] = text.rstrip('\r\n')[:LINE_CHARS]
+
+    def result(self):
+        findings = list(self.findings)
+        for rule, number in enumerate(self.first_dropped):
+            if number is not None:
+                dropped = self.counts[rule] - self.max_findings_per_rule
+                summary = self.engine.finding(number, f"{dropped} more matching lines from line {number} on", rule)
+                summary['occurrences'] = dropped
+                findings.append(summary)
+        numbers = sorted(self.excerpt)
+        return {
+            'lines': [self.excerpt[number] for number in numbers],
+            'line_numbers': numbers,
+            'total_lines': self.total_lines,
+            'documented': self.documented,
+            'findings': findings,
+            'stopped': self.stopped
+        }
+
+
+def scan_text(file_path, deadline=None, rule_engine=None, context=CONTEXT_LINES):
+    """Stream a text (or unknown) file through the rules with bounded memory.
+
+    Returns ``{'lines', 'line_numbers', 'total_lines', 'documented',
+    'findings', 'stopped'}``; findings carry real file line numbers.
+    """
+    with open(file_path, 'r', errors='ignore') as f:
+        return TextStreamScanner(rule_engine, context).scan(f, deadline).result()
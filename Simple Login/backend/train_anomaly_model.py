@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+
+from app import create_app
+from app.models import UploadedModel
+from app.anomaly import AnomalyDetector, MIN_TRAINING_SAMPLES
+from app.scanner import extract_model_features
+
+
+def corpus_features(since=None, directory=None):
+    """Feature rows of every scanned upload (optionally only newer ones) plus files in ``directory``."""
+    query = UploadedModel.query.filter(UploadedModel.features.isnot(None))
+    if since is not None:
+        query = query.filter(UploadedModel.upload_date > since)
+    rows = [json.loads(m.features) for m in query.all()]
+    if directory:
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                features = extract_model_features(path)
+                if features:
+                    rows.append(features)
+    return rows
+
+
+def train(update=False, directory=None):
+    app = create_app()
+    with app.app_context():
+        detector = AnomalyDetector(app.config['ANOMALY_MODEL_PATH'])
+        if update:
+            detector.load()
+        since = detector.trained_at if update and detector.is_trained else None
+        rows = corpus_features(since, directory)
+
+        if not update and len(rows) < MIN_TRAINING_SAMPLES:
+            print(f"⚠️ Only {len(rows)} samples; at least {MIN_TRAINING_SAMPLES} are needed to train.")
+            return
+        if not rows:
+            print("ℹ️ No new uploads since the last training run.")
+            return
+
+        if since is not None:
+            if len(rows) < detector.min_update_samples:
+                print(f"⚠️ Only {len(rows)} new samples; at least {detector.min_update_samples} are needed to add trees.")
+                return
+            detector.update(rows)
+            print(f"✅ Added trees for {len(rows)} new samples ({len(detector.forest.estimators_)} trees).")
+        else:
+            detector.fit(rows)
+            print(f"✅ Trained on {len(rows)} samples.")
+        detector.save()
+        print(f"💾 Saved to {detector.model_path}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train the upload anomaly detector on the scanned corpus.')
+    parser.add_argument('--update', action='store_true', help='warm-start: grow the saved forest with uploads since it was trained')
+    parser.add_argument('--dir', help='also extract features from every model file in this directory')
+    args = parser.parse_args()
+    train(update=args.update, directory=args.dir)
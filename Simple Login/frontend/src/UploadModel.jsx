@@ -112,7 +112,7 @@ export default function UploadModel() {
                   ref={fileInputRef}
                   onChange={handleFileChange}
                   className="hidden"
-                  accept=".h5,.pkl,.pt,.joblib,.onnx,.sav,.model,.bin,.zip,.tar,.gz,.pytorch,.keras,.pb,.tflite,.pmml,.mlmodel,.xgb,.cbm,.pkl,.pickle,.txt,.csv,.json,.xml,.yml,.yaml"
+                  accept=".h5,.pkl,.pt,.joblib,.onnx,.sav,.model,.bin,.zip,.tar,.gz,.pytorch,.keras,.pb,.tflite,.pmml,.mlmodel,.xgb,.cbm,.pkl,.pickle,.safetensors,.gguf,.txt,.csv,.json,.xml,.yml,.yaml"
                 />
                 <button
                   type="button"